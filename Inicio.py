@@ -1,6 +1,4 @@
 import streamlit as st
-from PIL import Image
-import io
 
 # Configurar la página
 st.set_page_config(
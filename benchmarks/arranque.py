@@ -0,0 +1,113 @@
+"""Tiempo de importación de cada página, con un presupuesto que falla si se supera.
+
+Para cada página se extraen sus ``import`` de primer nivel y se ejecutan en
+un intérprete nuevo con ``-X importtime``: es el costo que paga la primera
+visita a esa página en un proceso recién arrancado (el arranque en frío del
+contenedor). Se repite varias veces y se toma el mínimo, para no medir ruido.
+Por página se informa el total y los módulos más caros.
+
+Uso::
+
+    python benchmarks/arranque.py
+    python benchmarks/arranque.py --presupuesto benchmarks/presupuesto_arranque.json
+
+Con ``--presupuesto`` (JSON página -> segundos) termina con error si alguna
+página supera su presupuesto; ``tests/test_arranque.py`` corre el mismo
+control con ``presupuesto_arranque.json`` en la suite de pytest.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+PAGINAS = ['Inicio.py'] + sorted(str(p.relative_to(RAIZ)) for p in (RAIZ / 'pages').glob('*.py'))
+_MARCA = '-- importaciones de la página --\n'
+
+
+def importaciones(pagina):
+    """Código con solo las sentencias ``import`` de primer nivel de ``pagina``."""
+    arbol = ast.parse((RAIZ / pagina).read_text(encoding='utf-8'))
+    return '\n'.join(ast.unparse(n) for n in arbol.body if isinstance(n, (ast.Import, ast.ImportFrom)))
+
+
+def _medir_una_vez(codigo):
+    # Se mide dentro del proceso hijo para no contar el arranque del intérprete
+    programa = (
+        "import sys, time\n"
+        f"sys.stderr.write({_MARCA!r})\n"
+        "_t = time.perf_counter()\n"
+        f"{codigo}\n"
+        "print(time.perf_counter() - _t)\n"
+    )
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', programa], cwd=RAIZ, capture_output=True, text=True,
+        env=dict(os.environ, PYTHONPATH=str(RAIZ)),
+    )
+    if proceso.returncode:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1])
+    return float(proceso.stdout.strip().splitlines()[-1]), proceso.stderr
+
+
+def _modulos_caros(salida_importtime, n):
+    # Líneas "import time: self | cumulative | módulo"; los de primer nivel no tienen sangría
+    caros = []
+    # Lo anterior a la marca es el arranque del intérprete (site, encodings...)
+    salida_importtime = salida_importtime.split(_MARCA, 1)[-1]
+    for linea in salida_importtime.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, modulo = linea[len('import time:'):].split('|')
+        if not modulo.startswith(' ' * 2):
+            caros.append((int(acumulado) / 1e6, modulo.strip()))
+    return sorted(caros, reverse=True)[:n]
+
+
+def medir(pagina, repeticiones=3, n_modulos=5):
+    """``{'segundos', 'modulos'}`` de la importación de ``pagina`` (mínimo de ``repeticiones``)."""
+    codigo = importaciones(pagina)
+    mejor, detalle = min(_medir_una_vez(codigo) for _ in range(repeticiones))
+    return {
+        'segundos': round(mejor, 4),
+        'modulos': [[modulo, round(s, 4)] for s, modulo in _modulos_caros(detalle, n_modulos)],
+    }
+
+
+def excedidas(resultado, presupuesto):
+    """(página, límite, segundos) de las páginas de ``resultado`` que superan su ``presupuesto``."""
+    return [(p, presupuesto[p], m['segundos']) for p, m in resultado.items()
+            if p in presupuesto and m['segundos'] > presupuesto[p]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paginas', nargs='*', default=PAGINAS, help="páginas a medir (por defecto todas)")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--presupuesto', type=Path, help="JSON página -> segundos máximos")
+    parser.add_argument('--salida', type=Path, help="archivo JSON donde escribir los resultados")
+    args = parser.parse_args(argv)
+
+    resultado = {}
+    for pagina in args.paginas:
+        resultado[pagina] = medida = medir(pagina, args.repeticiones)
+        print(f"{pagina:<28} {medida['segundos']:>8.3f} s")
+        for modulo, segundos in medida['modulos']:
+            print(f"    {modulo:<24} {segundos:>8.3f} s")
+
+    if args.salida:
+        args.salida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    if args.presupuesto:
+        presupuesto = json.loads(args.presupuesto.read_text(encoding='utf-8'))
+        fuera = excedidas(resultado, presupuesto)
+        for pagina, limite, segundos in fuera:
+            print(f"PRESUPUESTO EXCEDIDO {pagina}: {segundos:.3f} s > {limite:.3f} s")
+        return 1 if fuera else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
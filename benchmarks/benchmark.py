@@ -0,0 +1,244 @@
+"""Benchmark de las etapas de las tres páginas sobre datos sintéticos.
+
+Genera conjuntos con :mod:`dinsar.sintetico` de los tamaños pedidos y mide,
+para cada etapa (carga, vista larga, filtro, agregados, eventos, figuras),
+el tiempo y el pico de memoria asignada por Python/numpy (``tracemalloc``).
+Escribe los resultados en JSON para compararlos entre versiones.
+
+Uso::
+
+    python benchmarks/benchmark.py --sensores 100 10000 --fechas 100 --salida benchmarks/linea_base.json
+    python benchmarks/benchmark.py --sensores 100 10000 --fechas 100 --comparar benchmarks/linea_base.json
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pyarrow as pa  # noqa: E402
+
+from dinsar import datos, lectura, particionado, sintetico  # noqa: E402
+from dinsar.acumulado import acumulado, ultimo_valido  # noqa: E402
+from dinsar.correlacion import tabla_retardos  # noqa: E402
+from dinsar.espacial import en_caja, hexagonos, indexar_puntos  # noqa: E402
+from dinsar.eventos import picos_por_sensor  # noqa: E402
+from dinsar.filtrado import filtrar_atipicos  # noqa: E402
+from dinsar.graficos import figura_cruzada, figura_desplazamiento, figura_mapa  # noqa: E402
+from dinsar.indice import filtrar, indexar  # noqa: E402
+from dinsar.lluvia import tabla_antecedente  # noqa: E402
+from dinsar.matriz import (  # noqa: E402
+    MatrizCorrida, a_largo, anexar, media_por_fecha, recortar_fechas, resumen_sensores, seleccionar,
+)
+from dinsar.piramide import construir_piramide, nivel_para, tabla  # noqa: E402
+from dinsar.tendencia import ajustar  # noqa: E402
+
+# Empeoramiento absoluto mínimo (s) para que una etapa cuente como regresión
+MARGEN_S = 0.005
+
+
+def medir(resultados, nombre, fn, memoria=True):
+    """Ejecuta ``fn`` y guarda en ``resultados[nombre]`` el tiempo (s) y el pico de memoria (MB).
+
+    El tiempo se toma sin ``tracemalloc`` (que lo distorsiona); con ``memoria``
+    se repite la etapa trazando las asignaciones de Python/numpy.
+    """
+    inicio = time.perf_counter()
+    valor = fn()
+    medida = {'segundos': round(time.perf_counter() - inicio, 5)}
+    if memoria:
+        tracemalloc.start()
+        fn()
+        medida['pico_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 3)
+        tracemalloc.stop()
+    resultados[nombre] = medida
+    return valor
+
+
+def _carga_en_frio(rutas):
+    # Sin los .parquet de caché: lectura e ingesta del CSV completas
+    datos.limpiar_cache()
+    for ruta in rutas:
+        lectura.ruta_parquet(ruta).unlink(missing_ok=True)
+    return lectura.leer_matrices(rutas, procesos=1)
+
+
+def _carga_parquet(rutas):
+    datos.limpiar_cache()
+    return lectura.leer_matrices(rutas, procesos=1)
+
+
+def _carga_incremental(rutas, filas):
+    # Las matrices ya están en memoria: se agregan ``filas`` adquisiciones al
+    # final de la primera corrida y se vuelve a cargar
+    datos.limpiar_cache()
+    lectura.leer_matrices(rutas, procesos=1)
+    with open(rutas[0], 'a', encoding='utf-8') as f:
+        f.writelines(filas)
+    inicio = time.perf_counter()
+    lectura.leer_matrices(rutas, procesos=1)
+    return time.perf_counter() - inicio
+
+
+def caso(directorio, n_sensores, n_fechas, n_corridas, memoria=True):
+    r = {}
+    rutas, ruta_prec = sintetico.generar(directorio, n_sensores, n_fechas, n_corridas)
+
+    def etapa(nombre, fn):
+        return medir(r, nombre, fn, memoria)
+
+    # Desplazamiento.py
+    matrices, _, _ = etapa('desp.carga_csv', lambda: _carga_en_frio(rutas))
+    matrices, _, _ = etapa('desp.carga_parquet', lambda: _carga_parquet(rutas))
+    etapa('desp.vista_larga', lambda: lectura.a_largo_todas(matrices))
+    m = matrices[1]
+    mitad = m.sensores[::2]
+    desde, hasta = m.fechas[len(m.fechas) // 4], m.fechas[3 * len(m.fechas) // 4]
+    filtrada = etapa('desp.filtro', lambda: recortar_fechas(seleccionar(m, mitad), desde, hasta))
+    media = etapa('desp.promedio', lambda: media_por_fecha(m))
+    etapa('desp.eventos', lambda: picos_por_sensor(m))
+    etapa('desp.tendencia', lambda: ajustar(m))
+    ultimo = etapa('desp.ultimo_valido', lambda: ultimo_valido(m))
+    etapa('desp.acumulado', lambda: acumulado(m, m.fechas[len(m.fechas) // 2], m.sensores[0], ultimo))
+    etapa('desp.filtro_atipicos', lambda: filtrar_atipicos(m))
+    etapa('desp.figura', lambda: figura_desplazamiento(m, media, 1))
+    etapa('desp.figura_filtrada', lambda: figura_desplazamiento(filtrada, media_por_fecha(filtrada), 1))
+    etapa('desp.tabla_filtrada', lambda: a_largo(filtrada))
+
+    # Dataset particionado: escritura y consulta de pocos sensores con filtros en el escaneo
+    lluvia_df, _ = lectura.leer_precipitacion(ruta_prec)
+    raiz = Path(directorio) / datos.NOMBRE_DATASET
+    dataset = etapa('part.escribir', lambda: particionado.escribir(raiz, matrices, lluvia_df, 'benchmark'))
+    pocos = m.sensores[len(m.sensores) // 2:len(m.sensores) // 2 + 3]
+    etapa('part.consulta', lambda: dataset.matriz(1, pocos, desde, hasta))
+    # Versión nueva con una adquisición más en la corrida 1: solo se escribe esa fila
+    nueva = MatrizCorrida(1, m.fechas[-1:] + np.timedelta64(12, 'D'), m.sensores, m.puntos[-1:], m.valores[-1:])
+    agregadas = {**matrices, 1: anexar(m, nueva)}
+    etapa('part.escribir_incremental', lambda: particionado.escribir(raiz, agregadas, lluvia_df, 'benchmark-2'))
+
+    # Nuevas adquisiciones: la última décima parte de las filas de la corrida 1
+    # se quita del CSV y se vuelve a agregar, midiendo solo la recarga
+    lineas = Path(rutas[0]).read_text(encoding='utf-8').splitlines(keepends=True)
+    n_nuevas = max(1, (len(lineas) - 1) // 10)
+    Path(rutas[0]).write_text(''.join(lineas[:-n_nuevas]), encoding='utf-8')
+    r['desp.carga_incremental'] = {'segundos': round(_carga_incremental(rutas, lineas[-n_nuevas:]), 5)}
+
+    # Precipitacion.py
+    indice = etapa('prec.carga', lambda: indexar(lectura.leer_precipitacion(ruta_prec)[0], ['corrida']))
+    piramide = etapa('prec.piramide', lambda: construir_piramide(indice.df))
+    corridas = indice.valores()
+    etapa('prec.mensual', lambda: tabla(piramide, 'M', corridas).groupby('fecha')['suma'].sum())
+    etapa('prec.nivel', lambda: tabla(piramide, nivel_para(piramide, corridas), corridas))
+
+    # Cruzado.py
+    etapa('cruz.antecedentes', lambda: tabla_antecedente(matrices, indice))
+    lluvia = filtrar(indice, 1)
+    etapa('cruz.correlacion', lambda: tabla_retardos(m, lluvia, max_retardo=6))
+    lluvia_agr = lluvia.groupby('fecha', as_index=False)['rainfall'].sum()
+    etapa('cruz.figura', lambda: figura_cruzada(m, lluvia_agr, 1))
+
+    # Mapa.py
+    coords = lectura.leer_coordenadas(Path(directorio) / lectura.RUTA_COORDS.name)
+    espacial = etapa('mapa.indice', lambda: indexar_puntos(coords['sensor'], coords['lon'], coords['lat']))
+    etapa('mapa.resumen', lambda: resumen_sensores(m))
+    oeste, sur, este, norte = espacial.extension
+    # Un cuarto del área, centrado
+    ancho, alto = (este - oeste) / 4, (norte - sur) / 4
+    centro = (oeste + ancho, sur + alto, este - ancho, norte - alto)
+    pos = etapa('mapa.caja', lambda: en_caja(espacial, *centro))
+    etapa('mapa.hexagonos', lambda: hexagonos(espacial.lon, espacial.lat, np.zeros(len(espacial.lon)),
+                                              max(este - oeste, norte - sur) / 60))
+    visibles = pd.DataFrame({'sensor': espacial.sensores[pos], 'lon': espacial.lon[pos],
+                             'lat': espacial.lat[pos], 'valor': np.zeros(len(pos))})
+    # figura_mapa importa pydeck en su primera llamada: se calienta antes de medir
+    figura_mapa(visibles.head(1), 'velocidad', centro)
+    etapa('mapa.figura', lambda: figura_mapa(visibles, 'velocidad', centro))
+
+    return r
+
+
+def comparar(actual, base, tolerancia, margen=MARGEN_S):
+    """Regresiones y etapas sin referencia de ``actual`` frente a ``base``.
+
+    Devuelve ``(regresiones, faltantes)``: ``regresiones`` es una lista de
+    (caso, etapa, base_s, actual_s) con tiempos peores que
+    ``max(base * tolerancia, base + margen)`` (el margen absoluto evita que el
+    ruido de las etapas de milisegundos cuente como regresión) y
+    ``faltantes`` una lista de (caso, etapa) medidas que la línea base no
+    tiene (``etapa`` es None si falta el caso entero).
+    """
+    base_por_caso = {(c['sensores'], c['fechas']): c['etapas'] for c in base['casos']}
+    regresiones, faltantes = [], []
+    for c in actual['casos']:
+        nombre = f"{c['sensores']}x{c['fechas']}"
+        previas = base_por_caso.get((c['sensores'], c['fechas']))
+        if previas is None:
+            faltantes.append((nombre, None))
+            continue
+        for etapa, medida in c['etapas'].items():
+            if etapa not in previas:
+                faltantes.append((nombre, etapa))
+                continue
+            antes = previas[etapa]['segundos']
+            if medida['segundos'] > max(antes * tolerancia, antes + margen):
+                regresiones.append((nombre, etapa, antes, medida['segundos']))
+    return regresiones, faltantes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sensores', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--fechas', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--corridas', type=int, default=3)
+    parser.add_argument('--salida', type=Path, help="archivo JSON donde escribir los resultados")
+    parser.add_argument('--sin-memoria', action='store_true', help="medir solo tiempos (más rápido)")
+    parser.add_argument('--comparar', type=Path, help="JSON de una corrida anterior contra el cual comparar")
+    parser.add_argument('--tolerancia', type=float, default=1.5,
+                        help="factor de tiempo a partir del cual una etapa cuenta como regresión")
+    parser.add_argument('--margen', type=float, default=MARGEN_S,
+                        help="empeoramiento mínimo en segundos para contar como regresión")
+    args = parser.parse_args(argv)
+
+    resultado = {
+        'entorno': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'pyarrow': pa.__version__,
+            'maquina': platform.machine(),
+        },
+        'casos': [],
+    }
+    for n_sensores in args.sensores:
+        for n_fechas in args.fechas:
+            with tempfile.TemporaryDirectory() as tmp:
+                etapas = caso(tmp, n_sensores, n_fechas, args.corridas, not args.sin_memoria)
+            resultado['casos'].append({'sensores': n_sensores, 'fechas': n_fechas, 'etapas': etapas})
+            print(f"{n_sensores} sensores × {n_fechas} fechas")
+            for etapa, medida in etapas.items():
+                pico = f"{medida['pico_mb']:>10.2f} MB" if 'pico_mb' in medida else ''
+                print(f"  {etapa:<24} {medida['segundos']:>9.4f} s {pico}")
+
+    if args.salida:
+        args.salida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    if args.comparar:
+        base = json.loads(args.comparar.read_text(encoding='utf-8'))
+        regresiones, faltantes = comparar(resultado, base, args.tolerancia, args.margen)
+        for nombre, etapa, antes, ahora in regresiones:
+            print(f"REGRESIÓN {nombre} {etapa}: {antes:.4f} s -> {ahora:.4f} s")
+        for nombre, etapa in faltantes:
+            print(f"SIN LÍNEA BASE {nombre} {etapa or '(caso completo)'}: regenerar {args.comparar.name}")
+        return 1 if regresiones or faltantes else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
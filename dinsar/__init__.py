@@ -0,0 +1 @@
+"""Lógica de datos y análisis compartida por las páginas de la aplicación DInSAR."""
@@ -0,0 +1,76 @@
+"""Desplazamiento acumulado respecto de una época y un punto de referencia.
+
+Los valores de cada corrida ya son desplazamientos acumulados desde su
+primera adquisición. Aquí se re-refieren:
+
+- a una época elegida: a cada sensor se le resta su valor en esa fecha; si
+  ese día no tiene dato se usa su última observación anterior (o, si no
+  tiene ninguna, la primera posterior);
+- opcionalmente a un punto estable: a todos los sensores se les resta la
+  serie (ya re-referida) de ese sensor, con sus huecos rellenados con la
+  última observación.
+
+Los huecos se resuelven con una sola pasada acumulada sobre la matriz
+(:func:`ultimo_valido`, un ``np.maximum.accumulate`` de índices de fila),
+para todos los sensores a la vez. Ese índice no depende de la época: cambiar
+de época solo vuelve a indexar y restar. No depende de Streamlit.
+"""
+import numpy as np
+
+from dinsar.matriz import MatrizCorrida, extremos_validos
+
+
+def ultimo_valido(m):
+    """Fila de la última observación válida de cada sensor en o antes de cada fecha (-1 si no hay).
+
+    Matriz int32 de la forma de ``valores``.
+    """
+    n_fechas = m.valores.shape[0]
+    filas = np.arange(n_fechas, dtype=np.int32)[:, None]
+    ultimo = np.where(np.isnan(m.valores), np.int32(-1), filas)
+    return np.maximum.accumulate(ultimo, axis=0)
+
+
+def _tomar(m, filas):
+    # Valores en ``filas`` (una por sensor, o una matriz), NaN donde la fila es -1
+    columnas = np.arange(m.valores.shape[1])
+    valores = np.asarray(m.valores)[np.clip(filas, 0, None), columnas]
+    return np.where(filas >= 0, valores, np.nan).astype(np.float32)
+
+
+def fila_referencia(m, fecha):
+    """Fila de la primera adquisición en o después de ``fecha`` (la última si es posterior a todas)."""
+    fila = np.searchsorted(m.fechas, np.datetime64(fecha, 'ns'), side='left')
+    return int(min(fila, max(len(m.fechas) - 1, 0)))
+
+
+def valor_referencia(m, fila, ultimo=None):
+    """Valor de cada sensor en la época ``fila``: el último válido hasta ahí, o el primero posterior."""
+    ultimo = ultimo_valido(m) if ultimo is None else ultimo
+    if len(m.fechas) == 0:
+        return np.full(m.valores.shape[1], np.nan, dtype=np.float32)
+    filas = ultimo[fila]
+    primera, _ = extremos_validos(m)
+    return _tomar(m, np.where(filas >= 0, filas, primera))
+
+
+def acumulado(m, referencia=None, estable=None, ultimo=None):
+    """Matriz ``m`` re-referida a la época ``referencia`` y al sensor ``estable``.
+
+    ``referencia`` es una fecha (``None`` = la primera adquisición) y
+    ``estable`` el ID de un sensor de ``m`` (``None`` = sin punto estable).
+    ``ultimo`` es :func:`ultimo_valido` de ``m`` si ya se calculó. Los
+    huecos de cada sensor siguen siendo NaN, igual que las fechas previas a
+    la primera observación del punto estable.
+    """
+    ultimo = ultimo_valido(m) if ultimo is None else ultimo
+    fila = 0 if referencia is None else fila_referencia(m, referencia)
+    valores = np.asarray(m.valores) - valor_referencia(m, fila, ultimo)
+    if estable is not None:
+        j = np.searchsorted(m.sensores, estable)
+        if j >= len(m.sensores) or m.sensores[j] != estable:
+            raise ValueError(f"El sensor estable {estable} no está en la corrida {m.corrida}")
+        columna = ultimo[:, j]
+        relleno = np.where(columna >= 0, valores[columna.clip(0), j], np.nan)
+        valores = valores - relleno[:, None]
+    return MatrizCorrida(m.corrida, m.fechas, m.sensores, m.puntos, valores.astype(np.float32))
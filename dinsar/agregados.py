@@ -0,0 +1,152 @@
+"""Agregados de la corrida completa que se extienden con las adquisiciones nuevas.
+
+El promedio por fecha (:func:`~dinsar.matriz.media_por_fecha`) y el mayor
+cambio de cada sensor (:func:`~dinsar.eventos.picos_por_sensor`) de la vista
+completa de una corrida se guardan como su estado de cálculo:
+
+- por fecha, la suma y la cantidad de valores válidos;
+- por sensor, el mayor cambio hasta ahora y su última observación válida
+  (el estado de :func:`~dinsar.eventos.deltas`).
+
+Una adquisición nueva solo agrega filas al final de la corrida, así que
+:func:`extender` cuesta lo que esas filas y da exactamente lo mismo que
+recalcular sobre la matriz completa. El dataset particionado los guarda con
+cada versión (ver :mod:`dinsar.particionado`). No depende de Streamlit.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dinsar.eventos import COLUMNAS, deltas, estado_inicial
+from dinsar.matriz import bloques, columnas, sumas_por_fila
+
+POR_FECHA = 'por_fecha.parquet'
+POR_SENSOR = 'por_sensor.parquet'
+
+_ESQUEMA_FECHA = pa.schema([('fecha', pa.timestamp('ns')), ('suma', pa.float64()), ('cuenta', pa.int64())])
+_ESQUEMA_SENSOR = pa.schema([
+    ('sensor', pa.int32()),
+    ('ultimo_valor', pa.float32()),
+    ('ultimo_dia', pa.int32()),
+    ('fecha', pa.timestamp('ns')),
+    ('Delta', pa.float32()),
+    ('Dias', pa.int32()),
+    ('Velocidad', pa.float32()),
+])
+
+
+@dataclass(frozen=True)
+class Agregados:
+    """Estado de los agregados de una corrida (tablas con los esquemas de arriba)."""
+    por_fecha: pd.DataFrame
+    por_sensor: pd.DataFrame
+
+
+def vacios(sensores):
+    """Agregados de una corrida con esos ``sensores`` y todavía sin adquisiciones."""
+    ultimo_valor, ultimo_dia = estado_inicial(len(sensores))
+    n = len(sensores)
+    return Agregados(
+        _ESQUEMA_FECHA.empty_table().to_pandas(),
+        pd.DataFrame({
+            'sensor': np.asarray(sensores, dtype=np.int32), 'ultimo_valor': ultimo_valor, 'ultimo_dia': ultimo_dia,
+            'fecha': np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]'),
+            'Delta': np.full(n, np.nan, dtype=np.float32), 'Dias': np.zeros(n, dtype=np.int32),
+            'Velocidad': np.full(n, np.nan, dtype=np.float32),
+        }),
+    )
+
+
+def calcular(m):
+    """Agregados de la matriz completa ``m``."""
+    return extender(vacios(m.sensores), m)
+
+
+def extender(agregados, m):
+    """Los ``agregados`` de una corrida con las filas de ``m`` agregadas al final.
+
+    ``m`` tiene las columnas de todos los sensores de la corrida, en el mismo
+    orden, y fechas no anteriores a la última ya agregada.
+    """
+    anterior = agregados.por_sensor
+    if not np.array_equal(anterior['sensor'].to_numpy(), m.sensores):
+        raise ValueError(f'La corrida {m.corrida} no tiene los mismos sensores que sus agregados')
+
+    # Por fecha: la suma de cada fecha sigue acumulándose en el orden de las
+    # filas, como en media_por_fecha
+    suma, cuenta = sumas_por_fila(m)
+    con_datos = cuenta > 0
+    previas = agregados.por_fecha
+    fechas = np.concatenate((previas['fecha'].to_numpy(dtype='datetime64[ns]'), m.fechas[con_datos]))
+    fechas, inv = np.unique(fechas, return_inverse=True)
+    por_fecha = pd.DataFrame({
+        'fecha': fechas,
+        'suma': np.bincount(inv, weights=np.concatenate((previas['suma'].to_numpy(), suma[con_datos]))),
+        'cuenta': np.bincount(inv, weights=np.concatenate((previas['cuenta'].to_numpy(), cuenta[con_datos])))
+                    .astype(np.int64),
+    })
+
+    # Por sensor: el mayor |Delta| de las filas nuevas reemplaza al anterior
+    # solo si es estrictamente mayor (argmax se queda con el primero)
+    por_sensor = {c: anterior[c].to_numpy().copy() for c in anterior.columns}
+    n_fechas, n_sensores = m.valores.shape
+    for ini, fin in bloques(n_sensores, 4 * n_fechas) if n_fechas else []:
+        estado = (por_sensor['ultimo_valor'][ini:fin], por_sensor['ultimo_dia'][ini:fin])
+        delta, dias, velocidad = deltas(columnas(m, ini, fin), estado)
+        puntaje = np.abs(delta)
+        puntaje[np.isnan(puntaje)] = -np.inf
+        filas = puntaje.argmax(axis=0)
+        cols = np.arange(fin - ini)
+        previo = np.abs(por_sensor['Delta'][ini:fin])
+        mejor = puntaje[filas, cols] > np.where(np.isnan(previo), -np.inf, previo)
+        filas, cols = filas[mejor], cols[mejor]
+        por_sensor['fecha'][ini + cols] = m.fechas[filas]
+        por_sensor['Delta'][ini + cols] = delta[filas, cols]
+        por_sensor['Dias'][ini + cols] = dias[filas, cols]
+        por_sensor['Velocidad'][ini + cols] = velocidad[filas, cols]
+    return Agregados(por_fecha, pd.DataFrame(por_sensor))
+
+
+def media(agregados):
+    """El promedio por fecha, igual a :func:`~dinsar.matriz.media_por_fecha` de la corrida completa."""
+    f = agregados.por_fecha
+    return pd.Series(f['suma'].to_numpy() / f['cuenta'].to_numpy(),
+                     index=pd.DatetimeIndex(f['fecha'].to_numpy(dtype='datetime64[ns]'), name='fecha'),
+                     name='Desplazamiento')
+
+
+def picos(agregados):
+    """Mayor cambio de cada sensor, igual a :func:`~dinsar.eventos.picos_por_sensor` de la corrida completa."""
+    s = agregados.por_sensor
+    s = s[s['Delta'].notna()]
+    fechas = s['fecha'].to_numpy(dtype='datetime64[ns]')
+    df_picos = pd.DataFrame({
+        'sensor': s['sensor'].to_numpy(dtype=np.int32),
+        'Fecha_Previo': fechas - s['Dias'].to_numpy(dtype=np.int32).astype('timedelta64[D]'),
+        'fecha': fechas,
+        'Delta': s['Delta'].to_numpy(dtype=np.float32),
+        'Dias': s['Dias'].to_numpy(dtype=np.int32),
+        'Velocidad': s['Velocidad'].to_numpy(dtype=np.float32),
+    }, columns=COLUMNAS)
+    return df_picos.sort_values(by='Velocidad', ascending=False).reset_index(drop=True)
+
+
+def guardar(agregados, directorio):
+    """Escribe los agregados en ``directorio`` (dos Parquet chicos)."""
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(agregados.por_fecha, schema=_ESQUEMA_FECHA, preserve_index=False),
+                   directorio / POR_FECHA)
+    pq.write_table(pa.Table.from_pandas(agregados.por_sensor, schema=_ESQUEMA_SENSOR, preserve_index=False),
+                   directorio / POR_SENSOR)
+
+
+def leer(directorio):
+    """Agregados escritos por :func:`guardar`."""
+    directorio = Path(directorio)
+    return Agregados(pq.read_table(directorio / POR_FECHA).to_pandas(),
+                     pq.read_table(directorio / POR_SENSOR).to_pandas())
@@ -0,0 +1,445 @@
+"""API de consultas con caché de resultados y figuras.
+
+Una consulta es (corrida, subconjunto de sensores, ventana de fechas) sobre la
+versión actual de los datos. El resultado (matriz filtrada, agregados, tabla de
+eventos y figura serializada en JSON) se guarda en un caché LRU con
+vencimiento (``cachetools``) cuya clave es un hash del estado de filtros
+normalizado: ir y volver entre corridas o conjuntos de sensores reutiliza la
+figura ya construida. Las tablas derivadas (p. ej. la correlación con retardo)
+se memorizan de la misma forma. Las series completas de las que salen el
+filtro de atípicos y el modo acumulado van a un caché aparte, acotado por
+bytes (``MEMORIA_SERIES_BYTES``).
+
+Las consultas de desplazamiento, cruzado y correlación aceptan como fuente un
+dict corrida -> matriz o el dataset particionado
+(:class:`~dinsar.particionado.Particionado`): con el dataset la corrida, los
+sensores y la ventana de fechas se empujan al escaneo y solo se lee lo pedido.
+
+El mapa de puntos PS se consulta por caja visible (:func:`consultar_mapa`):
+solo se envían al navegador los puntos dentro de la caja, o hexágonos
+agregados si son más de ``UMBRAL_PUNTOS_MAPA``.
+"""
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from cachetools import TTLCache
+
+from dinsar import agregados, perfil
+from dinsar.acumulado import acumulado, ultimo_valido
+from dinsar.correlacion import tabla_retardos
+from dinsar.espacial import UMBRAL_PUNTOS_MAPA, en_caja, hexagonos
+from dinsar.eventos import picos_por_sensor
+from dinsar.filtrado import filtrar_atipicos
+from dinsar.graficos import figura_cruzada, figura_desplazamiento, figura_mapa
+from dinsar.indice import filtrar
+from dinsar.lluvia import serie_para
+from dinsar.particionado import Particionado
+from dinsar.tendencia import ajustar
+from dinsar.matriz import (MatrizCorrida, media_por_fecha, recortar_fechas, resumen_sensores, seleccionar,
+                           validos_por_fecha)
+
+TAMANO_CACHE = 64
+VENCIMIENTO_S = 15 * 60
+# Bytes de las series completas memorizadas (matrices de corridas enteras)
+MEMORIA_SERIES_BYTES = int(float(os.environ.get('DINSAR_CACHE_SERIES_MB', 256)) * 2**20)
+
+# Hexágonos por lado de la caja visible cuando el mapa agrega
+HEXAGONOS_POR_LADO = 60
+
+
+def _bytes(resultado):
+    # Tamaño de los arreglos de una serie memorizada (ver _serie_completa)
+    total = 0
+    for parte in resultado:
+        if isinstance(parte, MatrizCorrida):
+            total += sum(a.nbytes for a in (parte.fechas, parte.sensores, parte.puntos, parte.valores))
+        elif isinstance(parte, np.ndarray):
+            total += parte.nbytes
+        elif isinstance(parte, pd.DataFrame):
+            total += int(parte.memory_usage().sum())
+    return max(total, 1)
+
+
+_cache = TTLCache(maxsize=TAMANO_CACHE, ttl=VENCIMIENTO_S)
+_cache_series = TTLCache(maxsize=MEMORIA_SERIES_BYTES, ttl=VENCIMIENTO_S, getsizeof=_bytes)
+_candado = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ResultadoConsulta:
+    """Resultado memorizado de una consulta.
+
+    Las figuras de Plotly se guardan serializadas (``figura_json``) y se
+    reconstruyen con :meth:`figura_plotly` al enviarlas; ``figura`` es la del
+    mapa (un ``pydeck.Deck``), y ``hexagonal`` indica si muestra hexágonos
+    agregados en lugar de puntos.
+    """
+    clave: str
+    matriz: object
+    figura: object = None
+    figura_json: str = None
+    media: pd.Series = None
+    picos: pd.DataFrame = None
+    lluvia: pd.DataFrame = None
+    tabla: pd.DataFrame = None
+    hexagonal: bool = False
+
+    @property
+    def vacio(self):
+        return not validos_por_fecha(self.matriz).any()
+
+    @cached_property
+    def _figura_plotly(self):
+        return go.Figure(json.loads(self.figura_json))
+
+    def figura_plotly(self):
+        """La figura de Plotly, reconstruida desde su JSON la primera vez que se pide.
+
+        Queda memorizada con el resultado: un acierto del caché no vuelve a
+        parsear ni a validar la figura. Se comparte entre sesiones, así que
+        nadie debe modificarla.
+        """
+        return self._figura_plotly
+
+
+def normalizar_filtros(m, sensores=None, desde=None, hasta=None):
+    """Lleva los filtros a una forma canónica para la matriz ``m`` (o sus ejes).
+
+    Todos los sensores equivale a ``None``, y una ventana que cubre todas las
+    fechas de la corrida equivale a no filtrar por fecha.
+    """
+    if sensores is not None:
+        sensores = np.unique(np.asarray(list(sensores), dtype=np.int32))
+        if np.array_equal(sensores, m.sensores):
+            sensores = None
+    desde = pd.Timestamp(desde) if desde is not None else None
+    hasta = pd.Timestamp(hasta) if hasta is not None else None
+    if len(m.fechas):
+        if desde is not None and desde <= m.fechas[0]:
+            desde = None
+        if hasta is not None and hasta >= m.fechas[-1]:
+            hasta = None
+    return sensores, desde, hasta
+
+
+def clave_consulta(vista, version, corrida, sensores, desde, hasta, **opciones):
+    """Hash estable del estado de filtros ya normalizado."""
+    h = hashlib.sha1()
+    h.update(json.dumps({
+        'vista': vista,
+        'version': version,
+        'corrida': corrida,
+        'desde': desde.isoformat() if desde is not None else None,
+        'hasta': hasta.isoformat() if hasta is not None else None,
+        'opciones': opciones,
+    }, sort_keys=True, default=str).encode())
+    h.update(b'todos' if sensores is None else sensores.tobytes())
+    return h.hexdigest()
+
+
+def _memorizar(clave, construir, cache=None):
+    cache = _cache if cache is None else cache
+    with _candado:
+        resultado = cache.get(clave)
+    if resultado is None:
+        perfil.fallo_cache()
+        resultado = construir()
+        with _candado:
+            try:
+                cache[clave] = resultado
+            except ValueError:
+                # Más grande que todo el caché (acotado por bytes): no se guarda
+                pass
+    return resultado
+
+
+def limpiar_cache():
+    with _candado:
+        _cache.clear()
+        _cache_series.clear()
+
+
+def _ejes(fuente, corrida):
+    # Fechas y sensores de la corrida, para normalizar los filtros
+    return fuente.ejes[corrida] if isinstance(fuente, Particionado) else fuente[corrida]
+
+
+def _filtrar(fuente, corrida, sensores, desde, hasta):
+    if isinstance(fuente, Particionado):
+        return fuente.matriz(corrida, sensores, desde, hasta)
+    return seleccionar(recortar_fechas(fuente[corrida], desde, hasta), sensores)
+
+
+def _lluvia(fuente, indice_prec, corrida, desde, hasta):
+    # Sin índice de precipitación la lluvia se lee del dataset
+    if indice_prec is None:
+        return fuente.lluvia(corrida, desde, hasta)
+    return filtrar(indice_prec, corrida, desde=desde, hasta=hasta)
+
+
+def _precalculada(precalculados, nombre, corrida):
+    # Filas de ``corrida`` de una tabla de dinsar.lote (ver datos.cargar_resultados), o None
+    if precalculados is None or nombre not in precalculados:
+        return None
+    tabla = precalculados[nombre]
+    return tabla[tabla['corrida'].astype(str) == str(corrida)].drop(columns='corrida').reset_index(drop=True)
+
+
+def _serie_completa(fuente, corrida, sensores, version):
+    # Todas las fechas de los sensores pedidos y su índice de última
+    # observación válida: no dependen de la época de referencia, así que
+    # cambiar de época no vuelve a leerlos ni a recorrerlos
+    clave = clave_consulta('serie completa', version, corrida, sensores, None, None)
+
+    def construir():
+        m = _filtrar(fuente, corrida, sensores, None, None)
+        return m, ultimo_valido(m)
+
+    return _memorizar(clave, construir, _cache_series)
+
+
+def _serie_filtrada(fuente, corrida, sensores, filtro, conservar, version):
+    # Serie completa sin atípicos ni sensores rechazados, memorizada por
+    # juego de parámetros: activar y desactivar el filtro no recalcula nada
+    clave = clave_consulta('serie filtrada', version, corrida, sensores, None, None,
+                           filtro=filtro.como_dict(), conservar=conservar)
+
+    def construir():
+        m, _ = _serie_completa(fuente, corrida, sensores, version)
+        with perfil.etapa('filtro de atípicos') as e:
+            limpia, informe = filtrar_atipicos(m, filtro, conservar)
+            e.anotar(informe)
+        return limpia, ultimo_valido(limpia), informe
+
+    return _memorizar(clave, construir, _cache_series)
+
+
+def _procesada(fuente, corrida, sensores, desde, hasta, filtro, version, acumular=False, referencia=None,
+               estable=None):
+    # Filtro de atípicos y re-referencia sobre todas las fechas, luego la ventana.
+    # El punto estable se lee junto con los sensores pedidos y luego se descarta.
+    leidos = sensores if sensores is None or estable is None else np.union1d(sensores, [estable]).astype(np.int32)
+    informe = None
+    if filtro is None:
+        m, ultimo = _serie_completa(fuente, corrida, leidos, version)
+    else:
+        conservar = [] if estable is None else [estable]
+        m, ultimo, informe = _serie_filtrada(fuente, corrida, leidos, filtro, conservar, version)
+        if sensores is not None:
+            informe = informe[informe['sensor'].isin(sensores)].reset_index(drop=True)
+    if acumular:
+        m = acumulado(m, referencia, estable, ultimo)
+    return seleccionar(recortar_fechas(m, desde, hasta), sensores), informe
+
+
+def consultar_desplazamiento(matrices, corrida, sensores=None, desde=None, hasta=None,
+                             umbral_velocidad=None, modo='valor', referencia=None, estable=None,
+                             filtro=None, precalculados=None, version=None):
+    """Datos y figura de la página de desplazamiento para un estado de filtros.
+
+    ``matrices`` es un dict corrida -> matriz o un
+    :class:`~dinsar.particionado.Particionado`. Con ``modo='acumulado'`` los
+    valores se re-refieren a la época ``referencia`` y al sensor ``estable``
+    (ver :mod:`dinsar.acumulado`). Con ``filtro`` (un
+    :class:`~dinsar.filtrado.ParametrosFiltro`) se quitan atípicos y sensores
+    ruidosos antes de todo lo demás, y ``tabla`` trae el informe por sensor.
+    Para la corrida completa (todos los sensores y fechas, sin re-referir ni
+    filtrar) el promedio y los picos se toman de los agregados del dataset
+    (ver :mod:`dinsar.agregados`) o, con un dict, de ``precalculados`` (las
+    tablas de :func:`dinsar.datos.cargar_resultados`) en lugar de calcularse.
+    ``version`` identifica la versión de los datos (ver
+    :func:`dinsar.datos.version_datos`) y forma parte de la clave del caché.
+    """
+    ejes = _ejes(matrices, corrida)
+    sensores, desde, hasta = normalizar_filtros(ejes, sensores, desde, hasta)
+    if modo == 'acumulado':
+        referencia = pd.Timestamp(referencia) if referencia is not None else None
+        if referencia is not None and len(ejes.fechas) and referencia <= ejes.fechas[0]:
+            referencia = None
+        estable = int(estable) if estable is not None else None
+    elif modo == 'valor':
+        referencia = estable = None
+    else:
+        raise ValueError(f"Modo desconocido: {modo!r} (usar 'valor' o 'acumulado')")
+    clave = clave_consulta('desplazamiento', version, corrida, sensores, desde, hasta,
+                           umbral_velocidad=umbral_velocidad, modo=modo,
+                           referencia=referencia.isoformat() if referencia is not None else None,
+                           estable=estable, filtro=filtro.como_dict() if filtro is not None else None)
+
+    def construir():
+        with perfil.etapa('filtro') as e:
+            informe = None
+            if modo == 'acumulado' or filtro is not None:
+                filtrada, informe = _procesada(matrices, corrida, sensores, desde, hasta, filtro, version,
+                                               acumular=modo == 'acumulado', referencia=referencia,
+                                               estable=estable)
+            else:
+                filtrada = _filtrar(matrices, corrida, sensores, desde, hasta)
+            e.anotar(filtrada)
+        # La vista completa de la corrida ya está agregada en el dataset (al
+        # día con cada adquisición) o puede estar calculada por lotes
+        completa = modo == 'valor' and filtro is None and sensores is None and desde is None and hasta is None
+        guardados = matrices.agregados(corrida) if completa and isinstance(matrices, Particionado) else None
+        with perfil.etapa('promedio por fecha') as e:
+            if guardados is not None:
+                media = agregados.media(guardados)
+            else:
+                media = _precalculada(precalculados, 'promedios_por_fecha', corrida) if completa else None
+                if media is None:
+                    media = media_por_fecha(filtrada)
+                else:
+                    media = pd.Series(media['Desplazamiento'].to_numpy(),
+                                      index=pd.DatetimeIndex(media['fecha'], name='fecha'), name='Desplazamiento')
+            e.anotar(media)
+        with perfil.etapa('eventos') as e:
+            picos = None
+            if completa and umbral_velocidad is None:
+                picos = (agregados.picos(guardados) if guardados is not None
+                         else _precalculada(precalculados, 'picos', corrida))
+            if picos is None:
+                picos = picos_por_sensor(filtrada, umbral_velocidad=umbral_velocidad)
+            e.anotar(picos)
+        with perfil.etapa('figura'):
+            titulo = 'Desplazamiento acumulado' if modo == 'acumulado' else 'Desplazamiento'
+            figura = pio.to_json(figura_desplazamiento(filtrada, media, corrida, titulo=titulo), validate=False)
+        return ResultadoConsulta(clave=clave, matriz=filtrada, figura_json=figura, media=media, picos=picos,
+                                 tabla=informe)
+
+    return _memorizar(clave, construir)
+
+
+def consultar_cruzado(matrices, indice_prec, corrida, sensores=None, desde=None, hasta=None,
+                      precalculados=None, version=None):
+    """Datos y figura combinada desplazamiento + precipitación para un estado de filtros.
+
+    Con ``matrices`` particionado, ``indice_prec`` puede ser ``None``: la
+    lluvia también se lee del dataset. Sin ventana de fechas, la lluvia por
+    fecha se toma de ``precalculados`` (ver :func:`consultar_desplazamiento`)
+    si los hay.
+    """
+    sensores, desde, hasta = normalizar_filtros(_ejes(matrices, corrida), sensores, desde, hasta)
+    clave = clave_consulta('cruzado', version, corrida, sensores, desde, hasta)
+
+    def construir():
+        with perfil.etapa('filtro') as e:
+            filtrada = e.anotar(_filtrar(matrices, corrida, sensores, desde, hasta))
+        with perfil.etapa('lluvia por fecha') as e:
+            completa = desde is None and hasta is None
+            lluvia = _precalculada(precalculados, 'lluvia_por_fecha', corrida) if completa else None
+            if lluvia is None:
+                lluvia = _lluvia(matrices, indice_prec, corrida, desde, hasta)
+                lluvia = lluvia.groupby('fecha', as_index=False)['rainfall'].sum()
+            e.anotar(lluvia)
+        with perfil.etapa('figura'):
+            figura = pio.to_json(figura_cruzada(filtrada, lluvia, corrida), validate=False)
+        return ResultadoConsulta(clave=clave, matriz=filtrada, figura_json=figura, lluvia=lluvia)
+
+    return _memorizar(clave, construir)
+
+
+def consultar_correlacion(matrices, indice_prec, corrida, sensores=None, desde=None, hasta=None,
+                          max_retardo=6, respuesta='delta', antecedentes=None, variable_lluvia=None,
+                          version=None):
+    """Tabla de mejor retardo lluvia → desplazamiento por sensor (ver :mod:`dinsar.correlacion`).
+
+    Por defecto se usa la lluvia registrada en cada fecha; con ``antecedentes``
+    (tabla de :func:`dinsar.lluvia.tabla_antecedente`) y ``variable_lluvia``
+    (una de sus columnas) se usa esa variable de lluvia antecedente.
+    """
+    sensores, desde, hasta = normalizar_filtros(_ejes(matrices, corrida), sensores, desde, hasta)
+    clave = clave_consulta('correlacion', version, corrida, sensores, desde, hasta,
+                           max_retardo=max_retardo, respuesta=respuesta, variable_lluvia=variable_lluvia)
+
+    def construir():
+        filtrada = _filtrar(matrices, corrida, sensores, desde, hasta)
+        if variable_lluvia is None:
+            lluvia = _lluvia(matrices, indice_prec, corrida, desde, hasta)
+        else:
+            lluvia = serie_para(filtrada, antecedentes, variable_lluvia)
+        with perfil.etapa('correlación') as e:
+            return e.anotar(tabla_retardos(filtrada, lluvia, max_retardo=max_retardo, respuesta=respuesta))
+
+    return _memorizar(clave, construir)
+
+
+def consultar_tendencia(matrices, corrida, sensores=None, desde=None, hasta=None, version=None):
+    """Velocidad lineal, aceleración y RMSE por sensor (ver :mod:`dinsar.tendencia`)."""
+    sensores, desde, hasta = normalizar_filtros(_ejes(matrices, corrida), sensores, desde, hasta)
+    clave = clave_consulta('tendencia', version, corrida, sensores, desde, hasta)
+
+    def construir():
+        filtrada = _filtrar(matrices, corrida, sensores, desde, hasta)
+        with perfil.etapa('tendencia') as e:
+            return e.anotar(ajustar(filtrada))
+
+    return _memorizar(clave, construir)
+
+
+def consultar_resumen(matrices, corrida, version=None):
+    """Por sensor: acumulado y velocidad (ver :func:`dinsar.matriz.resumen_sensores`) más la tendencia."""
+    clave = clave_consulta('resumen', version, corrida, None, None, None)
+
+    def construir():
+        tendencia = consultar_tendencia(matrices, corrida, version=version)
+        m = _filtrar(matrices, corrida, None, None, None)
+        return resumen_sensores(m).join(tendencia.drop(columns=['sensor', 'n_obs']))
+
+    return _memorizar(clave, construir)
+
+
+def consultar_mapa(matrices, indice, corrida, variable='velocidad', caja=None, version=None,
+                   umbral=None):
+    """Puntos PS de ``corrida`` visibles en ``caja`` y su mapa.
+
+    ``matrices`` es un dict corrida -> matriz o un
+    :class:`~dinsar.particionado.Particionado`; con el dataset solo se lee la
+    corrida pedida. ``indice`` es el :class:`~dinsar.espacial.IndiceEspacial` de las
+    coordenadas y ``caja`` es ``(oeste, sur, este, norte)``; ``None`` = todos
+    los puntos. ``tabla`` trae los puntos visibles (sensor, lon, lat, las
+    columnas de :func:`consultar_resumen` y ``valor``) y ``matriz`` sus series. Si los puntos
+    visibles superan ``umbral`` la figura muestra hexágonos con el valor medio
+    y ``hexagonal`` es verdadero.
+    """
+    ejes = _ejes(matrices, corrida)
+    caja = tuple(float(c) for c in (caja or indice.extension))
+    umbral = UMBRAL_PUNTOS_MAPA if umbral is None else umbral
+    clave = clave_consulta('mapa', version, corrida, None, None, None,
+                           variable=variable, caja=caja, umbral=umbral)
+
+    def construir():
+        resumen = consultar_resumen(matrices, corrida, version)
+        with perfil.etapa('puntos en la caja') as e:
+            pos = en_caja(indice, *caja)
+            sensores = indice.sensores[pos]
+            # Solo los sensores de esta corrida (ejes.sensores está ordenado)
+            fila = np.searchsorted(ejes.sensores, sensores).clip(0, max(len(ejes.sensores) - 1, 0))
+            en_corrida = ejes.sensores[fila] == sensores if len(ejes.sensores) else np.zeros(len(pos), bool)
+            pos, fila = pos[en_corrida], fila[en_corrida]
+            tabla = pd.DataFrame({
+                'sensor': indice.sensores[pos], 'lon': indice.lon[pos], 'lat': indice.lat[pos],
+                **{c: resumen[c].to_numpy()[fila] for c in resumen.columns if c != 'sensor'},
+            })
+            tabla['valor'] = tabla[variable]
+            e.anotar(tabla)
+        hexagonal = len(tabla) > umbral
+        with perfil.etapa('figura') as e:
+            if hexagonal:
+                oeste, sur, este, norte = caja
+                tam = max(este - oeste, norte - sur, 1e-6) / HEXAGONOS_POR_LADO
+                datos = e.anotar(hexagonos(tabla['lon'], tabla['lat'], tabla['valor'], tam))
+            else:
+                datos = tabla
+            figura = figura_mapa(datos, variable, caja, hexagonal=hexagonal)
+        puntos = np.unique(tabla['sensor'].to_numpy(dtype=np.int32))
+        return ResultadoConsulta(clave=clave, matriz=_filtrar(matrices, corrida, puntos, None, None),
+                                 figura=figura, tabla=tabla, hexagonal=hexagonal)
+
+    return _memorizar(clave, construir)
@@ -0,0 +1,115 @@
+"""Correlación cruzada con retardo entre precipitación y desplazamiento.
+
+Para cada sensor de una corrida se calcula la correlación de Pearson entre la
+lluvia de la adquisición ``t - k`` y la respuesta del sensor en ``t`` para
+``k = 0 .. max_retardo`` (retardos en número de adquisiciones). Todo se
+resuelve con productos matriz-vector sobre la matriz fechas × sensores: el
+único bucle es sobre los retardos, nunca sobre los sensores (salvo por
+bloques de sensores en matrices grandes). Los NaN (huecos del sensor o fechas
+sin lluvia) se excluyen por pares mediante máscaras.
+"""
+import numpy as np
+import pandas as pd
+
+from dinsar.eventos import deltas
+from dinsar.matriz import BLOQUE_BYTES, bloques_de_sensores
+
+# Mínimo de pares válidos para considerar una correlación
+PARES_MIN = 5
+
+
+def alinear_lluvia(m, lluvia):
+    """Serie de lluvia alineada a las fechas de ``m`` (NaN donde no hay registro).
+
+    ``lluvia`` tiene columnas ``fecha`` y ``rainfall``; los registros de una
+    misma fecha se suman.
+    """
+    por_fecha = lluvia.groupby('fecha')['rainfall'].sum()
+    por_fecha.index = pd.DatetimeIndex(por_fecha.index).as_unit('ns')
+    return por_fecha.reindex(pd.DatetimeIndex(m.fechas).as_unit('ns')).to_numpy(dtype=np.float64)
+
+
+def correlacion_con_retardo(m, lluvia, max_retardo=6, respuesta='delta'):
+    """Matriz de correlaciones (n_retardos, n_sensores) y pares usados en cada una.
+
+    ``respuesta`` elige qué se correlaciona con la lluvia: ``'delta'`` (cambio
+    desde la adquisición anterior, por defecto) o ``'valor'`` (desplazamiento).
+    Devuelve ``(corr, pares)``; ``corr`` es NaN donde hay menos de
+    ``PARES_MIN`` pares o varianza nula.
+    """
+    if respuesta not in ('delta', 'valor'):
+        raise ValueError(f"Respuesta desconocida: {respuesta!r} (usar 'delta' o 'valor')")
+    r = alinear_lluvia(m, lluvia) if isinstance(lluvia, pd.DataFrame) else np.asarray(lluvia, dtype=np.float64)
+    # La matriz en float64 y sus máscaras ocupan varias veces el bloque: bloques más chicos
+    partes = [_correlacion_bloque(b, r, max_retardo, respuesta)
+              for b in bloques_de_sensores(m, BLOQUE_BYTES // 4)]
+    return np.concatenate([c for c, _ in partes], axis=1), np.concatenate([p for _, p in partes], axis=1)
+
+
+def _correlacion_bloque(m, r, max_retardo, respuesta):
+    y = deltas(m)[0].astype(np.float64) if respuesta == 'delta' else m.valores.astype(np.float64)
+
+    y_valido = ~np.isnan(y)
+    y_mask = y_valido.astype(np.float64)
+    y0 = np.where(y_valido, y, 0.0)
+    y0_2 = y0 * y0
+
+    n_fechas, n_sensores = y.shape
+    n_retardos = max_retardo + 1
+    corr = np.full((n_retardos, n_sensores), np.nan)
+    pares = np.zeros((n_retardos, n_sensores), dtype=np.int64)
+
+    for k in range(min(n_retardos, n_fechas)):
+        # Lluvia desplazada k adquisiciones: r_k[t] = r[t - k]
+        rk = np.full(n_fechas, np.nan)
+        rk[k:] = r[:n_fechas - k]
+        r_valido = ~np.isnan(rk)
+        rv = r_valido.astype(np.float64)
+        r0 = np.where(r_valido, rk, 0.0)
+
+        n = rv @ y_mask
+        sx = r0 @ y_mask
+        sxx = (r0 * r0) @ y_mask
+        sy = rv @ y0
+        syy = rv @ y0_2
+        sxy = r0 @ y0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = sxy - sx * sy / n
+            var_x = sxx - sx * sx / n
+            var_y = syy - sy * sy / n
+            c = cov / np.sqrt(var_x * var_y)
+        c[(n < PARES_MIN) | ~(var_x > 0) | ~(var_y > 0)] = np.nan
+        corr[k] = np.clip(c, -1.0, 1.0)
+        pares[k] = n.astype(np.int64)
+
+    return corr, pares
+
+
+def tabla_retardos(m, lluvia, max_retardo=6, respuesta='delta'):
+    """Mejor retardo y fuerza de la correlación de cada sensor, ordenado por ``|r|``.
+
+    Columnas: sensor, retardo (adquisiciones), retardo_dias (mediana de días
+    que separan adquisiciones a ese retardo), correlacion (con signo), pares.
+    """
+    corr, pares = correlacion_con_retardo(m, lluvia, max_retardo, respuesta)
+    fuerza = np.where(np.isnan(corr), -np.inf, np.abs(corr))
+    mejor = fuerza.argmax(axis=0)
+    cols = np.arange(corr.shape[1])
+    con_dato = np.isfinite(fuerza[mejor, cols])
+
+    dia = m.fechas.astype('datetime64[D]').astype(np.int64)
+    dias_por_retardo = np.array([
+        np.median(dia[k:] - dia[:len(dia) - k]) if k < len(dia) else np.nan
+        for k in range(corr.shape[0])
+    ])
+
+    tabla = pd.DataFrame({
+        'sensor': m.sensores[con_dato],
+        'retardo': mejor[con_dato],
+        'retardo_dias': dias_por_retardo[mejor[con_dato]],
+        'correlacion': corr[mejor, cols][con_dato],
+        'pares': pares[mejor, cols][con_dato],
+    })
+    orden = np.argsort(-np.abs(tabla['correlacion'].to_numpy()), kind='stable')
+    return tabla.iloc[orden].reset_index(drop=True)
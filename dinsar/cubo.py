@@ -0,0 +1,160 @@
+"""Cubos en disco: la matriz fechas × sensores de cada corrida como ``.npy`` con mmap.
+
+Para corridas que no conviene tener en memoria, junto al CSV se escribe un
+directorio ``<archivo>.cubo/`` con, por corrida:
+
+- ``corrida<N>.valores.npy``: matriz float32 (n_fechas, n_sensores) en orden C,
+  con las filas ordenadas por fecha y las columnas por ID de sensor;
+- ``corrida<N>.ejes.npz``: ``fechas``, ``sensores`` (el índice de IDs, int32
+  ordenado) y ``puntos``;
+
+más ``origen.json`` con la firma de los datos de los que salió (se escribe
+al final: un cubo a medio construir nunca se abre). :func:`abrir` devuelve
+:class:`~dinsar.matriz.MatrizCorrida` cuyos ``valores`` son un ``np.memmap``
+de solo lectura: el sistema operativo trae del disco solo las páginas que una
+consulta toca (un rango de fechas es un bloque contiguo de filas; un
+subconjunto de sensores, un tramo de cada fila).
+
+:func:`escribir` arma los cubos recorriendo los datos por lotes de filas, así
+que construirlos tampoco necesita la matriz completa en memoria.
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from dinsar.matriz import MatrizCorrida, bloques, columnas_de_sensor
+
+EXTENSION = '.cubo'
+ORIGEN = 'origen.json'
+
+# Memoria máxima de cada lote de filas al construir los cubos
+BYTES_LOTE = 64 * 2**20
+
+
+def ruta_cubos(path):
+    """Directorio de cubos de un CSV de corridas."""
+    return Path(path).with_suffix(EXTENSION)
+
+
+def _archivos(directorio, corrida):
+    return directorio / f'corrida{corrida}.valores.npy', directorio / f'corrida{corrida}.ejes.npz'
+
+
+def origen_guardado(directorio):
+    """Firma de los datos con que se construyeron los cubos, o ``None``."""
+    try:
+        return (Path(directorio) / ORIGEN).read_text(encoding='utf-8')
+    except OSError:
+        return None
+
+
+def abrir(directorio, origen):
+    """Dict corrida -> matriz con ``valores`` en mmap, o ``None`` si los cubos no son de ``origen``."""
+    directorio = Path(directorio)
+    if origen_guardado(directorio) != origen:
+        return None
+    matrices = {}
+    for ruta_ejes in sorted(directorio.glob('corrida*.ejes.npz')):
+        corrida = int(ruta_ejes.name[len('corrida'):-len('.ejes.npz')])
+        ruta_valores, _ = _archivos(directorio, corrida)
+        with np.load(ruta_ejes) as ejes:
+            fechas, sensores, puntos = ejes['fechas'], ejes['sensores'], ejes['puntos']
+        matrices[corrida] = MatrizCorrida(
+            corrida=corrida, fechas=fechas, sensores=sensores, puntos=puntos.astype(object),
+            valores=np.load(ruta_valores, mmap_mode='r'),
+        )
+    return matrices
+
+
+def _a_numpy(lote):
+    # Columnas float (null -> NaN) lado a lado, ya en float32
+    valores = np.empty((lote.num_rows, lote.num_columns), dtype=np.float32)
+    for j, columna in enumerate(lote.columns):
+        valores[:, j] = columna.to_numpy(zero_copy_only=False)
+    return valores
+
+
+def escribir(directorio, lotes, columnas_sensor, origen, bytes_lote=BYTES_LOTE):
+    """Construye los cubos de todas las corridas de un archivo.
+
+    ``lotes(columnas, filas)`` devuelve un iterable de ``RecordBatch`` con
+    esas columnas y a lo sumo ``filas`` filas cada uno, siempre en el mismo
+    orden de filas; ``columnas_sensor`` son los nombres (IDs) de las columnas
+    de sensor. El resultado es el mismo que :func:`~dinsar.matriz.desde_ancho`
+    sobre la tabla completa: filas por fecha, sensores ordenados y sin los que
+    no tienen ningún valor. Devuelve lo mismo que :func:`abrir`.
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    (directorio / ORIGEN).unlink(missing_ok=True)
+    # Una versión anterior todavía abierta conserva sus páginas: borrar un
+    # archivo con mmap no invalida el mapeo
+    for viejo in directorio.glob('corrida*'):
+        viejo.unlink()
+
+    # 1) Ejes: fecha, corrida y punto de todas las filas (pocas columnas)
+    claves = pa.Table.from_batches(list(lotes(['fecha', 'corrida', 'punto'], None)))
+    fechas = claves['fecha'].to_numpy().astype('datetime64[ns]')
+    corridas = claves['corrida'].to_numpy()
+    puntos = claves['punto'].to_pandas(types_mapper=pd.ArrowDtype).astype(str).to_numpy(dtype=object)
+
+    columnas_sensor, ids = columnas_de_sensor(columnas_sensor)
+    orden_s = np.argsort(ids, kind='stable')
+    columnas = [columnas_sensor[j] for j in orden_s]
+    ids = ids[orden_s]
+
+    # Fila de destino (dentro del cubo de su corrida) de cada fila del archivo
+    destino = np.empty(len(fechas), dtype=np.int64)
+    cubos, validos, ordenes = {}, {}, {}
+    for corrida in np.unique(corridas):
+        filas = np.flatnonzero(corridas == corrida)
+        orden = filas[np.argsort(fechas[filas], kind='stable')]
+        destino[orden] = np.arange(len(orden))
+        ordenes[int(corrida)] = orden
+        cubos[int(corrida)] = np.lib.format.open_memmap(
+            directorio / f'corrida{int(corrida)}.tmp.npy', mode='w+', dtype=np.float32,
+            shape=(len(orden), len(ids)),
+        )
+        validos[int(corrida)] = np.zeros(len(ids), dtype=bool)
+
+    # 2) Valores: por lotes de filas, cada fila a su lugar en el cubo de su corrida
+    filas_lote = max(1, bytes_lote // max(8 * len(ids), 1))
+    inicio = 0
+    for lote in lotes(columnas, filas_lote):
+        valores = _a_numpy(lote)
+        fin = inicio + lote.num_rows
+        for corrida in np.unique(corridas[inicio:fin]):
+            en_lote = np.flatnonzero(corridas[inicio:fin] == corrida)
+            cubos[int(corrida)][destino[inicio + en_lote]] = valores[en_lote]
+            validos[int(corrida)] |= ~np.isnan(valores[en_lote]).all(axis=0)
+        inicio = fin
+
+    # 3) Sin los sensores vacíos de cada corrida, más sus ejes
+    for corrida in list(cubos):
+        cubo = cubos.pop(corrida)
+        ruta_valores, ruta_ejes = _archivos(directorio, corrida)
+        con_datos = validos[corrida]
+        cubo.flush()
+        if con_datos.all():
+            del cubo
+            os.replace(directorio / f'corrida{corrida}.tmp.npy', ruta_valores)
+        else:
+            final = np.lib.format.open_memmap(ruta_valores, mode='w+', dtype=np.float32,
+                                              shape=(cubo.shape[0], int(con_datos.sum())))
+            for ini, fin in bloques(cubo.shape[0], 4 * cubo.shape[1], bytes_lote):
+                final[ini:fin] = cubo[ini:fin][:, con_datos]
+            final.flush()
+            del cubo, final
+            (directorio / f'corrida{corrida}.tmp.npy').unlink()
+        orden = ordenes[corrida]
+        np.savez(ruta_ejes, fechas=fechas[orden], sensores=ids[con_datos],
+                 puntos=puntos[orden].astype(str))
+
+    tmp = directorio / f'{ORIGEN}.{os.getpid()}.tmp'
+    tmp.write_text(origen, encoding='utf-8')
+    os.replace(tmp, directorio / ORIGEN)
+    return abrir(directorio, origen)
+
@@ -0,0 +1,259 @@
+"""Capa de datos compartida de las páginas: cargadores memorizados con Streamlit.
+
+Las páginas no deben importarse entre sí; todas leen desde aquí. La lectura
+en sí (ingesta de cada CSV a un Parquet tipado, matrices y tablas) está en
+:mod:`dinsar.lectura`, sin Streamlit; aquí se memoriza por ruta + fecha de
+modificación + tamaño, de modo que un cambio en ``data/`` invalida el caché y
+regenera el Parquet automáticamente.
+
+Los datos cargados se guardan una sola vez por proceso (``st.cache_resource``)
+y todas las sesiones reciben los mismos objetos, no copias: los arreglos
+compartidos están en solo lectura y los DataFrames se comparten con
+Copy-on-Write, así que filtrar devuelve vistas y cualquier modificación en una
+página copia solo lo modificado. Los desplazamientos se cargan como dataset
+particionado (:func:`cargar_dataset`); las matrices completas no quedan en
+memoria. La memoria crece con las versiones de los
+datos y los resultados de consulta distintos, no con las sesiones.
+"""
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from dinsar import particionado, perfil
+from dinsar.espacial import indexar_puntos
+from dinsar.indice import indexar
+from dinsar.lectura import (
+    DIR_DATOS, PATRON_CORRIDAS, RUTA_COORDS, RUTA_PREC, candado_de, firma_archivo, firmas_corridas,
+    ingerir_coordenadas, ingerir_precipitacion, leer_agregadas, leer_coordenadas, leer_matrices_con_posiciones,
+    leer_precipitacion, olvidar, refrescar_corridas, version_datos,
+)
+from dinsar.lluvia import tabla_antecedente
+from dinsar.piramide import construir_piramide
+
+# Dataset particionado (ver dinsar.particionado), junto a la precipitación
+NOMBRE_DATASET = "dataset"
+# Resultados del procesamiento por lotes (python -m dinsar.lote data/ resultados/)
+DIR_RESULTADOS = Path(os.environ.get('DINSAR_RESULTADOS', DIR_DATOS.parent / "resultados"))
+
+# Subir esta versión obliga a reescribir el dataset particionado
+_VERSION_PARTICIONADO = 4
+
+# Versiones de los datos que se mantienen en memoria a la vez (la actual y la
+# anterior, mientras las sesiones abiertas pasan a la nueva)
+VERSIONES_EN_MEMORIA = 2
+
+# Con pandas 2.x Copy-on-Write es opcional; desde pandas 3 siempre está activo
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Ingesta en segundo plano de los archivos nuevos o modificados de data/
+VIGILAR = os.environ.get('DINSAR_VIGILAR', '1').lower() not in ('0', 'false', 'no')
+
+
+# Cargadores memorizados para las páginas
+
+# Una sola copia por proceso, compartida por todas las sesiones (ver el
+# docstring del módulo): nadie debe modificar lo que devuelven.
+_compartido = st.cache_resource(show_spinner=False, max_entries=VERSIONES_EN_MEMORIA)
+
+
+@_compartido
+def _prec_cacheado(firma):
+    perfil.fallo_cache()
+    df, rechazos = leer_precipitacion(firma[0])
+    indice = indexar(df, ['corrida'])
+    indice.fechas.flags.writeable = False
+    return indice, rechazos
+
+
+@_compartido
+def _piramide_cacheado(firma):
+    perfil.fallo_cache()
+    return construir_piramide(_prec_cacheado(firma)[0].df)
+
+
+@_compartido
+def _antecedente_cacheado(firmas, firma_prec):
+    perfil.fallo_cache()
+    return tabla_antecedente(_dataset_cacheado(firmas, firma_prec).ejes, _prec_cacheado(firma_prec)[0])
+
+
+@_compartido
+def _espacial_cacheado(firma):
+    perfil.fallo_cache()
+    coords = leer_coordenadas(firma[0])
+    return indexar_puntos(coords['sensor'], coords['lon'], coords['lat'])
+
+
+@_compartido
+def _dataset_cacheado(firmas, firma_prec):
+    perfil.fallo_cache()
+    raiz = Path(firma_prec[0]).parent / NOMBRE_DATASET
+    origen = json.dumps({'version': _VERSION_PARTICIONADO, 'corridas': firmas, 'precipitacion': firma_prec})
+    dataset = particionado.abrir(raiz, origen)
+    if dataset is None:
+        with candado_de(raiz), perfil.etapa("dataset particionado"):
+            dataset = particionado.abrir(raiz, origen)
+            if dataset is None:
+                paths = [ruta for ruta, _, _ in firmas]
+                lluvia, _ = leer_precipitacion(firma_prec[0])
+                anterior = particionado.ultima(raiz, excluir=particionado.ruta_version(raiz, origen))
+                try:
+                    dataset = _escribir_dataset(raiz, origen, paths, lluvia, anterior)
+                except OSError:
+                    # La versión anterior se podó mientras tanto: todo desde los CSV
+                    dataset = _escribir_dataset(raiz, origen, paths, lluvia, None)
+    return dataset
+
+
+def _escribir_dataset(raiz, origen, paths, lluvia, anterior):
+    # Los archivos que desde la versión ``anterior`` solo recibieron filas al
+    # final aportan solo esas filas (ver particionado.escribir); el resto se
+    # lee completo. Si las filas nuevas traen una corrida de otro archivo se
+    # lee todo completo, para que mande el orden de ``paths`` (ver leer_matrices).
+    previas = anterior.posiciones if anterior is not None else {}
+    leidas = {}
+    for path in paths:
+        try:
+            leida = leer_agregadas(path, previas.get(str(path)))
+        except Exception:
+            # La lectura completa reporta el error
+            leida = None
+        if leida is not None:
+            leidas[str(path)] = leida
+    completos = [p for p in paths if str(p) not in leidas]
+    matrices, rechazos, errores, posiciones = leer_matrices_con_posiciones(completos)
+
+    agregadas = {}
+    for ruta, (posicion, nuevas, reporte) in leidas.items():
+        propias = set(previas[ruta]['corridas'])
+        corridas = propias | set(nuevas)
+        if corridas & (set(matrices) | set(agregadas)) or (set(nuevas) - propias) & set(anterior.ejes):
+            completos, agregadas = paths, {}
+            matrices, rechazos, errores, posiciones = leer_matrices_con_posiciones(paths)
+            break
+        agregadas.update({c: nuevas.get(c) for c in corridas})
+        posiciones[ruta] = {**posicion, 'corridas': sorted(corridas)}
+        if not reporte.empty:
+            rechazos[ruta] = reporte
+
+    rechazos = {str(p): rechazos[str(p)] for p in paths if str(p) in rechazos}
+    dataset = particionado.escribir(raiz, matrices, lluvia, origen, rechazos, errores,
+                                    agregadas=agregadas, anterior=anterior, posiciones=posiciones)
+    # Las consultas leen del dataset: las matrices no quedan en memoria
+    olvidar(completos)
+    return dataset
+
+
+@_compartido
+def _resultados_cacheado(directorio, firma_resumen, version, tablas):
+    perfil.fallo_cache()
+    from dinsar.lote import leer_resultados
+
+    return leer_resultados(directorio, version=version, tablas=tablas)
+
+
+@st.cache_resource(show_spinner=False)
+def iniciar_vigilancia(directorio=DIR_DATOS):
+    """Arranca, una vez por proceso, la ingesta en segundo plano de ``directorio``.
+
+    Ver :mod:`dinsar.vigilancia`. Desactivable con ``DINSAR_VIGILAR=0``.
+    """
+    from dinsar.vigilancia import vigilar
+
+    def al_cambiar(path):
+        if path.name == RUTA_PREC.name:
+            ingerir_precipitacion(path)
+        elif path.name == RUTA_COORDS.name:
+            ingerir_coordenadas(path)
+        else:
+            refrescar_corridas(path)
+
+    return vigilar(directorio, [PATRON_CORRIDAS, RUTA_PREC.name, RUTA_COORDS.name], al_cambiar)
+
+
+def _vigilar():
+    if VIGILAR and DIR_DATOS.is_dir():
+        iniciar_vigilancia()
+
+
+def cargar_dataset(paths=None, path_prec=None):
+    """Desplazamientos y precipitación como :class:`~dinsar.particionado.Particionado`.
+
+    Se escribe una vez por versión de los datos (y se reutiliza entre
+    procesos); una versión nueva solo escribe las corridas que cambiaron o sus
+    adquisiciones agregadas (ver :mod:`dinsar.particionado`). De los CSV que
+    solo crecieron por el final se leen únicamente las filas nuevas (ver
+    :func:`dinsar.lectura.leer_agregadas`); las matrices que sí se leen
+    completas se liberan después: las consultas leen del dataset solo la
+    corrida, los sensores y las fechas pedidas.
+    """
+    _vigilar()
+    return _dataset_cacheado(firmas_corridas(paths), firma_archivo(path_prec or RUTA_PREC))
+
+
+def cargar_indice_prec(path=None):
+    """Precipitaciones como :class:`~dinsar.indice.TablaIndexada` por corrida."""
+    _vigilar()
+    return _prec_cacheado(firma_archivo(path or RUTA_PREC))[0]
+
+
+def cargar_piramide_lluvia(path=None):
+    """Agregados de lluvia por corrida en varias resoluciones (ver :mod:`dinsar.piramide`).
+
+    Se construyen una vez por versión del archivo de precipitación.
+    """
+    _vigilar()
+    return _piramide_cacheado(firma_archivo(path or RUTA_PREC))
+
+
+def reporte_rechazos_prec(path=None):
+    """Reporte de valores rechazados al leer la precipitación."""
+    return _prec_cacheado(firma_archivo(path or RUTA_PREC))[1]
+
+
+def cargar_lluvia_antecedente(paths=None, path_prec=None):
+    """Lluvia antecedente por adquisición (ver :func:`dinsar.lluvia.tabla_antecedente`).
+
+    Se calcula una vez por versión de los datos y se memoriza junto a ellos.
+    """
+    return _antecedente_cacheado(firmas_corridas(paths), firma_archivo(path_prec or RUTA_PREC))
+
+
+def cargar_indice_espacial(path=None):
+    """:class:`~dinsar.espacial.IndiceEspacial` de los puntos PS, o ``None`` sin archivo de coordenadas."""
+    path = Path(path or RUTA_COORDS)
+    if not path.exists():
+        return None
+    return _espacial_cacheado(firma_archivo(path))
+
+
+def cargar_resultados(tablas, paths=None, path_prec=None, directorio=None):
+    """Tablas precalculadas por :mod:`dinsar.lote` si siguen vigentes, o ``None``.
+
+    Se leen de ``DIR_RESULTADOS`` (``DINSAR_RESULTADOS``) una vez por versión
+    de los datos y de los resultados. ``None`` si no hay resultados, si falta
+    alguna de ``tablas`` o si los CSV cambiaron desde que se generaron: la
+    página calcula entonces por consulta, como siempre.
+    """
+    from dinsar.lote import RESUMEN
+
+    directorio = Path(directorio or DIR_RESULTADOS)
+    if not (directorio / RESUMEN).exists():
+        return None
+    return _resultados_cacheado(str(directorio), firma_archivo(directorio / RESUMEN),
+                                version_datos(paths, path_prec), tuple(tablas))
+
+
+def limpiar_cache():
+    """Invalida explícitamente los cargadores memorizados."""
+    _prec_cacheado.clear()
+    _piramide_cacheado.clear()
+    _antecedente_cacheado.clear()
+    _dataset_cacheado.clear()
+    _espacial_cacheado.clear()
+    _resultados_cacheado.clear()
+    olvidar()
@@ -0,0 +1,151 @@
+"""Índice espacial de los puntos PS y agregación en hexágonos para el mapa.
+
+Las coordenadas de los sensores se indexan en una grilla uniforme lon/lat:
+los puntos se ordenan por celda (fila por fila) y se guarda dónde empieza
+cada celda, como una matriz dispersa CSR. Las celdas de una fila de la
+grilla son contiguas, así que una consulta por caja es un corte por fila que
+la caja toca más un filtro exacto sobre esos candidatos; nunca se recorren
+todos los puntos. La selección en el mapa es por caja (el área visible) más
+clic en puntos individuales: el mapa de pydeck no ofrece lazo.
+
+Con muchos puntos visibles el mapa no envía puntos sino hexágonos agregados
+en el servidor (:func:`hexagonos`).
+"""
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Puntos visibles a partir de los cuales el mapa muestra hexágonos
+UMBRAL_PUNTOS_MAPA = int(os.environ.get("DINSAR_PUNTOS_MAPA", 5000))
+
+# Puntos promedio por celda de la grilla del índice
+PUNTOS_POR_CELDA = 16
+
+
+@dataclass(frozen=True)
+class IndiceEspacial:
+    sensores: np.ndarray   # int32, ordenados por celda
+    lon: np.ndarray
+    lat: np.ndarray
+    origen: tuple          # (lon, lat) de la esquina suroeste de la grilla
+    tam: float             # lado de la celda en grados
+    nx: int
+    ny: int
+    inicios: np.ndarray    # inicios[c]:inicios[c + 1] son los puntos de la celda c
+
+    @property
+    def extension(self):
+        """(oeste, sur, este, norte) de todos los puntos."""
+        if not len(self.lon):
+            return (0.0, 0.0, 0.0, 0.0)
+        return (float(self.lon.min()), float(self.lat.min()), float(self.lon.max()), float(self.lat.max()))
+
+
+def indexar_puntos(sensores, lon, lat, puntos_por_celda=PUNTOS_POR_CELDA):
+    """Construye el :class:`IndiceEspacial` de los puntos ``(sensor, lon, lat)``."""
+    sensores = np.asarray(sensores, dtype=np.int32)
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    n = len(sensores)
+    if n:
+        oeste, sur, ancho, alto = lon.min(), lat.min(), np.ptp(lon), np.ptp(lat)
+    else:
+        oeste = sur = ancho = alto = 0.0
+    # Celda cuadrada con ~puntos_por_celda puntos si estuvieran distribuidos uniformemente
+    area = max(ancho, 1e-9) * max(alto, 1e-9)
+    tam = float(np.sqrt(area * puntos_por_celda / max(n, 1)))
+    nx = int(ancho // tam) + 1
+    ny = int(alto // tam) + 1
+
+    celda = _celda_y(lat, sur, tam, ny) * nx + _celda_x(lon, oeste, tam, nx)
+    orden = np.argsort(celda, kind='stable')
+    inicios = np.searchsorted(celda[orden], np.arange(nx * ny + 1))
+    sensores, lon, lat = sensores[orden], lon[orden], lat[orden]
+    return IndiceEspacial(sensores=sensores, lon=lon, lat=lat, origen=(float(oeste), float(sur)), tam=tam,
+                          nx=nx, ny=ny, inicios=inicios)
+
+
+def _celda_x(lon, oeste, tam, nx):
+    return np.clip(np.floor((np.asarray(lon) - oeste) / tam), 0, nx - 1).astype(np.int64)
+
+
+def _celda_y(lat, sur, tam, ny):
+    return np.clip(np.floor((np.asarray(lat) - sur) / tam), 0, ny - 1).astype(np.int64)
+
+
+def en_caja(indice, oeste, sur, este, norte):
+    """Posiciones (en el índice) de los puntos dentro de la caja, bordes incluidos."""
+    if not len(indice.sensores) or este < oeste or norte < sur:
+        return np.empty(0, dtype=np.int64)
+    x0, y0 = indice.origen
+    ix0, ix1 = _celda_x([oeste, este], x0, indice.tam, indice.nx)
+    iy0, iy1 = _celda_y([sur, norte], y0, indice.tam, indice.ny)
+    filas = np.arange(iy0, iy1 + 1) * indice.nx
+    inicios = indice.inicios[filas + ix0]
+    fines = indice.inicios[filas + ix1 + 1]
+    candidatos = np.concatenate([np.arange(i, f) for i, f in zip(inicios, fines)])
+    lon, lat = indice.lon[candidatos], indice.lat[candidatos]
+    dentro = (lon >= oeste) & (lon <= este) & (lat >= sur) & (lat <= norte)
+    return candidatos[dentro]
+
+
+def _hex_redondear(q, r):
+    # Redondeo de coordenadas axiales fraccionarias al hexágono más cercano
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    corregir_q = (dq > dr) & (dq > ds)
+    corregir_r = ~corregir_q & (dr > ds)
+    rq = np.where(corregir_q, -rr - rs, rq)
+    rr = np.where(corregir_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def hexagonos(lon, lat, valores, tam):
+    """Agrega puntos en hexágonos de ``tam`` grados (radio, en latitud).
+
+    Devuelve un DataFrame con una fila por hexágono ocupado: centro
+    (``lon``, ``lat``), ``n`` puntos, ``valor`` promedio (ignorando NaN) y
+    ``poligono`` (lista de vértices ``[lon, lat]``) listo para una capa de
+    polígonos de pydeck.
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    valores = np.asarray(valores, dtype=np.float64)
+    columnas = ['lon', 'lat', 'n', 'valor', 'poligono']
+    if not len(lon):
+        return pd.DataFrame(columns=columnas)
+
+    # Proyección equirectangular local para que los hexágonos sean regulares
+    escala = np.cos(np.radians(lat.mean()))
+    x, y = lon * escala, lat
+    q = (np.sqrt(3) / 3 * x - y / 3) / tam
+    r = (2 / 3 * y) / tam
+    q, r = _hex_redondear(q, r)
+
+    claves, inversa, n = np.unique(np.column_stack((q, r)), axis=0, return_inverse=True, return_counts=True)
+    inversa = inversa.ravel()
+    validos = ~np.isnan(valores)
+    suma = np.bincount(inversa, weights=np.where(validos, valores, 0.0), minlength=len(claves))
+    con_valor = np.bincount(inversa, weights=validos, minlength=len(claves))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        valor = suma / con_valor
+
+    cq, cr = claves[:, 0], claves[:, 1]
+    cx = tam * np.sqrt(3) * (cq + cr / 2)
+    cy = tam * 1.5 * cr
+    angulos = np.radians(60 * np.arange(6) - 30)
+    vx = (cx[:, None] + tam * np.cos(angulos)) / escala
+    vy = cy[:, None] + tam * np.sin(angulos)
+    poligonos = np.stack((vx, vy), axis=-1).tolist()
+    return pd.DataFrame({
+        'lon': cx / escala, 'lat': cy, 'n': n, 'valor': valor, 'poligono': poligonos,
+    }, columns=columnas)
+
+
+def zoom_para(oeste, sur, este, norte):
+    """Nivel de zoom web-mercator aproximado para encuadrar la caja."""
+    extension = max(este - oeste, (norte - sur) * 1.5, 1e-6)
+    return float(np.clip(np.log2(360 / extension), 0, 20))
@@ -0,0 +1,137 @@
+"""Motor de detección de eventos: mayores cambios de desplazamiento.
+
+Trabaja sobre :class:`~dinsar.matriz.MatrizCorrida` con operaciones de arreglo
+para todos los sensores a la vez (sin ``groupby`` ni lambdas por sensor) y
+selecciona los k mayores con ``argpartition``. Los eventos por sensor se
+calculan por bloques de sensores (:func:`~dinsar.matriz.bloques_de_sensores`).
+No depende de Streamlit.
+"""
+import numpy as np
+import pandas as pd
+
+from dinsar.matriz import bloques_de_sensores
+
+COLUMNAS = ['sensor', 'Fecha_Previo', 'fecha', 'Delta', 'Dias', 'Velocidad']
+
+
+def estado_inicial(n_sensores):
+    """Estado de :func:`deltas` sin observaciones previas: ``(ultimo_valor, ultimo_dia)``."""
+    return np.full(n_sensores, np.nan, dtype=np.float32), np.zeros(n_sensores, dtype=np.int32)
+
+
+def deltas(m, estado=None):
+    """Cambio respecto a la observación válida anterior de cada sensor.
+
+    Devuelve ``(delta, dias, velocidad)`` con la forma de ``valores``: ``delta``
+    en mm y ``velocidad`` en mm/día (float32, NaN donde no hay observación
+    previa) y ``dias`` (int32) desde esa observación previa, solo significativo
+    donde ``delta`` no es NaN. Equivale a ``groupby('sensor').shift(1)`` sobre
+    las filas sin NaN.
+
+    ``estado`` (ver :func:`estado_inicial`) es el último valor válido de cada
+    sensor y su día antes de la primera fila de ``m``, p. ej. al final de las
+    adquisiciones anteriores de la corrida; se actualiza en el lugar.
+    """
+    n_fechas, n_sensores = m.valores.shape
+    dia = m.fechas.astype('datetime64[D]').astype(np.int64).astype(np.int32)
+
+    delta = np.empty((n_fechas, n_sensores), dtype=np.float32)
+    dias = np.empty((n_fechas, n_sensores), dtype=np.int32)
+
+    # Barrido por fechas, vectorizado sobre todos los sensores: se arrastra el
+    # último valor válido de cada sensor (un forward-fill de una sola pasada).
+    # Mientras un sensor no tiene observación previa su último valor es NaN,
+    # así que la resta ya deja NaN sin máscaras adicionales.
+    ultimo_valor, ultimo_dia = estado if estado is not None else estado_inicial(n_sensores)
+    for i in range(n_fechas):
+        fila = m.valores[i]
+        np.subtract(fila, ultimo_valor, out=delta[i])
+        np.subtract(dia[i], ultimo_dia, out=dias[i])
+        valido = ~np.isnan(fila)
+        np.copyto(ultimo_valor, fila, where=valido)
+        np.copyto(ultimo_dia, dia[i], where=valido)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        velocidad = delta / dias.astype(np.float32)
+    return delta, dias, velocidad
+
+
+def _puntajes(delta, velocidad, criterio, umbral_velocidad):
+    if criterio == 'delta':
+        puntaje = np.abs(delta)
+    elif criterio == 'velocidad':
+        puntaje = np.abs(velocidad)
+    else:
+        raise ValueError(f"Criterio desconocido: {criterio!r} (usar 'delta' o 'velocidad')")
+    descartar = np.isnan(puntaje)
+    if umbral_velocidad is not None:
+        descartar |= ~(np.abs(velocidad) >= umbral_velocidad)
+    puntaje[descartar] = -np.inf
+    return puntaje
+
+
+def _tabla(m, filas, cols, delta, dias, velocidad):
+    fechas = m.fechas[filas]
+    return pd.DataFrame({
+        'sensor': m.sensores[cols],
+        'Fecha_Previo': fechas - dias[filas, cols].astype('timedelta64[D]'),
+        'fecha': fechas,
+        'Delta': delta[filas, cols],
+        'Dias': dias[filas, cols],
+        'Velocidad': velocidad[filas, cols],
+    }, columns=COLUMNAS)
+
+
+def eventos_globales(m, k=10, criterio='delta', umbral_velocidad=None):
+    """Los ``k`` eventos de mayor ``|Delta|`` (o ``|Velocidad|``) entre todos los sensores.
+
+    ``umbral_velocidad`` (mm/día) descarta los eventos más lentos que ese valor.
+    """
+    delta, dias, velocidad = deltas(m)
+    puntaje = _puntajes(delta, velocidad, criterio, umbral_velocidad).ravel()
+    k = min(k, puntaje.size)
+    if k <= 0:
+        return pd.DataFrame(columns=COLUMNAS)
+
+    mejores = np.argpartition(puntaje, -k)[-k:]
+    mejores = mejores[np.isfinite(puntaje[mejores])]
+    mejores = mejores[np.argsort(-puntaje[mejores], kind='stable')]
+    filas, cols = np.unravel_index(mejores, delta.shape)
+    return _tabla(m, filas, cols, delta, dias, velocidad)
+
+
+def eventos_por_sensor(m, k=1, criterio='delta', umbral_velocidad=None):
+    """Los ``k`` mayores eventos de cada sensor, ordenados por sensor y puntaje."""
+    partes = [_eventos_por_sensor(b, k, criterio, umbral_velocidad) for b in bloques_de_sensores(m)]
+    if len(partes) == 1:
+        return partes[0]
+    return pd.concat([p for p in partes if len(p)] or partes[:1], ignore_index=True)
+
+
+def _eventos_por_sensor(m, k, criterio, umbral_velocidad):
+    delta, dias, velocidad = deltas(m)
+    puntaje = _puntajes(delta, velocidad, criterio, umbral_velocidad)
+    n_fechas = puntaje.shape[0]
+    k = min(k, n_fechas)
+    if k <= 0 or puntaje.size == 0:
+        return pd.DataFrame(columns=COLUMNAS)
+
+    if k == 1:
+        filas = puntaje.argmax(axis=0)
+    else:
+        filas = np.argpartition(puntaje, n_fechas - k, axis=0)[n_fechas - k:]
+        # Ordenar los k de cada sensor de mayor a menor puntaje
+        orden = np.argsort(-np.take_along_axis(puntaje, filas, axis=0), axis=0, kind='stable')
+        filas = np.take_along_axis(filas, orden, axis=0).T.ravel()
+    cols = np.repeat(np.arange(puntaje.shape[1]), k)
+    finitos = np.isfinite(puntaje[filas, cols])
+    return _tabla(m, filas[finitos], cols[finitos], delta, dias, velocidad)
+
+
+def picos_por_sensor(m, umbral_velocidad=None):
+    """Mayor cambio absoluto de cada sensor, ordenado por velocidad descendente.
+
+    Es la tabla "Eventos con Mayor Cambio de Desplazamiento" de la página.
+    """
+    df_picos = eventos_por_sensor(m, k=1, umbral_velocidad=umbral_velocidad)
+    return df_picos.sort_values(by='Velocidad', ascending=False).reset_index(drop=True)
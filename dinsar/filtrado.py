@@ -0,0 +1,122 @@
+"""Filtro de atípicos y de puntos ruidosos para las series de desplazamiento.
+
+Dos etapas, para todos los sensores a la vez:
+
+1. **Hampel**: para cada observación se toma la ventana de ``2·ventana + 1``
+   adquisiciones centrada en ella (ignorando los NaN); si se aleja de la
+   mediana de la ventana más de ``n_sigmas`` veces la MAD escalada
+   (``1.4826·MAD``, un desvío estándar robusto) es un atípico y se quita (NaN).
+   Las ventanas son una vista deslizante sobre la matriz
+   (``sliding_window_view``) y medianas y MAD salen de ordenarlas en bloque,
+   sin bucle por sensor ni por fecha.
+2. **Rechazo de sensores**: los datos no traen la coherencia del
+   procesamiento, así que se estima la coherencia temporal de cada punto con
+   los residuos respecto de la mediana móvil,
+   ``|media(exp(i·4π·r/λ))|`` con la longitud de onda de Sentinel-1 (banda
+   C); se descartan los sensores por debajo de ``coherencia_min`` y, si se
+   pide, los de RMSE del ajuste lineal (:mod:`dinsar.tendencia`) mayor a
+   ``rmse_max``.
+
+No depende de Streamlit.
+"""
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+
+from dinsar.matriz import BLOQUE_BYTES, MatrizCorrida, bloques_de_sensores, seleccionar
+from dinsar.tendencia import ajustar
+
+# Longitud de onda de Sentinel-1 (banda C), en mm
+LONGITUD_ONDA_MM = 55.465763
+
+# Factor que lleva la MAD a un desvío estándar para ruido normal
+ESCALA_MAD = 1.4826
+
+# Observaciones válidas mínimas en una ventana para poder marcar un atípico
+MINIMO_VENTANA = 3
+
+COLUMNAS = ['sensor', 'atipicos', 'coherencia', 'rmse', 'rechazado']
+
+
+@dataclass(frozen=True)
+class ParametrosFiltro:
+    ventana: int = 3
+    n_sigmas: float = 3.0
+    coherencia_min: float = 0.7
+    rmse_max: float = None
+
+    def como_dict(self):
+        return asdict(self)
+
+
+def _mediana_ordenada(ordenadas, n):
+    # Mediana de cada ventana ya ordenada (NaN al final) con ``n`` valores válidos
+    bajo = np.take_along_axis(ordenadas, ((n - 1) // 2).clip(0)[..., None], axis=-1)[..., 0]
+    alto = np.take_along_axis(ordenadas, (n // 2)[..., None].clip(max=ordenadas.shape[-1] - 1), axis=-1)[..., 0]
+    return np.where(n > 0, (bajo + alto) / 2, np.nan)
+
+
+def mediana_movil(valores, ventana):
+    """Mediana y MAD de la ventana centrada de cada celda de ``valores`` (fechas × sensores).
+
+    Devuelve ``(mediana, mad, n)`` con la forma de ``valores``; ``n`` es la
+    cantidad de valores válidos de cada ventana.
+    """
+    relleno = np.full((ventana, valores.shape[1]), np.nan, dtype=np.float32)
+    extendida = np.concatenate([relleno, np.asarray(valores, dtype=np.float32), relleno])
+    ventanas = np.lib.stride_tricks.sliding_window_view(extendida, 2 * ventana + 1, axis=0)
+    ordenadas = np.sort(ventanas, axis=-1)
+    n = (~np.isnan(ordenadas)).sum(axis=-1)
+    mediana = _mediana_ordenada(ordenadas, n)
+    with np.errstate(invalid='ignore'):
+        mad = _mediana_ordenada(np.sort(np.abs(ventanas - mediana[..., None]), axis=-1), n)
+    return mediana, mad, n
+
+
+def _hampel_bloque(valores, parametros):
+    valores = np.asarray(valores)
+    mediana, mad, n = mediana_movil(valores, parametros.ventana)
+    desvio = np.abs(valores - mediana)
+    with np.errstate(invalid='ignore'):
+        atipico = (n >= MINIMO_VENTANA) & (desvio > parametros.n_sigmas * ESCALA_MAD * mad)
+
+    # Coherencia temporal con los residuos respecto de la mediana móvil
+    valido = ~np.isnan(valores)
+    fase = np.where(valido, 4 * np.pi / LONGITUD_ONDA_MM * (valores - mediana), 0)
+    cos, sen = np.where(valido, np.cos(fase), 0).sum(axis=0), np.where(valido, np.sin(fase), 0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coherencia = np.hypot(cos, sen) / valido.sum(axis=0)
+    return np.where(atipico, np.float32(np.nan), valores), atipico.sum(axis=0), coherencia
+
+
+def filtrar_atipicos(m, parametros=None, conservar=()):
+    """Matriz ``m`` sin atípicos ni sensores rechazados, y el informe por sensor.
+
+    ``parametros`` es un :class:`ParametrosFiltro` (``None`` = los valores
+    por defecto). Los sensores en ``conservar`` (p. ej. el punto estable)
+    nunca se rechazan. El informe tiene una fila por sensor de ``m`` con
+    ``atipicos`` quitados, ``coherencia``, ``rmse`` (de la serie ya sin
+    atípicos) y ``rechazado``.
+    """
+    parametros = parametros or ParametrosFiltro()
+    ancho = 2 * parametros.ventana + 1
+    partes = [_hampel_bloque(b.valores, parametros)
+              for b in bloques_de_sensores(m, BLOQUE_BYTES // (4 * ancho))]
+    limpios = np.concatenate([p[0] for p in partes], axis=1) if partes else m.valores
+    atipicos = np.concatenate([p[1] for p in partes])
+    coherencia = np.concatenate([p[2] for p in partes])
+
+    limpia = MatrizCorrida(m.corrida, m.fechas, m.sensores, m.puntos, limpios)
+    rmse = ajustar(limpia)['rmse'].to_numpy()
+    with np.errstate(invalid='ignore'):
+        rechazado = ~(coherencia >= parametros.coherencia_min)
+        if parametros.rmse_max is not None:
+            rechazado |= ~(rmse <= parametros.rmse_max)
+    rechazado &= ~np.isin(m.sensores, np.asarray(conservar, dtype=np.int64))
+
+    informe = pd.DataFrame({
+        'sensor': m.sensores, 'atipicos': atipicos.astype(np.int64), 'coherencia': coherencia,
+        'rmse': rmse, 'rechazado': rechazado,
+    }, columns=COLUMNAS)
+    return seleccionar(limpia, m.sensores[~rechazado]), informe
@@ -0,0 +1,247 @@
+"""Construcción de trazas Plotly a partir de las matrices de desplazamiento.
+
+Con pocos puntos se dibuja una traza SVG por sensor (leyenda por sensor, como
+siempre). Por encima de ``UMBRAL_WEBGL`` puntos se cambia a una sola traza
+``Scattergl`` con el sensor codificado en el color: el navegador ya no tiene
+que manejar miles de trazas y la figura se arma en una sola pasada.
+
+El mapa de puntos PS (:func:`figura_mapa`) es un ``pydeck.Deck``: puntos
+coloreados por velocidad o desplazamiento acumulado, o hexágonos ya
+agregados cuando hay demasiados puntos visibles.
+"""
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+
+from dinsar.espacial import zoom_para
+from dinsar.matriz import bloques_de_sensores, validos_por_fecha
+from dinsar.muestreo import lttb, minmax
+
+# Número de puntos a partir del cual se usa WebGL; configurable por entorno.
+UMBRAL_WEBGL = int(os.environ.get("DINSAR_UMBRAL_WEBGL", 5000))
+
+
+def linea_reducida(x, y, puntos_max=None):
+    """(x, y) de una línea ordenada reducida con LTTB."""
+    x, y = np.asarray(x), np.asarray(y, dtype=np.float64)
+    idx = lttb(x, y, puntos_max)
+    return x[idx], y[idx]
+
+
+def puntos_validos(m):
+    """Coordenadas de todos los valores no NaN de la matriz: (fechas, valores, sensores)."""
+    filas, cols = np.nonzero(~np.isnan(m.valores))
+    return m.fechas[filas], m.valores[filas, cols], m.sensores[cols]
+
+
+def usa_webgl(m, umbral=None):
+    """True si la matriz tiene más puntos válidos que el umbral de WebGL."""
+    umbral = UMBRAL_WEBGL if umbral is None else umbral
+    return int(validos_por_fecha(m).sum()) > umbral
+
+
+def puntos_reducidos(m, puntos_max=None):
+    """Puntos válidos ordenados por fecha y reducidos con mín/máx: (fechas, valores, sensores).
+
+    Se extraen y reducen por bloques de sensores y luego se reduce la unión,
+    así nunca se materializan todos los puntos de una matriz grande.
+    """
+    partes = []
+    for b in bloques_de_sensores(m):
+        x, y, sensores = puntos_validos(b)
+        orden = np.argsort(x, kind='stable')
+        orden = orden[minmax(x[orden], y[orden], puntos_max)]
+        partes.append((x[orden], y[orden], sensores[orden]))
+    if len(partes) == 1:
+        return partes[0]
+    x, y, sensores = (np.concatenate(p) for p in zip(*partes))
+    orden = np.argsort(x, kind='stable')
+    orden = orden[minmax(x[orden], y[orden], puntos_max)]
+    return x[orden], y[orden], sensores[orden]
+
+
+def trazas_sensores(m, yaxis='y', umbral=None, marker=None, nombre='{}', puntos_max=None):
+    """Trazas de dispersión de desplazamiento por sensor para la matriz ``m``.
+
+    Devuelve una lista de trazas: una ``go.Scatter`` por sensor si los puntos
+    no superan ``umbral``, o una única ``go.Scattergl`` coloreada por sensor.
+    Cada traza sale de un corte de columna de la matriz, sin máscaras sobre
+    toda la tabla. ``nombre`` es la plantilla del nombre de cada traza. La
+    traza WebGL se reduce con :func:`~dinsar.muestreo.minmax` a ``puntos_max``.
+    """
+    marker = dict(marker or {})
+
+    if usa_webgl(m, umbral):
+        # Orden temporal y reducción mín/máx antes de enviar al navegador
+        x, y, sensores = puntos_reducidos(m, puntos_max)
+        return [go.Scattergl(
+            x=x,
+            y=y,
+            mode='markers',
+            name=f'Desplazamiento ({len(m.sensores)} sensores)',
+            yaxis=yaxis,
+            customdata=sensores,
+            hovertemplate='Sensor %{customdata}<br>%{x|%Y-%m-%d}<br>%{y:.3f} mm<extra></extra>',
+            marker=dict(marker, color=sensores, colorscale='Turbo', showscale=False),
+        )]
+
+    trazas = []
+    for j, sensor in enumerate(m.sensores):
+        columna = m.valores[:, j]
+        valido = ~np.isnan(columna)
+        if not valido.any():
+            continue
+        trazas.append(go.Scatter(
+            x=m.fechas[valido],
+            y=columna[valido],
+            mode='markers',
+            name=nombre.format(sensor),
+            yaxis=yaxis,
+            marker=marker,
+        ))
+    return trazas
+
+
+def figura_desplazamiento(m, media, corrida, titulo='Desplazamiento'):
+    """Figura de la página de desplazamiento: puntos por sensor + línea de promedio."""
+    fig = go.Figure(trazas_sensores(m))
+    fig.update_layout(
+        title=f"{titulo} - Corrida {corrida}",
+        xaxis_title='Fecha',
+        yaxis_title=f'{titulo} (mm)',
+        legend_title_text='Sensor'
+    )
+
+    # Línea de promedio (reducida con LTTB si tiene demasiados puntos)
+    x_prom, y_prom = linea_reducida(media.index, media.to_numpy())
+    fig.add_trace(
+        go.Scatter(
+            x=x_prom,
+            y=y_prom,
+            mode='lines',
+            name='Promedio',
+            line=dict(color='#56ff68', width=3)
+        )
+    )
+    return fig
+
+
+def figura_cruzada(m, lluvia, corrida):
+    """Figura combinada: desplazamiento (eje izquierdo) y precipitación (eje derecho).
+
+    ``lluvia`` es la precipitación ya agregada por fecha (columnas ``fecha``,
+    ``rainfall``).
+    """
+    fig = go.Figure()
+
+    # Puntos de desplazamiento
+    fig.add_traces(trazas_sensores(
+        m,
+        yaxis='y1',
+        marker=dict(size=6),
+        nombre='Desplazamiento ({})'
+    ))
+
+    # Línea de precipitación
+    if not lluvia.empty:
+        x_lluvia, y_lluvia = linea_reducida(lluvia['fecha'], lluvia['rainfall'])
+        fig.add_trace(
+            go.Scatter(
+                x=x_lluvia,
+                y=y_lluvia,
+                mode='lines',
+                name=f'Precipitación ({corrida})',
+                yaxis='y2',
+                line=dict(shape='spline', width=3, color='#3398FF')
+            )
+        )
+
+    # Layout y ejes
+    fig.update_layout(
+        title_text=f"Corrida {corrida}: Desplazamiento y Precipitación",
+        xaxis_title="Fecha",
+        yaxis=dict(title="Desplazamiento (mm)", side="left"),
+        yaxis2=dict(title="Precipitación (mm)", overlaying="y", side="right"),
+        hovermode="x unified",
+        legend=dict(orientation='v', x=1.10, y=1),
+        template="plotly_dark",
+        margin=dict(l=40, r=40, t=80, b=40)
+    )
+
+    # Ajustar eje X solo al rango de datos filtrados
+    fechas_desp = m.fechas[validos_por_fecha(m) > 0]
+    fechas_validas = np.concatenate([fechas_desp, lluvia['fecha'].to_numpy(dtype='datetime64[ns]')])
+    if len(fechas_validas):
+        fig.update_xaxes(
+            range=[fechas_validas.min(), fechas_validas.max()],
+            tickformat="%b %Y",
+            dtick="M1",
+            tickangle=45
+        )
+    return fig
+
+
+# Variables del mapa: columna de la tabla de puntos -> (etiqueta, unidad)
+VARIABLES_MAPA = {
+    'velocidad': ('Velocidad', 'mm/año'),
+    'acumulado': ('Desplazamiento acumulado', 'mm'),
+    'velocidad_lineal': ('Velocidad (ajuste lineal)', 'mm/año'),
+    'aceleracion': ('Aceleración', 'mm/año²'),
+    'rmse': ('Residuo del ajuste (RMSE)', 'mm'),
+}
+
+
+def colores_divergentes(valores, limite=None):
+    """Colores RGBA (uint8) de una escala divergente centrada en 0.
+
+    Negativo (alejamiento, p. ej. subsidencia) en rojo, positivo en azul y NaN
+    en gris. ``limite`` satura la escala; por defecto es el percentil 95 de
+    ``|valores|``.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    validos = ~np.isnan(valores)
+    if limite is None:
+        limite = np.percentile(np.abs(valores[validos]), 95) if validos.any() else 1.0
+    t = np.clip(np.nan_to_num(valores) / max(limite, 1e-9), -1, 1)[:, None]
+    blanco = np.array([247, 247, 247], dtype=np.float64)
+    rojo = np.array([202, 0, 32], dtype=np.float64)
+    azul = np.array([5, 113, 176], dtype=np.float64)
+    rgb = np.where(t < 0, blanco + (rojo - blanco) * -t, blanco + (azul - blanco) * t)
+    rgb[~validos] = 150
+    alfa = np.full((len(valores), 1), 210.0)
+    return np.hstack((rgb, alfa)).round().astype(np.uint8)
+
+
+def figura_mapa(datos, variable, caja, hexagonal=False):
+    """Mapa pydeck de los puntos (o hexágonos) visibles en ``caja``.
+
+    ``datos`` tiene ``lon``, ``lat`` y ``valor``; con ``hexagonal`` además
+    ``n`` y ``poligono`` (ver :func:`dinsar.espacial.hexagonos`). La capa de
+    puntos se llama ``'puntos'`` y es seleccionable.
+    """
+    # pydeck (y jinja2) solo se importan en la página que dibuja el mapa
+    import pydeck as pdk
+
+    etiqueta, unidad = VARIABLES_MAPA[variable]
+    datos = datos.assign(color=colores_divergentes(datos['valor']).tolist(),
+                         texto=datos['valor'].round(2).astype(str))
+    if hexagonal:
+        capa = pdk.Layer(
+            'PolygonLayer', datos, id='hexagonos', get_polygon='poligono', get_fill_color='color',
+            get_line_color=[80, 80, 80, 120], line_width_min_pixels=1, pickable=True, stroked=True,
+        )
+        tooltip = {'html': f'{{n}} puntos<br>{etiqueta} media: {{texto}} {unidad}'}
+    else:
+        capa = pdk.Layer(
+            'ScatterplotLayer', datos, id='puntos', get_position=['lon', 'lat'], get_fill_color='color',
+            get_radius=4, radius_min_pixels=3, radius_max_pixels=12, pickable=True,
+            auto_highlight=True,
+        )
+        tooltip = {'html': f'Sensor {{sensor}}<br>{etiqueta}: {{texto}} {unidad}'}
+
+    oeste, sur, este, norte = caja
+    vista = pdk.ViewState(longitude=(oeste + este) / 2, latitude=(sur + norte) / 2,
+                          zoom=zoom_para(oeste, sur, este, norte))
+    return pdk.Deck(layers=[capa], initial_view_state=vista, tooltip=tooltip,
+                    map_provider='carto', map_style=pdk.map_styles.CARTO_LIGHT)
@@ -0,0 +1,110 @@
+"""Tablas largas ordenadas con rangos de filas precalculados por clave.
+
+Una :class:`TablaIndexada` guarda el DataFrame ordenado por sus claves (p. ej.
+``corrida`` o ``corrida, sensor``) y luego por ``fecha``, con las claves como
+categóricas. Para cada valor de clave (y cada prefijo de claves) se guarda el
+rango ``(inicio, fin)`` de filas que ocupa, de modo que filtrar es buscar en un
+dict y cortar, y el rango de fechas se resuelve con ``searchsorted`` dentro de
+cada corte, sin máscaras booleanas sobre toda la tabla.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class TablaIndexada:
+    df: pd.DataFrame
+    claves: tuple
+    rangos: dict
+    fechas: np.ndarray
+    hijos: dict
+
+    def valores(self, nivel=0, prefijo=()):
+        """Valores ordenados de la clave ``nivel`` bajo ``prefijo`` (precalculados)."""
+        prefijo = tuple(_clave(v) for v in prefijo)
+        return list(self.hijos.get(prefijo, ())) if len(prefijo) == nivel else []
+
+
+def _clave(valor):
+    # Las claves se normalizan a int cuando se puede: "1" y 1 son la misma corrida
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return valor
+
+
+def indexar(df, claves, columna_fecha='fecha'):
+    """Ordena ``df`` por ``claves`` + ``columna_fecha`` y precalcula los rangos de filas."""
+    claves = tuple(claves)
+    df = df.sort_values(list(claves) + [columna_fecha], kind='stable').reset_index(drop=True)
+    for c in claves:
+        df[c] = df[c].astype('category')
+
+    rangos = {}
+    if len(df):
+        codigos = np.column_stack([df[c].cat.codes.to_numpy() for c in claves])
+        categorias = [df[c].cat.categories.to_numpy() for c in claves]
+        for nivel in range(1, len(claves) + 1):
+            cortes = np.flatnonzero((np.diff(codigos[:, :nivel], axis=0) != 0).any(axis=1)) + 1
+            inicios = np.concatenate(([0], cortes))
+            fines = np.concatenate((cortes, [len(df)]))
+            valores = [categorias[j][codigos[inicios, j]] for j in range(nivel)]
+            for pos, (ini, fin) in enumerate(zip(inicios, fines)):
+                rangos[tuple(_clave(v[pos]) for v in valores)] = (int(ini), int(fin))
+
+    # Valores ordenados de la siguiente clave bajo cada prefijo, para valores()
+    hijos = {}
+    for clave in rangos:
+        hijos.setdefault(clave[:-1], []).append(clave[-1])
+    hijos = {prefijo: tuple(sorted(v)) for prefijo, v in hijos.items()}
+
+    fechas = df[columna_fecha].to_numpy(dtype='datetime64[ns]')
+    return TablaIndexada(df=df, claves=claves, rangos=rangos, fechas=fechas, hijos=hijos)
+
+
+def _hojas(t, prefijo):
+    # Claves completas bajo ``prefijo``: solo dentro de cada una las fechas están ordenadas
+    if len(prefijo) >= len(t.claves):
+        return [prefijo]
+    return [h for v in t.hijos.get(prefijo, ()) for h in _hojas(t, prefijo + (v,))]
+
+
+def _recortar(t, ini, fin, desde, hasta):
+    if desde is not None:
+        ini = ini + int(np.searchsorted(t.fechas[ini:fin], np.datetime64(desde, 'ns'), side='left'))
+    if hasta is not None:
+        fin = ini + int(np.searchsorted(t.fechas[ini:fin], np.datetime64(hasta, 'ns'), side='right'))
+    return ini, fin
+
+
+def filtrar(t, prefijo, ultimos=None, desde=None, hasta=None):
+    """Filas de ``t`` bajo la clave ``prefijo`` y, opcionalmente, en el rango de fechas.
+
+    ``prefijo`` es el valor (o tupla de valores) de las primeras claves, p. ej.
+    la corrida. ``ultimos`` es una lista opcional de valores para la siguiente
+    clave (p. ej. los sensores elegidos): cada uno se resuelve con un lookup.
+    Con un rango de fechas y claves incompletas, el rango se busca dentro de
+    cada clave completa bajo ellas.
+    """
+    prefijo = tuple(_clave(v) for v in (prefijo if isinstance(prefijo, tuple) else (prefijo,)))
+    if ultimos is None:
+        claves = [prefijo]
+    else:
+        claves = [prefijo + (_clave(v),) for v in ultimos]
+    if desde is not None or hasta is not None:
+        claves = [h for clave in claves for h in _hojas(t, clave)]
+
+    cortes = []
+    for clave in claves:
+        if clave not in t.rangos:
+            continue
+        ini, fin = _recortar(t, *t.rangos[clave], desde, hasta)
+        if fin > ini:
+            cortes.append(np.arange(ini, fin))
+    if not cortes:
+        return t.df.iloc[0:0]
+    if len(cortes) == 1:
+        return t.df.iloc[cortes[0][0]:cortes[0][-1] + 1]
+    return t.df.iloc[np.concatenate(cortes)]
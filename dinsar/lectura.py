@@ -0,0 +1,805 @@
+"""Lectura de los CSV de desplazamiento y precipitación, sin Streamlit.
+
+Cada CSV se ingiere una sola vez a un Parquet tipado junto al archivo fuente
+(ver :func:`ingerir`) y se lee como matrices fechas × sensores por corrida o
+como tablas. Todo lo de aquí sirve igual al tablero (que lo envuelve con los
+cachés de :mod:`dinsar.datos`) y al procesamiento por lotes
+(:mod:`dinsar.lote`), que no debe importar Streamlit.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from dinsar import cubo, perfil
+from dinsar.matriz import a_largo, anexar, columnas_de_sensor, desde_ancho, id_sensor
+
+DIR_DATOS = Path(__file__).resolve().parent.parent / "data"
+
+PATRON_CORRIDAS = "data_estructurada_corrida*.csv"
+MANIFIESTO = "corridas.json"
+RUTA_PREC = DIR_DATOS / "data_estructurada_precipitaciones.csv"
+# Coordenadas de los puntos PS (opcional): sensor;lat;lon
+RUTA_COORDS = DIR_DATOS / "coordenadas_sensores.csv"
+
+FORMATO_FECHA = "%d/%m/%Y"
+
+# Claves de metadatos en los Parquet de ingesta; subir la versión obliga a
+# regenerar los Parquet existentes cuando cambia la normalización.
+_VERSION_INGESTA = 3
+_META_ORIGEN = b"dinsar.origen"
+_META_RECHAZOS = b"dinsar.rechazos"
+_META_HUELLA = b"dinsar.huella"
+_META_ANEXO = b"dinsar.anexo"
+_META_BASE = b"dinsar.base"
+
+# El anexo de filas agregadas se compacta en el Parquet cuando supera esta
+# fracción de sus filas.
+COMPACTAR_FRACCION = 0.5
+
+# Un candado por Parquet: el vigilante de archivos y las páginas pueden
+# pedir la misma ingesta a la vez.
+_candados = {}
+_candado_candados = threading.Lock()
+
+
+def candado_de(destino):
+    """El candado de ``destino`` (una ruta), compartido por todo el proceso."""
+    with _candado_candados:
+        return _candados.setdefault(str(destino), threading.Lock())
+
+
+# Por debajo de este tamaño total los archivos se leen en serie: arrancar el
+# pool de procesos cuesta más que leerlos.
+UMBRAL_PARALELO_BYTES = 4 * 1024 * 1024
+
+# Por encima de este tamaño estimado de la matriz float32 de un archivo sus
+# corridas se guardan como cubos en disco y se leen con mmap (ver
+# dinsar.cubo); 0 = siempre.
+UMBRAL_CUBO_BYTES = int(float(os.environ.get('DINSAR_CUBO_MB', 512)) * 2**20)
+
+# Tamaño mínimo del bloque del lector CSV de pyarrow. Cada bloque tiene que
+# contener al menos una línea entera y con cientos de miles de sensores una
+# fila pasa del megabyte: el bloque crece con la cabecera (ver _tamano_bloque).
+BLOQUE_CSV = 1 << 20
+
+_PATRON_DECIMAL = r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$"
+_PATRON_ENTERO = r"^[-+]?\d+$"
+
+
+def _numero_final(path):
+    digitos = re.findall(r'\d+', Path(path).stem)
+    return (int(digitos[-1]) if digitos else -1, Path(path).name)
+
+
+def descubrir_corridas(directorio=None):
+    """Lista los CSV de corrida de ``directorio`` (por defecto ``data/``).
+
+    Si existe ``corridas.json`` (``{"corridas": ["archivo.csv", ...]}``) se usa
+    esa lista en ese orden; si no, se toman todos los archivos que cumplen
+    ``data_estructurada_corrida*.csv`` ordenados por su número.
+    """
+    directorio = Path(directorio or DIR_DATOS)
+    manifiesto = directorio / MANIFIESTO
+    if manifiesto.exists():
+        with open(manifiesto, encoding='utf-8') as f:
+            return [directorio / nombre for nombre in json.load(f)['corridas']]
+    return sorted(directorio.glob(PATRON_CORRIDAS), key=_numero_final)
+
+
+def firma_archivo(path):
+    """Devuelve (ruta, mtime, tamaño): la clave con la que se memoriza un archivo."""
+    info = os.stat(path)
+    return (str(path), info.st_mtime_ns, info.st_size)
+
+
+# 1) Ingesta: CSV -> Parquet normalizado junto al archivo fuente
+
+def ruta_parquet(path):
+    """Ruta del Parquet normalizado que acompaña a un CSV de ``data/``."""
+    return Path(path).with_suffix(".parquet")
+
+
+def _cabecera(path):
+    """Nombres de columna normalizados (minúsculas, sin espacios) de un CSV ``;``."""
+    with open(path, encoding='utf-8-sig') as f:
+        crudos = f.readline().rstrip('\r\n').split(';')
+    return [c.strip().lower() or f'unnamed_{i}' for i, c in enumerate(crudos)]
+
+
+def _tamano_bloque(path):
+    # Las filas son del largo de la cabecera (un valor por sensor); el margen
+    # cubre valores con más cifras que los IDs
+    with open(path, 'rb') as f:
+        return max(BLOQUE_CSV, 4 * len(f.readline()))
+
+
+def _tipo_columna(nombre):
+    if nombre == 'fecha':
+        return pa.timestamp('s')
+    if nombre in ('corrida', 'sensor'):
+        return pa.int64()
+    if nombre == 'punto':
+        return pa.string()
+    return pa.float64()
+
+
+def _convertir_tolerante(columna, tipo):
+    """Convierte una columna de texto al ``tipo`` dejando null donde no se pueda.
+
+    Todo ocurre en kernels de Arrow: sin ida y vuelta por objetos Python.
+    """
+    if pa.types.is_string(tipo):
+        return columna
+    if pa.types.is_timestamp(tipo):
+        return pc.strptime(columna, format=FORMATO_FECHA, unit='s', error_is_null=True)
+    texto = pc.utf8_trim_whitespace(pc.replace_substring(columna, ',', '.'))
+    patron = _PATRON_ENTERO if pa.types.is_integer(tipo) else _PATRON_DECIMAL
+    valido = pc.match_substring_regex(texto, patron)
+    return pc.cast(pc.if_else(valido, texto, pa.scalar(None, pa.string())), tipo)
+
+
+def _fuente(path, desde_byte):
+    if not desde_byte:
+        return path
+    with open(path, 'rb') as f:
+        f.seek(desde_byte)
+        return pa.BufferReader(f.read())
+
+
+def leer_csv_nativo(path, desde_byte=0, primera_fila=2):
+    """Lee un CSV de ``data/`` con el motor CSV de pyarrow y tipos explícitos.
+
+    Coma decimal y fechas ``%d/%m/%Y`` se resuelven al leer. Si el archivo trae
+    valores que no encajan en su tipo, se relee como texto y se convierte con
+    kernels tolerantes. Devuelve ``(tabla, rechazos)``: ``rechazos`` es un
+    DataFrame (fila, columna, valor, motivo); las filas con fecha inválida se
+    descartan, los valores no numéricos quedan como null.
+
+    Con ``desde_byte`` solo se leen las filas a partir de ese byte (que debe
+    ser un comienzo de línea; la cabecera se toma del archivo) y
+    ``primera_fila`` es el número de línea de la primera de ellas, para el
+    reporte de rechazos.
+    """
+    nombres = _cabecera(path)
+    incluidas = [n for n in nombres if not n.startswith('unnamed')]
+    tipos = {n: _tipo_columna(n) for n in incluidas}
+    lectura = pacsv.ReadOptions(column_names=nombres, skip_rows=0 if desde_byte else 1,
+                                block_size=_tamano_bloque(path))
+    parseo = pacsv.ParseOptions(delimiter=';')
+
+    try:
+        conversion = pacsv.ConvertOptions(
+            column_types=tipos, include_columns=incluidas, decimal_point=',',
+            timestamp_parsers=[FORMATO_FECHA],
+        )
+        tabla = pacsv.read_csv(_fuente(path, desde_byte), read_options=lectura, parse_options=parseo,
+                               convert_options=conversion)
+    except pa.ArrowInvalid:
+        pass
+    else:
+        # Una celda de fecha vacía no falla al convertir: llega como null
+        if 'fecha' not in tabla.column_names or not tabla['fecha'].null_count:
+            return tabla, _sin_rechazos()
+        idx = pc.indices_nonzero(pc.is_null(tabla['fecha'])).to_numpy()
+        rechazos = pd.DataFrame({'fila': idx + primera_fila, 'columna': 'fecha', 'valor': None,
+                                 'motivo': 'fecha inválida'})
+        return tabla.filter(pc.is_valid(tabla['fecha'])), rechazos
+
+    # Camino tolerante: todo como texto y conversión columna por columna
+    conversion = pacsv.ConvertOptions(
+        column_types={n: pa.string() for n in incluidas}, include_columns=incluidas,
+        strings_can_be_null=True,
+    )
+    texto = pacsv.read_csv(_fuente(path, desde_byte), read_options=lectura, parse_options=parseo,
+                           convert_options=conversion)
+    columnas = {}
+    rechazos = []
+    for nombre in incluidas:
+        original = texto[nombre].combine_chunks()
+        convertida = _convertir_tolerante(original, tipos[nombre])
+        fallidas = pc.and_(pc.is_valid(original), pc.is_null(convertida))
+        if nombre == 'fecha':
+            fallidas = pc.is_null(convertida)
+        idx = pc.indices_nonzero(fallidas).to_numpy()
+        if len(idx):
+            rechazos.append(pd.DataFrame({
+                'fila': idx + primera_fila,
+                'columna': nombre,
+                'valor': original.take(pa.array(idx)).to_pylist(),
+                'motivo': 'fecha inválida' if nombre == 'fecha' else 'valor no numérico',
+            }))
+        columnas[nombre] = convertida
+    tabla = pa.table(columnas)
+    if 'fecha' in columnas:
+        tabla = tabla.filter(pc.is_valid(tabla['fecha']))
+
+    rechazos = pd.concat(rechazos, ignore_index=True) if rechazos else _sin_rechazos()
+    return tabla, rechazos
+
+
+def _sin_rechazos():
+    return pd.DataFrame({
+        'fila': pd.Series(dtype='int64'),
+        'columna': pd.Series(dtype='str'),
+        'valor': pd.Series(dtype='str'),
+        'motivo': pd.Series(dtype='str'),
+    })
+
+
+def _normalizar_corrida(path, **desde):
+    """Lee un CSV de corrida (ancho) con tipos limpios.
+
+    Devuelve ``(tabla, rechazos)``: ``tabla`` con fecha timestamp y un float por
+    columna de sensor, sin columnas completamente vacías. Las columnas de
+    sensor cuyo nombre no es un ID entero se descartan y se informan como
+    rechazos de la fila 1 (la cabecera).
+    """
+    tabla, rechazos = leer_csv_nativo(path, **desde)
+    invalidas = [n for n in tabla.column_names
+                 if n not in ('punto', 'fecha', 'corrida') and id_sensor(n) is None]
+    if invalidas and not desde.get('desde_byte'):
+        rechazos = _unir_rechazos(rechazos, pd.DataFrame({
+            'fila': 1, 'columna': invalidas, 'valor': invalidas, 'motivo': 'columna de sensor sin ID numérico',
+        }))
+    vacias = [n for n in tabla.column_names if len(tabla) and tabla[n].null_count == len(tabla)]
+    tabla = tabla.drop_columns(sorted(set(vacias) | set(invalidas)))
+    if 'punto' in tabla.column_names:
+        idx = tabla.column_names.index('punto')
+        tabla = tabla.set_column(idx, 'punto', pc.utf8_trim_whitespace(tabla['punto']))
+    return tabla, rechazos
+
+
+def _normalizar_precipitacion(path, **desde):
+    """Lee el CSV de precipitación con ``rainfall`` float y ``fecha`` timestamp."""
+    return leer_csv_nativo(path, **desde)
+
+
+def _normalizar_coordenadas(path, **desde):
+    """Lee el CSV de coordenadas y descarta los puntos sin sensor, lat o lon."""
+    tabla, rechazos = leer_csv_nativo(path, **desde)
+    completas = pc.and_(pc.is_valid(tabla['sensor']),
+                        pc.and_(pc.is_valid(tabla['lat']), pc.is_valid(tabla['lon'])))
+    return tabla.select(['sensor', 'lat', 'lon']).filter(completas), rechazos
+
+
+def ruta_anexo(destino):
+    """Archivo Arrow con las filas agregadas al CSV desde que se escribió el Parquet ``destino``."""
+    return Path(destino).with_suffix(".anexo.arrow")
+
+
+def _metadatos(destino):
+    if not destino.exists():
+        return {}
+    try:
+        return pq.read_schema(destino).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return {}
+
+
+def _metadatos_anexo(anexo):
+    if not anexo.exists():
+        return {}
+    try:
+        with pa.OSFile(str(anexo)) as f:
+            return pa.ipc.open_file(f).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return {}
+
+
+def _estado(destino):
+    """Metadatos del Parquet y de su anexo; el anexo es ``{}`` si no corresponde a ese Parquet."""
+    base = _metadatos(destino)
+    anexo = _metadatos_anexo(ruta_anexo(destino))
+    if anexo and anexo.get(_META_BASE) != base.get(_META_ORIGEN):
+        anexo = {}
+    return base, anexo
+
+
+def _huella(path, n_bytes):
+    """sha1 y cantidad de saltos de línea de los primeros ``n_bytes`` de ``path``.
+
+    Leer y resumir los bytes es mucho más barato que parsearlos: permite saber
+    si un archivo que creció solo recibió filas nuevas al final.
+    """
+    sha1 = hashlib.sha1()
+    lineas = 0
+    ultimo = b''
+    with open(path, 'rb') as f:
+        restante = n_bytes
+        while restante > 0:
+            bloque = f.read(min(restante, 1 << 20))
+            if not bloque:
+                break
+            sha1.update(bloque)
+            lineas += bloque.count(b'\n')
+            ultimo = bloque[-1:]
+            restante -= len(bloque)
+    return {'bytes': n_bytes, 'sha1': sha1.hexdigest(), 'lineas': lineas, 'completa': ultimo == b'\n'}
+
+
+def _temporal(destino):
+    return destino.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _escribir_parquet(partes, destino, meta):
+    # Escritura atómica: otro proceso nunca ve un Parquet a medio escribir.
+    # Al reemplazar el Parquet, un anexo anterior deja de corresponder y se borra.
+    esquema = partes[0].schema.with_metadata(meta)
+    tmp = _temporal(destino)
+    with pq.ParquetWriter(tmp, esquema) as escritor:
+        for parte in partes:
+            escritor.write_table(parte.cast(esquema))
+    os.replace(tmp, destino)
+    ruta_anexo(destino).unlink(missing_ok=True)
+
+
+def _escribir_anexo(tabla, destino, meta):
+    anexo = ruta_anexo(destino)
+    tmp = _temporal(anexo)
+    feather.write_feather(tabla.replace_schema_metadata(meta), tmp, compression='uncompressed')
+    os.replace(tmp, anexo)
+
+
+def _leer_anexo(destino):
+    return feather.read_table(ruta_anexo(destino), memory_map=False)
+
+
+def _alinear(tabla, esquema):
+    """``tabla`` con exactamente las columnas de ``esquema``, o None si trae datos en otras."""
+    presentes = dict(zip(tabla.column_names, tabla.columns))
+    esperadas = set(esquema.names)
+    if any(n not in esperadas and c.null_count < len(c) for n, c in presentes.items()):
+        return None
+    columnas = [
+        presentes[campo.name] if campo.name in presentes and presentes[campo.name].type == campo.type
+        else presentes[campo.name].cast(campo.type) if campo.name in presentes
+        else pa.nulls(len(tabla), campo.type)
+        for campo in esquema
+    ]
+    return pa.Table.from_arrays(columnas, schema=esquema.remove_metadata())
+
+
+def _unir_rechazos(*reportes):
+    partes = [r for r in reportes if not r.empty]
+    return pd.concat(partes, ignore_index=True) if partes else _sin_rechazos()
+
+
+def _ingerir_anexo(path, destino, firma, normalizar, base, anexo):
+    """Ingiere solo las filas nuevas de un CSV que creció por el final.
+
+    Las filas van al anexo Arrow junto al Parquet (escribirlo cuesta en
+    proporción a las filas nuevas; reescribir un Parquet de miles de columnas
+    no). Cuando el anexo supera ``COMPACTAR_FRACCION`` de las filas del
+    Parquet, se compactan ambos en un Parquet nuevo.
+
+    Devuelve False (y no toca nada) si el archivo no es una extensión del que
+    se ingirió: cambió un byte anterior, la última línea estaba incompleta,
+    cambió la versión de ingesta o las filas nuevas traen sensores que antes
+    estaban vacíos.
+    """
+    vigente = anexo or base
+    previa = json.loads(vigente.get(_META_HUELLA, b'null'))
+    guardada = json.loads(vigente.get(_META_ORIGEN, b'null'))
+    if previa is None or guardada is None or guardada[0] != _VERSION_INGESTA or firma[2] <= previa['bytes']:
+        return False
+    if not previa['completa'] or _huella(path, previa['bytes'])['sha1'] != previa['sha1']:
+        return False
+
+    nuevas, rechazos_nuevos = normalizar(path, desde_byte=previa['bytes'], primera_fila=previa['lineas'] + 1)
+    parquet = pq.ParquetFile(destino)
+    nuevas = _alinear(nuevas, parquet.schema_arrow)
+    if nuevas is None:
+        return False
+
+    previas = _leer_anexo(destino).replace_schema_metadata(None) if anexo else nuevas.slice(0, 0)
+    agregadas = pa.concat_tables([previas, nuevas])
+    rechazos_anexo = _unir_rechazos(_rechazos_guardados(anexo), rechazos_nuevos)
+    huella = json.dumps(_huella(path, firma[2])).encode()
+
+    if len(agregadas) > COMPACTAR_FRACCION * parquet.metadata.num_rows:
+        meta = dict(base)
+        meta[_META_ORIGEN] = json.dumps(firma).encode()
+        meta[_META_RECHAZOS] = _unir_rechazos(_rechazos_guardados(base), rechazos_anexo).to_json(
+            orient='records', force_ascii=False).encode()
+        meta[_META_HUELLA] = huella
+        grupos = [parquet.read_row_group(i) for i in range(parquet.num_row_groups)]
+        _escribir_parquet(grupos + [agregadas], destino, meta)
+        return True
+
+    _escribir_anexo(agregadas, destino, {
+        _META_ORIGEN: json.dumps(firma).encode(),
+        _META_BASE: base[_META_ORIGEN],
+        _META_RECHAZOS: rechazos_anexo.to_json(orient='records', force_ascii=False).encode(),
+        _META_HUELLA: huella,
+        _META_ANEXO: json.dumps({'origen_previo': guardada, 'filas_previas': len(previas)}).encode(),
+    })
+    return True
+
+
+def ingerir(path, normalizar):
+    """Genera (o reutiliza) el Parquet normalizado de ``path``.
+
+    El Parquet guarda en sus metadatos el mtime y tamaño del CSV de origen
+    (y la versión del formato de ingesta) y solo se reescribe cuando cambian.
+    También guarda el reporte de rechazos de :func:`leer_csv_nativo`.
+
+    Si el CSV solo creció por el final (adquisiciones nuevas agregadas como
+    filas) se parsean únicamente los bytes nuevos y se guardan en un anexo
+    (ver :func:`_ingerir_anexo`); los lectores unen Parquet y anexo.
+    """
+    destino = ruta_parquet(path)
+    _, mtime, size = firma_archivo(path)
+    firma = (_VERSION_INGESTA, mtime, size)
+    with candado_de(destino):
+        base, anexo = _estado(destino)
+        guardada = (anexo or base).get(_META_ORIGEN)
+        if guardada and tuple(json.loads(guardada)) == firma:
+            return destino
+        if _ingerir_anexo(path, destino, firma, normalizar, base, anexo):
+            return destino
+
+        tabla, rechazos = normalizar(path)
+        meta = dict(tabla.schema.metadata or {})
+        meta[_META_ORIGEN] = json.dumps(firma).encode()
+        meta[_META_RECHAZOS] = rechazos.to_json(orient='records', force_ascii=False).encode()
+        meta[_META_HUELLA] = json.dumps(_huella(path, size)).encode()
+        _escribir_parquet([tabla], destino, meta)
+    return destino
+
+
+def ingerir_todo(paths=None, path_prec=None):
+    """Ingesta de todas las corridas y de la precipitación; devuelve los Parquet."""
+    destinos = [ingerir(p, _normalizar_corrida) for p in (paths or descubrir_corridas())]
+    destinos.append(ingerir_precipitacion(path_prec or RUTA_PREC))
+    return destinos
+
+
+def _tipo_pandas(tipo):
+    # Las fechas quedan como datetime64 nativo (el accesor .dt de Arrow no
+    # ofrece to_period) y los float como numpy (null -> NaN): pandas los junta
+    # en un solo bloque 2D, lo que evita un costo fijo por columna en tablas
+    # anchas de miles de sensores. El resto usa dtypes Arrow sin copia.
+    if pa.types.is_timestamp(tipo) or pa.types.is_floating(tipo):
+        return None
+    return pd.ArrowDtype(tipo)
+
+
+def _rechazos_guardados(meta):
+    rechazos = pd.read_json(io.StringIO(meta.get(_META_RECHAZOS, b'[]').decode()), orient='records')
+    return rechazos if not rechazos.empty else _sin_rechazos()
+
+
+def _leer_parquet(destino):
+    """Lee un Parquet ingerido (más su anexo, si tiene) y su reporte de rechazos.
+
+    Las columnas usan tipos Arrow sin copia salvo fechas y floats (ver
+    :func:`_tipo_pandas`).
+    """
+    tabla = pq.read_table(destino)
+    base = tabla.schema.metadata or {}
+    rechazos = _rechazos_guardados(base)
+    anexo = _metadatos_anexo(ruta_anexo(destino))
+    if anexo and anexo.get(_META_BASE) == base.get(_META_ORIGEN):
+        agregadas = _leer_anexo(destino).cast(tabla.schema.remove_metadata())
+        tabla = pa.concat_tables([tabla.replace_schema_metadata(None), agregadas])
+        rechazos = _unir_rechazos(rechazos, _rechazos_guardados(anexo))
+    return tabla.to_pandas(types_mapper=_tipo_pandas), rechazos
+
+
+# 2) Lectura de matrices y tablas
+
+# Últimas matrices leídas de cada archivo en este proceso, con la firma del
+# CSV del que salieron y su posición (ver _posicion): un archivo sin cambios
+# no se vuelve a leer y uno que solo recibió filas nuevas se actualiza leyendo
+# únicamente esas filas. Se lee y actualiza solo con el candado de la ruta
+# (ver _leer_archivo_corridas).
+# Quien no necesita las matrices después de usarlas (p. ej. la escritura del
+# dataset particionado) las libera con olvidar().
+_ultimas = {}
+
+
+def _posicion(destino, base, anexo):
+    # Hasta dónde se leyó un archivo: su Parquet base y las filas de su anexo.
+    # Mientras el Parquet no cambie el anexo solo crece, así que lo que se
+    # agregue después son las filas del anexo desde ``filas`` (ver leer_agregadas).
+    filas = feather.read_table(ruta_anexo(destino), columns=['corrida'], memory_map=True).num_rows if anexo else 0
+    return {'base': base[_META_ORIGEN].decode(), 'filas': filas}
+
+
+def _columnas_sensor(esquema):
+    return columnas_de_sensor(esquema.names)[0]
+
+
+def _bytes_matriz(destino, anexo):
+    """Tamaño estimado (float32) de las matrices de un Parquet ingerido más su anexo."""
+    parquet = pq.ParquetFile(destino)
+    filas = parquet.metadata.num_rows
+    if anexo:
+        filas += feather.read_table(ruta_anexo(destino), columns=['corrida'], memory_map=True).num_rows
+    return 4 * filas * len(_columnas_sensor(parquet.schema_arrow))
+
+
+def _lotes(destino, anexo, columnas, filas):
+    """Lotes de ``columnas`` del Parquet y luego de su anexo, de a lo sumo ``filas`` filas."""
+    parquet = pq.ParquetFile(destino)
+    tamano = filas or max(parquet.metadata.num_rows, 1)
+    yield from parquet.iter_batches(batch_size=tamano, columns=columnas)
+    if anexo:
+        esquema = parquet.schema_arrow.remove_metadata()
+        agregadas = feather.read_table(ruta_anexo(destino), memory_map=True).cast(esquema).select(columnas)
+        yield from agregadas.to_batches(max_chunksize=filas)
+
+
+def _leer_cubos(path, destino, firma, anexo):
+    """Matrices de ``path`` desde sus cubos en disco, construyéndolos si no son de ``firma``."""
+    directorio = cubo.ruta_cubos(path)
+    origen = json.dumps(firma)
+    with candado_de(directorio):
+        matrices = cubo.abrir(directorio, origen)
+        if matrices is None:
+            with perfil.etapa("cubos"):
+                columnas = _columnas_sensor(pq.read_schema(destino))
+                matrices = cubo.escribir(directorio, lambda c, f: _lotes(destino, anexo, c, f), columnas, origen)
+    return matrices
+
+
+def _leer_archivo_corridas(path):
+    # Con el candado del archivo: el vigilante y las sesiones no pueden partir
+    # a la vez de la misma lectura previa y guardar estados distintos
+    with candado_de(path):
+        return _leer_archivo_corridas_sin_candado(path)
+
+
+def _leer_archivo_corridas_sin_candado(path):
+    destino = ingerir(path, _normalizar_corrida)
+    base, anexo = _estado(destino)
+    firma = json.loads((anexo or base)[_META_ORIGEN])
+    previa = _ultimas.get(str(path))
+    if previa is not None and previa[0] == firma:
+        return previa
+
+    if _bytes_matriz(destino, anexo) > UMBRAL_CUBO_BYTES:
+        # Archivo grande: matrices en mmap. Las filas agregadas no se anexan
+        # en memoria; los cubos se reconstruyen por lotes con la nueva firma.
+        matrices = _leer_cubos(path, destino, firma, anexo)
+        rechazos = _unir_rechazos(_rechazos_guardados(base), _rechazos_guardados(anexo))
+        _ultimas[str(path)] = (firma, matrices, rechazos, _posicion(destino, base, anexo))
+        return _ultimas[str(path)]
+
+    agregado = json.loads(anexo.get(_META_ANEXO, b'null'))
+    if previa is not None and agregado is not None and agregado['origen_previo'] == previa[0]:
+        # Solo las filas que se agregaron desde la lectura anterior
+        agregadas = _leer_anexo(destino)
+        nuevas = agregadas.slice(agregado['filas_previas']).to_pandas(types_mapper=_tipo_pandas)
+        matrices = dict(previa[1])
+        for c, g in nuevas.groupby('corrida'):
+            nueva = desde_ancho(g, c)
+            matrices[int(c)] = anexar(matrices[int(c)], nueva) if int(c) in matrices else nueva
+        rechazos = _unir_rechazos(_rechazos_guardados(base), _rechazos_guardados(anexo))
+        posicion = {'base': base[_META_ORIGEN].decode(), 'filas': len(agregadas)}
+        _ultimas[str(path)] = (firma, matrices, rechazos, posicion)
+        return _ultimas[str(path)]
+
+    df_temp, rechazos = _leer_parquet(destino)
+    matrices = {int(c): desde_ancho(g, c) for c, g in df_temp.groupby('corrida')}
+    _ultimas[str(path)] = (firma, matrices, rechazos, _posicion(destino, base, anexo))
+    return _ultimas[str(path)]
+
+
+def _leer_en_proceso(path):
+    # Desde el pool: las matrices en mmap no se copian de vuelta al proceso
+    # principal (se enviarían enteras); allí se reabren sus cubos ya escritos.
+    resultado = _leer_archivo_corridas(path)
+    if any(isinstance(m.valores, np.memmap) for m in resultado[1].values()):
+        return None
+    return resultado
+
+
+def _guardar_de_proceso(path, resultado):
+    # Lo leído en el pool se guarda con el candado del archivo. Si mientras
+    # tanto otra lectura (p. ej. el vigilante) ya guardó un estado, puede ser
+    # más nuevo: se revalida contra el Parquet en lugar de pisarlo.
+    with candado_de(path):
+        if resultado is None or str(path) in _ultimas:
+            return _leer_archivo_corridas_sin_candado(path)
+        _ultimas[str(path)] = resultado
+        return resultado
+
+
+def refrescar_corridas(path):
+    """Ingiere el CSV de corrida ``path`` y pone al día sus matrices solo si ya están en memoria.
+
+    Es lo que hace el vigilante de archivos: no carga matrices que nadie pidió.
+    """
+    with candado_de(path):
+        if str(path) in _ultimas:
+            _leer_archivo_corridas_sin_candado(path)
+            return
+    ingerir(path, _normalizar_corrida)
+
+
+def ingerir_precipitacion(path):
+    """Genera (o reutiliza) el Parquet normalizado del CSV de precipitación ``path``."""
+    return ingerir(path, _normalizar_precipitacion)
+
+
+def ingerir_coordenadas(path):
+    """Genera (o reutiliza) el Parquet normalizado del CSV de coordenadas ``path``."""
+    return ingerir(path, _normalizar_coordenadas)
+
+
+def leer_matrices_corrida(path):
+    """Lee un archivo de corrida (vía su Parquet) como matrices fechas × sensores.
+
+    Devuelve ``(matrices, rechazos)``: ``matrices`` es un dict corrida ->
+    :class:`~dinsar.matriz.MatrizCorrida` y ``rechazos`` el reporte de
+    :func:`leer_csv_nativo`.
+    """
+    _, matrices, rechazos, _ = _leer_archivo_corridas(path)
+    return matrices, rechazos
+
+
+def leer_agregadas(path, posicion):
+    """Solo las filas agregadas a un archivo de corrida desde ``posicion``.
+
+    ``posicion`` es la de una lectura anterior (ver
+    :func:`leer_matrices_con_posiciones`). Si desde entonces el archivo solo
+    recibió filas al final y siguen en el anexo de su Parquet, se leen
+    únicamente esas filas, sin cargar las matrices completas ni tocar las
+    guardadas en este proceso.
+
+    Devuelve ``(posicion, matrices, rechazos)``: la posición actual, un dict
+    corrida -> matriz con solo las filas nuevas (vacío si no hay) y el reporte
+    de rechazos de todo el archivo. ``None`` si no hay ``posicion`` o el
+    archivo cambió de otra forma (o se compactó): hace falta leerlo completo.
+    """
+    if posicion is None:
+        return None
+    with candado_de(path):
+        destino = ingerir(path, _normalizar_corrida)
+        base, anexo = _estado(destino)
+        if base.get(_META_ORIGEN, b'').decode() != posicion['base']:
+            return None
+        agregadas = feather.read_table(ruta_anexo(destino), memory_map=True) if anexo else None
+        filas = len(agregadas) if anexo else 0
+        if filas < posicion['filas']:
+            return None
+        matrices = {}
+        if filas > posicion['filas']:
+            nuevas = agregadas.slice(posicion['filas']).to_pandas(types_mapper=_tipo_pandas)
+            matrices = {int(c): desde_ancho(g, c) for c, g in nuevas.groupby('corrida')}
+        rechazos = _unir_rechazos(_rechazos_guardados(base), _rechazos_guardados(anexo))
+    return {'base': posicion['base'], 'filas': filas}, matrices, rechazos
+
+
+def leer_matrices(paths, procesos=None):
+    """Une las corridas de varios archivos en un dict corrida -> matriz.
+
+    Los archivos se procesan en paralelo con un pool de procesos (``procesos``
+    = número de workers, por defecto uno por CPU; 1 = en serie). Los que ya se
+    leyeron en este proceso se actualizan aquí mismo, en proporción a lo que
+    cambió. Un archivo que falla no impide cargar los demás.
+
+    Devuelve ``(matrices, rechazos, errores)``: ``rechazos`` es un dict ruta ->
+    reporte (solo archivos con algún rechazo) y ``errores`` un dict ruta ->
+    mensaje de los archivos que no se pudieron leer.
+    """
+    return leer_matrices_con_posiciones(paths, procesos)[:3]
+
+
+def leer_matrices_con_posiciones(paths, procesos=None):
+    """Como :func:`leer_matrices`, más hasta dónde se leyó cada archivo.
+
+    Devuelve ``(matrices, rechazos, errores, posiciones)``: ``posiciones`` es
+    un dict ruta -> posición (para :func:`leer_agregadas`) con las corridas
+    que aportó el archivo, solo de los archivos que se leyeron sin errores.
+    """
+    paths = [Path(p) for p in paths]
+    resultados = {}
+    errores = {}
+
+    nuevos = [p for p in paths if str(p) not in _ultimas]
+    total = sum(p.stat().st_size for p in nuevos if p.exists())
+    en_serie = procesos == 1 or len(nuevos) < 2 or (procesos is None and total < UMBRAL_PARALELO_BYTES)
+    for path in (paths if en_serie else [p for p in paths if str(p) in _ultimas]):
+        try:
+            resultados[path] = _leer_archivo_corridas(path)[1:]
+        except Exception as e:
+            errores[str(path)] = f"{type(e).__name__}: {e}"
+    if not en_serie:
+        with ProcessPoolExecutor(max_workers=min(procesos or os.cpu_count() or 1, len(nuevos))) as pool:
+            futuros = {pool.submit(_leer_en_proceso, path): path for path in nuevos}
+            for futuro in as_completed(futuros):
+                path = futuros[futuro]
+                try:
+                    resultados[path] = _guardar_de_proceso(path, futuro.result())[1:]
+                except Exception as e:
+                    errores[str(path)] = f"{type(e).__name__}: {e}"
+
+    # Fusionar en el orden de ``paths`` para que el resultado sea determinista
+    matrices = {}
+    rechazos = {}
+    posiciones = {}
+    for path in paths:
+        if path not in resultados:
+            continue
+        mats, rep, posicion = resultados[path]
+        if not rep.empty:
+            rechazos[str(path)] = rep
+        for corrida, m in mats.items():
+            if corrida in matrices:
+                errores[str(path)] = f"La corrida {corrida} ya se cargó desde otro archivo; se ignora."
+                continue
+            matrices[corrida] = m
+        if str(path) not in errores:
+            posiciones[str(path)] = {**posicion, 'corridas': sorted(mats)}
+    return matrices, rechazos, errores, posiciones
+
+
+def a_largo_todas(matrices):
+    """DataFrame largo (fecha, corrida, punto, sensor, Desplazamiento) de todas las corridas."""
+    if not matrices:
+        return pd.DataFrame(columns=['fecha', 'corrida', 'punto', 'sensor', 'Desplazamiento'])
+    return pd.concat([a_largo(m) for _, m in sorted(matrices.items())], ignore_index=True)
+
+
+def leer_precipitacion(path):
+    """Lee la precipitación (vía su Parquet) con solo las filas con lluvia y fecha válidas.
+
+    Devuelve ``(df, rechazos)``.
+    """
+    df, rechazos = _leer_parquet(ingerir_precipitacion(path))
+
+    # 'corrida' como string para facilitar color y leyenda
+    df["corrida"] = df["corrida"].astype(str)
+
+    return df.dropna(subset=["rainfall", "fecha"]).reset_index(drop=True), rechazos
+
+
+def leer_coordenadas(path):
+    """Coordenadas (sensor, lat, lon) de los puntos PS; el último registro de cada sensor manda."""
+    df, _ = _leer_parquet(ingerir_coordenadas(path))
+    df = df.drop_duplicates('sensor', keep='last')
+    return pd.DataFrame({
+        'sensor': df['sensor'].to_numpy(dtype='int64'),
+        'lat': df['lat'].to_numpy(), 'lon': df['lon'].to_numpy(),
+    })
+
+
+def olvidar(paths=None):
+    """Descarta las matrices de ``paths`` (todas por defecto) guardadas en este proceso.
+
+    La próxima lectura completa de esos archivos vuelve a partir de su
+    Parquet; :func:`leer_agregadas` no depende de ellas.
+    """
+    for path in ([str(p) for p in paths] if paths is not None else list(_ultimas)):
+        with candado_de(path):
+            _ultimas.pop(path, None)
+
+
+def firmas_corridas(paths=None):
+    """Firmas (ver :func:`firma_archivo`) de ``paths`` o de las corridas de ``data/``."""
+    return tuple(firma_archivo(p) for p in (paths or descubrir_corridas()))
+
+
+def version_datos(paths=None, path_prec=None):
+    """Hash corto de las firmas de todos los archivos de datos.
+
+    Cambia cuando se agrega, quita o modifica cualquier CSV; sirve como parte
+    de la clave de cachés derivados (consultas, figuras, resultados por lotes).
+    """
+    firmas = firmas_corridas(paths) + (firma_archivo(path_prec or RUTA_PREC),)
+    return hashlib.sha1(repr(firmas).encode()).hexdigest()[:16]
@@ -0,0 +1,78 @@
+"""Variables de lluvia antecedente para cada adquisición de desplazamiento.
+
+Para cada época (fecha de adquisición) de una corrida se calcula la lluvia
+acumulada en ventanas hacia atrás (7, 15, 30, 90 días) y la lluvia desde la
+adquisición anterior. Se hace con una suma acumulada de la serie de lluvia y
+uniones tipo ``merge_asof`` (``searchsorted``) en los bordes de cada ventana:
+cada valor es la diferencia de dos sumas acumuladas, sin recorrer la ventana
+fila por fila.
+"""
+import numpy as np
+import pandas as pd
+
+VENTANAS_DIAS = (7, 15, 30, 90)
+COLUMNA_DESDE_PREVIA = 'lluvia_desde_previa'
+
+
+def columna_ventana(dias):
+    return f'lluvia_{dias}d'
+
+
+def _acumulada_hasta(fechas_lluvia, acumulada, instantes):
+    """Suma de la lluvia registrada hasta cada instante, inclusive (as-of)."""
+    pos = np.searchsorted(fechas_lluvia, instantes, side='right')
+    return np.concatenate(([0.0], acumulada))[pos]
+
+
+def antecedente(fechas_lluvia, lluvia, fechas_epoca, ventanas=VENTANAS_DIAS):
+    """Variables de lluvia antecedente para ``fechas_epoca`` (ordenadas).
+
+    ``fechas_lluvia``/``lluvia`` son los registros de lluvia (NaN cuenta como
+    0). Devuelve un dict columna -> arreglo alineado con ``fechas_epoca``:
+    una columna por ventana ``(t - d, t]`` y ``lluvia_desde_previa`` para
+    ``(t_previa, t]`` (NaN en la primera época).
+    """
+    fechas_lluvia = np.asarray(fechas_lluvia, dtype='datetime64[ns]')
+    fechas_epoca = np.asarray(fechas_epoca, dtype='datetime64[ns]')
+    orden = np.argsort(fechas_lluvia, kind='stable')
+    fechas_lluvia = fechas_lluvia[orden]
+    acumulada = np.cumsum(np.nan_to_num(np.asarray(lluvia, dtype=np.float64)[orden]))
+
+    hasta_t = _acumulada_hasta(fechas_lluvia, acumulada, fechas_epoca)
+    columnas = {}
+    for dias in ventanas:
+        inicio = fechas_epoca - np.timedelta64(dias, 'D')
+        columnas[columna_ventana(dias)] = hasta_t - _acumulada_hasta(fechas_lluvia, acumulada, inicio)
+
+    desde_previa = np.full(len(fechas_epoca), np.nan)
+    desde_previa[1:] = np.diff(hasta_t)
+    columnas[COLUMNA_DESDE_PREVIA] = desde_previa
+    return columnas
+
+
+def tabla_antecedente(matrices, indice_prec, ventanas=VENTANAS_DIAS):
+    """Tabla (corrida, fecha, lluvia_<d>d..., lluvia_desde_previa) de todas las corridas.
+
+    Una fila por fecha de adquisición distinta de cada corrida.
+    """
+    partes = []
+    for corrida, m in sorted(matrices.items()):
+        rango = indice_prec.rangos.get((corrida,))
+        if rango is None:
+            continue
+        lluvia = indice_prec.df.iloc[rango[0]:rango[1]]
+        fechas = np.unique(m.fechas)
+        columnas = antecedente(lluvia['fecha'].to_numpy(), lluvia['rainfall'].to_numpy(dtype=np.float64),
+                               fechas, ventanas)
+        partes.append(pd.DataFrame({'corrida': corrida, 'fecha': fechas, **columnas}))
+    if not partes:
+        return pd.DataFrame(columns=['corrida', 'fecha'] + [columna_ventana(d) for d in ventanas]
+                            + [COLUMNA_DESDE_PREVIA])
+    return pd.concat(partes, ignore_index=True)
+
+
+def serie_para(m, tabla, columna):
+    """Columna de la tabla de antecedentes alineada a las fechas de la matriz ``m``."""
+    de_corrida = tabla[tabla['corrida'] == m.corrida].set_index('fecha')[columna]
+    de_corrida.index = pd.DatetimeIndex(de_corrida.index).as_unit('ns')
+    return de_corrida.reindex(pd.DatetimeIndex(m.fechas).as_unit('ns')).to_numpy(dtype=np.float64)
@@ -0,0 +1,189 @@
+"""Procesamiento por lotes, sin Streamlit: el mismo pipeline de las páginas.
+
+Lee un directorio de datos y escribe en ``salida/`` (Parquet o CSV):
+
+- ``desplazamientos``: formato largo limpio (fecha, corrida, punto, sensor, Desplazamiento),
+- ``promedios_por_fecha``: desplazamiento promedio por corrida y fecha,
+- ``picos``: mayor cambio de cada sensor (la tabla de eventos de la página),
+- ``lluvia_mensual``: precipitación total por corrida y mes,
+- ``lluvia_por_fecha``: precipitación total por corrida y fecha (la línea de la vista cruzada),
+
+más ``resumen.json`` con la versión de los datos de origen, para que el
+tablero pueda usar los resultados solo si siguen vigentes
+(:func:`leer_resultados`, vía :func:`dinsar.datos.cargar_resultados`): las
+páginas toman de aquí los agregados de la vista completa de cada corrida y
+solo calculan por consulta los filtros acotados. Cada archivo de corrida se
+procesa en un proceso aparte.
+
+Uso::
+
+    python -m dinsar.lote data/ resultados/ --formato parquet --procesos 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from dinsar import lectura
+from dinsar.eventos import picos_por_sensor
+from dinsar.matriz import a_largo, media_por_fecha
+from dinsar.piramide import construir_piramide
+
+TABLAS = ('desplazamientos', 'promedios_por_fecha', 'picos', 'lluvia_mensual', 'lluvia_por_fecha')
+RESUMEN = 'resumen.json'
+
+# Columnas de fecha de cada tabla (en CSV se leen como texto; al leer se llevan a ns)
+_FECHAS = {
+    'desplazamientos': ['fecha'],
+    'promedios_por_fecha': ['fecha'],
+    'picos': ['Fecha_Previo', 'fecha'],
+    'lluvia_mensual': ['mes'],
+    'lluvia_por_fecha': ['fecha'],
+}
+
+
+def procesar_corridas(path):
+    """Tablas de desplazamiento de un archivo de corrida: ``(tablas, n_rechazos)``."""
+    matrices, rechazos = lectura.leer_matrices_corrida(path)
+    largos, medias, picos = [], [], []
+    for corrida, m in sorted(matrices.items()):
+        largos.append(a_largo(m))
+        media = media_por_fecha(m).reset_index()
+        media.insert(0, 'corrida', corrida)
+        medias.append(media)
+        pico = picos_por_sensor(m)
+        pico.insert(0, 'corrida', corrida)
+        picos.append(pico)
+    tablas = {
+        'desplazamientos': largos,
+        'promedios_por_fecha': medias,
+        'picos': picos,
+    }
+    return tablas, len(rechazos)
+
+
+def procesar_precipitacion(path):
+    """Precipitación total por corrida y mes y por corrida y fecha: ``(tablas, n_rechazos)``."""
+    df, rechazos = lectura.leer_precipitacion(path)
+    mensual = construir_piramide(df)['M'].df
+    mensual = mensual[['corrida', 'fecha', 'suma']].rename(columns={'fecha': 'mes', 'suma': 'rainfall'})
+    por_fecha = df.groupby(['corrida', 'fecha'], as_index=False, observed=True)['rainfall'].sum()
+    tablas = {
+        'lluvia_mensual': [mensual],
+        'lluvia_por_fecha': [por_fecha],
+    }
+    return tablas, len(rechazos)
+
+
+def _escribir(df, destino, formato):
+    if formato == 'parquet':
+        df.to_parquet(destino.with_suffix('.parquet'), index=False)
+    else:
+        df.to_csv(destino.with_suffix('.csv'), index=False)
+
+
+def ejecutar(directorio, salida, formato='parquet', procesos=None):
+    """Corre el pipeline completo y escribe las tablas en ``salida``; devuelve el resumen."""
+    inicio = time.perf_counter()
+    directorio, salida = Path(directorio).resolve(), Path(salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    paths = lectura.descubrir_corridas(directorio)
+    path_prec = directorio / lectura.RUTA_PREC.name
+
+    partes = {nombre: [] for nombre in TABLAS}
+    rechazos = {}
+    errores = {}
+    workers = max(1, min(procesos or os.cpu_count() or 1, len(paths) + 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = {str(path): pool.submit(procesar_corridas, path) for path in paths}
+        if path_prec.exists():
+            futuros[str(path_prec)] = pool.submit(procesar_precipitacion, path_prec)
+        # Se recorren en el orden de los archivos para que la salida sea determinista
+        for path, futuro in futuros.items():
+            try:
+                resultado, n_rechazos = futuro.result()
+            except Exception as e:
+                errores[path] = f"{type(e).__name__}: {e}"
+                continue
+            if n_rechazos:
+                rechazos[path] = n_rechazos
+            for nombre, tablas in resultado.items():
+                partes[nombre].extend(tablas)
+
+    filas = {}
+    for nombre, tablas in partes.items():
+        df = pd.concat(tablas, ignore_index=True) if tablas else pd.DataFrame()
+        _escribir(df, salida / nombre, formato)
+        filas[nombre] = len(df)
+
+    resumen = {
+        'version': lectura.version_datos(paths, path_prec) if paths and path_prec.exists() else None,
+        'archivos': [str(p) for p in paths] + ([str(path_prec)] if path_prec.exists() else []),
+        'formato': formato,
+        'filas': filas,
+        'rechazos': rechazos,
+        'errores': errores,
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+    (salida / RESUMEN).write_text(json.dumps(resumen, indent=2, ensure_ascii=False), encoding='utf-8')
+    return resumen
+
+
+def _leer_tabla(salida, nombre, formato):
+    if formato == 'parquet':
+        df = pd.read_parquet(salida / f'{nombre}.parquet')
+    else:
+        df = pd.read_csv(salida / f'{nombre}.csv', parse_dates=_FECHAS.get(nombre, []))
+    # Fechas en ns, como las que calculan las páginas
+    for columna in _FECHAS.get(nombre, []):
+        if columna in df:
+            df[columna] = df[columna].astype('datetime64[ns]')
+    return df
+
+
+def leer_resultados(salida, paths=None, path_prec=None, version=None, tablas=TABLAS):
+    """Tablas precalculadas de ``salida`` si corresponden a la versión actual de los datos.
+
+    ``version`` es la de :func:`dinsar.lectura.version_datos` (por defecto se
+    calcula con ``paths`` y ``path_prec``) y ``tablas`` los nombres a leer.
+    Devuelve un dict nombre -> DataFrame, o ``None`` si no hay resultados,
+    falta alguna tabla o los CSV de origen cambiaron desde que se generaron.
+    """
+    salida = Path(salida)
+    try:
+        resumen = json.loads((salida / RESUMEN).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    version = lectura.version_datos(paths, path_prec) if version is None else version
+    if resumen.get('version') is None or resumen['version'] != version:
+        return None
+    try:
+        return {nombre: _leer_tabla(salida, nombre, resumen['formato']) for nombre in tablas}
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcula las tablas del tablero sin Streamlit.")
+    parser.add_argument('directorio', type=Path, help="directorio con los CSV de corridas y precipitación")
+    parser.add_argument('salida', type=Path, help="directorio donde escribir los resultados")
+    parser.add_argument('--formato', choices=['parquet', 'csv'], default='parquet')
+    parser.add_argument('--procesos', type=int, default=None, help="workers (por defecto uno por CPU)")
+    args = parser.parse_args(argv)
+
+    resumen = ejecutar(args.directorio, args.salida, args.formato, args.procesos)
+    for nombre, n in resumen['filas'].items():
+        print(f"{nombre}: {n} filas")
+    for path, mensaje in resumen['errores'].items():
+        print(f"ERROR {path}: {mensaje}", file=sys.stderr)
+    print(f"{resumen['segundos']} s")
+    return 1 if resumen['errores'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
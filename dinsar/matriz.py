@@ -0,0 +1,237 @@
+"""Almacén denso de desplazamientos: una matriz fechas × sensores por corrida.
+
+En lugar del DataFrame largo (una fila por fecha y sensor, que repite fecha,
+corrida y punto para cada sensor) cada corrida se guarda como:
+
+- ``valores``: matriz float32 de forma (n_fechas, n_sensores), NaN = sin dato;
+- ``fechas``: índice de fechas ordenado (datetime64[ns]);
+- ``sensores``: IDs de los puntos PS como int32, ordenados;
+- ``puntos``: etiqueta de adquisición (PS1, PS2, ...) alineada con ``fechas``.
+
+Filtros y promedios trabajan sobre la matriz (deltas y eventos en
+:mod:`dinsar.eventos`); el formato largo solo se construye con :func:`a_largo`
+para graficar o mostrar tablas.
+
+``valores`` también puede ser un ``np.memmap`` (ver :mod:`dinsar.cubo`). Por
+eso las reducciones sobre toda la matriz la recorren por bloques de a lo sumo
+``BLOQUE_BYTES`` (:func:`bloques`): la memoria de trabajo queda acotada sin
+importar el tamaño de la corrida, y una matriz chica es un único bloque.
+"""
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Tamaño máximo de cada bloque de la matriz en las reducciones
+BLOQUE_BYTES = 32 * 2**20
+
+
+@dataclass(frozen=True)
+class MatrizCorrida:
+    corrida: int
+    fechas: np.ndarray
+    sensores: np.ndarray
+    puntos: np.ndarray
+    valores: np.ndarray
+
+    @property
+    def forma(self):
+        return self.valores.shape
+
+
+def id_sensor(nombre):
+    """ID entero de una columna de sensor, o ``None`` si el nombre no es un número entero."""
+    nombre = str(nombre).strip()
+    return int(nombre) if re.fullmatch(r'[-+]?\d+', nombre) else None
+
+
+def columnas_de_sensor(nombres):
+    """Columnas de sensor de ``nombres`` con su ID: ``(columnas, ids)``, sin las que no tienen ID."""
+    columnas = [c for c in nombres if c not in ('punto', 'fecha', 'corrida') and id_sensor(c) is not None]
+    return columnas, np.asarray([id_sensor(c) for c in columnas], dtype=np.int32)
+
+
+def desde_ancho(df, corrida):
+    """Construye la matriz de una corrida a partir de su tabla ancha ingerida.
+
+    ``df`` tiene las columnas ``fecha``, ``punto``, ``corrida`` y una columna por
+    sensor. Se ordena por fecha y por ID de sensor y se descartan los sensores
+    sin ningún valor válido.
+    """
+    sensor_cols = [c for c in df.columns if c not in ('punto', 'fecha', 'corrida')]
+    orden_f = np.argsort(df['fecha'].to_numpy(dtype='datetime64[ns]'), kind='stable')
+    ids = np.asarray([int(c) for c in sensor_cols], dtype=np.int32)
+    orden_s = np.argsort(ids, kind='stable')
+
+    valores = df[sensor_cols].to_numpy(dtype=np.float32, na_value=np.nan)
+    valores = valores[orden_f][:, orden_s]
+    ids = ids[orden_s]
+
+    # Eliminar sensores sin ningún valor válido
+    con_datos = ~np.isnan(valores).all(axis=0)
+
+    return MatrizCorrida(
+        corrida=int(corrida),
+        fechas=df['fecha'].to_numpy(dtype='datetime64[ns]')[orden_f],
+        sensores=ids[con_datos],
+        puntos=df['punto'].astype(str).to_numpy(dtype=object)[orden_f],
+        valores=np.ascontiguousarray(valores[:, con_datos]),
+    )
+
+
+def bloques(n, bytes_por_unidad, bytes_max=None):
+    """Rangos ``(ini, fin)`` que parten ``n`` filas (o columnas) en bloques de a lo sumo ``bytes_max``."""
+    paso = max(1, int((bytes_max or BLOQUE_BYTES) // max(bytes_por_unidad, 1)))
+    return [(i, min(i + paso, n)) for i in range(0, n, paso)] or [(0, 0)]
+
+
+def columnas(m, ini, fin):
+    """Submatriz de los sensores en las posiciones ``ini:fin`` (una vista, sin copia)."""
+    return MatrizCorrida(m.corrida, m.fechas, m.sensores[ini:fin], m.puntos, m.valores[:, ini:fin])
+
+
+def bloques_de_sensores(m, bytes_max=None):
+    """Submatrices consecutivas por grupos de sensores, de a lo sumo ``bytes_max`` cada una."""
+    n_fechas, n_sensores = m.valores.shape
+    for ini, fin in bloques(n_sensores, 4 * n_fechas, bytes_max):
+        yield columnas(m, ini, fin)
+
+
+def seleccionar(m, sensores=None):
+    """Submatriz con solo los ``sensores`` pedidos (IDs); None = todos."""
+    if sensores is None:
+        return m
+    pedidos = np.asarray(sorted(int(s) for s in sensores), dtype=np.int32)
+    if np.array_equal(pedidos, m.sensores):
+        # Selección completa (el caso por defecto): la misma matriz, sin copia
+        return m
+    if len(m.sensores) == 0:
+        pos = np.zeros(0, dtype=np.intp)
+    else:
+        pos = np.minimum(np.searchsorted(m.sensores, pedidos), len(m.sensores) - 1)
+        pos = pos[m.sensores[pos] == pedidos]
+    return MatrizCorrida(m.corrida, m.fechas, m.sensores[pos], m.puntos, m.valores[:, pos])
+
+
+def recortar_fechas(m, desde=None, hasta=None):
+    """Submatriz con las fechas en [desde, hasta] (búsqueda binaria sobre ``fechas``)."""
+    ini = 0 if desde is None else np.searchsorted(m.fechas, np.datetime64(desde, 'ns'), side='left')
+    fin = len(m.fechas) if hasta is None else np.searchsorted(m.fechas, np.datetime64(hasta, 'ns'), side='right')
+    return MatrizCorrida(m.corrida, m.fechas[ini:fin], m.sensores, m.puntos[ini:fin], m.valores[ini:fin])
+
+
+def validos_por_fecha(m):
+    """Cantidad de valores no NaN de cada fecha (fila) de la matriz."""
+    n_fechas, n_sensores = m.valores.shape
+    cuenta = np.empty(n_fechas, dtype=np.int64)
+    for ini, fin in bloques(n_fechas, 4 * n_sensores):
+        cuenta[ini:fin] = (~np.isnan(m.valores[ini:fin])).sum(axis=1)
+    return cuenta
+
+
+def sumas_por_fila(m):
+    """Suma (float64) y cantidad de valores válidos de cada fila (adquisición) de ``m``."""
+    n_fechas, n_sensores = m.valores.shape
+    suma = np.empty(n_fechas, dtype=np.float64)
+    cuenta = np.empty(n_fechas, dtype=np.int64)
+    for ini, fin in bloques(n_fechas, 4 * n_sensores):
+        bloque = m.valores[ini:fin]
+        valido = ~np.isnan(bloque)
+        suma[ini:fin] = np.where(valido, bloque, 0).sum(axis=1, dtype=np.float64)
+        cuenta[ini:fin] = valido.sum(axis=1)
+    return suma, cuenta
+
+
+def media_por_fecha(m):
+    """Serie con el desplazamiento medio por fecha (solo fechas con algún dato).
+
+    Las adquisiciones repetidas en una misma fecha se promedian juntas, igual
+    que ``groupby('fecha').mean()`` sobre el formato largo.
+    """
+    suma, cuenta = sumas_por_fila(m)
+    con_datos = cuenta > 0
+    suma, cuenta = suma[con_datos], cuenta[con_datos]
+    fechas, inv = np.unique(m.fechas[con_datos], return_inverse=True)
+    media = np.bincount(inv, weights=suma) / np.bincount(inv, weights=cuenta)
+    return pd.Series(media, index=pd.DatetimeIndex(fechas, name='fecha'), name='Desplazamiento')
+
+
+def extremos_validos(m):
+    """Filas de la primera y la última observación válida de cada sensor (-1 si no tiene)."""
+    partes = []
+    for b in bloques_de_sensores(m):
+        valido = ~np.isnan(b.valores)
+        hay = valido.any(axis=0)
+        partes.append((np.where(hay, valido.argmax(axis=0), -1),
+                       np.where(hay, len(m.fechas) - 1 - valido[::-1].argmax(axis=0), -1)))
+    return np.concatenate([p for p, _ in partes]), np.concatenate([u for _, u in partes])
+
+
+def resumen_sensores(m):
+    """Desplazamiento acumulado (mm) y velocidad media (mm/año) de cada sensor.
+
+    El acumulado es la última observación válida (los valores ya son relativos
+    a la primera adquisición); la velocidad es la diferencia entre la última y
+    la primera observación válida dividida por el tiempo entre ambas.
+    """
+    primera, ultima = extremos_validos(m)
+    cols = np.arange(len(m.sensores))
+    con_datos = ultima >= 0
+    v0 = np.where(con_datos, m.valores[primera.clip(0), cols], np.nan)
+    v1 = np.where(con_datos, m.valores[ultima.clip(0), cols], np.nan)
+    dia = m.fechas.astype('datetime64[D]').astype(np.int64) if len(m.fechas) else np.zeros(1, np.int64)
+    anos = (dia[ultima.clip(0)] - dia[primera.clip(0)]) / 365.25
+    with np.errstate(divide='ignore', invalid='ignore'):
+        velocidad = np.where(anos > 0, (v1 - v0) / anos, np.nan)
+    return pd.DataFrame({'sensor': m.sensores, 'acumulado': v1, 'velocidad': velocidad})
+
+
+def _expandir(m, sensores):
+    # Valores de ``m`` en las columnas de ``sensores`` (superconjunto ordenado), NaN en el resto
+    if np.array_equal(m.sensores, sensores):
+        return m.valores
+    valores = np.full((m.valores.shape[0], len(sensores)), np.nan, dtype=np.float32)
+    valores[:, np.searchsorted(sensores, m.sensores)] = m.valores
+    return valores
+
+
+def anexar(m, nueva):
+    """Matriz con las filas de ``nueva`` (misma corrida) agregadas a las de ``m``.
+
+    Los sensores se unen (NaN donde uno no tiene dato) y las fechas quedan
+    ordenadas; el resultado es el mismo que construir la matriz con todas las
+    filas juntas.
+    """
+    if nueva.valores.shape[0] == 0:
+        return m
+    sensores = m.sensores if np.array_equal(m.sensores, nueva.sensores) else np.union1d(m.sensores, nueva.sensores)
+    fechas = np.concatenate((m.fechas, nueva.fechas))
+    puntos = np.concatenate((m.puntos, nueva.puntos))
+    valores = np.concatenate((_expandir(m, sensores), _expandir(nueva, sensores)))
+    if len(m.fechas) and nueva.fechas[0] < m.fechas[-1]:
+        orden = np.argsort(fechas, kind='stable')
+        fechas, puntos, valores = fechas[orden], puntos[orden], valores[orden]
+    return MatrizCorrida(m.corrida, fechas, sensores.astype(np.int32), puntos, np.ascontiguousarray(valores))
+
+
+def solo_lectura(m):
+    """Marca los arreglos de ``m`` como de solo lectura (para compartirla entre sesiones); la devuelve."""
+    for arreglo in (m.fechas, m.sensores, m.puntos, m.valores):
+        arreglo.flags.writeable = False
+    return m
+
+
+def a_largo(m, dropna=True):
+    """Vista larga (fecha, corrida, punto, sensor, Desplazamiento) para graficar."""
+    n_f, n_s = m.valores.shape
+    df = pd.DataFrame({
+        'fecha': np.repeat(m.fechas, n_s),
+        'corrida': np.full(n_f * n_s, m.corrida),
+        'punto': np.repeat(m.puntos, n_s),
+        'sensor': np.tile(m.sensores, n_f),
+        'Desplazamiento': m.valores.ravel(),
+    })
+    if dropna:
+        df = df[df['Desplazamiento'].notna()].reset_index(drop=True)
+    return df
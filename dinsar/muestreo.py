@@ -0,0 +1,103 @@
+"""Reducción de puntos en el servidor antes de enviar las figuras al navegador.
+
+- :func:`lttb` (Largest-Triangle-Three-Buckets) para líneas: conserva picos y
+  valles de la serie con un número fijo de puntos.
+- :func:`minmax` para dispersiones: en cada celda de una grilla tiempo × valor
+  se conservan solo el mínimo y el máximo, lo que mantiene la envolvente y la
+  densidad visual de la nube.
+
+Ambas devuelven índices sobre los arreglos originales, así que cualquier dato
+asociado (sensor, customdata) se recorta con el mismo índice. Se aplican sobre
+el rango de fechas visible: al acotar el rango, los mismos puntos máximos
+cubren menos tiempo y la figura vuelve a resolución completa.
+"""
+import os
+
+import numpy as np
+
+# Máximo de puntos por figura enviados al navegador; configurable por entorno.
+PUNTOS_MAX = int(os.environ.get("DINSAR_PUNTOS_MAX", 4000))
+
+
+def _a_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb(x, y, n=None):
+    """Índices de ``n`` puntos de la línea (x, y) elegidos con LTTB.
+
+    ``x`` debe estar ordenado y sin NaN en ``y``. Si la serie ya tiene ``n``
+    puntos o menos se devuelven todos.
+    """
+    n = PUNTOS_MAX if n is None else n
+    total = len(y)
+    if n >= total or n < 3:
+        return np.arange(total)
+
+    xf = _a_float(x)
+    yf = np.asarray(y, dtype=np.float64)
+    # n - 2 cubetas entre el primer y el último punto, que siempre se conservan
+    bordes = np.linspace(1, total - 1, n - 1).astype(np.intp)
+    indices = np.empty(n, dtype=np.intp)
+    indices[0] = 0
+    a = 0
+    for i in range(n - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        sig_ini = fin
+        sig_fin = bordes[i + 2] if i + 2 < len(bordes) else total
+        media_x = xf[sig_ini:sig_fin].mean()
+        media_y = yf[sig_ini:sig_fin].mean()
+        area = np.abs(
+            (xf[a] - media_x) * (yf[ini:fin] - yf[a])
+            - (xf[a] - xf[ini:fin]) * (media_y - yf[a])
+        )
+        a = ini + int(area.argmax())
+        indices[i + 1] = a
+    indices[-1] = total - 1
+    return indices
+
+
+def minmax(x, y, n=None):
+    """Índices de a lo sumo ``n`` (≥ 4) puntos de la nube (x, y) por cubetas mín/máx.
+
+    El primer y el último punto en x se conservan siempre (la figura cubre el
+    mismo rango de fechas). Con el resto del presupuesto el eje x se divide en
+    hasta ``(n - 2) / 2`` cubetas (una por fecha si hay menos fechas
+    distintas) y, si sobra, cada cubeta se subdivide en bandas de valor. De
+    cada celda se conservan el punto mínimo y el máximo.
+    """
+    n = PUNTOS_MAX if n is None else n
+    total = len(y)
+    if total <= n:
+        return np.arange(total)
+
+    xf = _a_float(x)
+    yf = np.asarray(y, dtype=np.float64)
+    extremos = [int(xf.argmin()), total - 1 - int(xf[::-1].argmax())]
+    n = max(n - 2, 2)
+
+    valores_x, cubeta_x = np.unique(xf, return_inverse=True)
+    n_cubetas = max(1, n // 2)
+    if len(valores_x) > n_cubetas:
+        bordes = np.linspace(valores_x[0], valores_x[-1], n_cubetas + 1)
+        cubeta_x = np.clip(np.searchsorted(bordes, xf, side='right') - 1, 0, n_cubetas - 1)
+    else:
+        n_cubetas = len(valores_x)
+
+    n_bandas = max(1, n // (2 * n_cubetas))
+    y_min, y_max = yf.min(), yf.max()
+    if n_bandas > 1 and y_max > y_min:
+        banda = np.minimum(((yf - y_min) / (y_max - y_min) * n_bandas).astype(np.intp), n_bandas - 1)
+    else:
+        banda = np.zeros(total, dtype=np.intp)
+
+    celda = cubeta_x * n_bandas + banda
+    orden = np.lexsort((yf, celda))
+    c = celda[orden]
+    cambio = c[1:] != c[:-1]
+    primeros = np.concatenate(([True], cambio))
+    ultimos = np.concatenate((cambio, [True]))
+    return np.union1d(orden[primeros | ultimos], extremos)
@@ -0,0 +1,502 @@
+"""Dataset Arrow particionado por corrida, leído con filtros empujados al escaneo.
+
+Los desplazamientos y la precipitación normalizados se escriben una vez por
+versión de los datos en un directorio con particiones Hive::
+
+    <raiz>/<version>/
+        desplazamiento/corrida=<N>/parte-<k>.parquet sensor, fila, fecha, Desplazamiento
+        precipitacion/corrida=<N>/parte-0.parquet    fecha, rainfall
+        adquisiciones.parquet                        corrida, fecha, punto
+        sensores.parquet                             corrida, sensor
+        agregados/corrida=<N>/                       promedio por fecha y picos (ver dinsar.agregados)
+        informe.json                                 rechazos y errores de la carga
+        huellas.json                                 filas, partes y sha1 por parte de cada corrida
+        posiciones.json                              hasta dónde se leyó cada CSV de corrida
+
+Los desplazamientos están en formato largo, sin NaN (``fila`` es la
+posición de la adquisición dentro de la corrida), y cada grupo de filas es un
+mosaico de la matriz: un tramo de sensores consecutivos por un tramo de a lo
+sumo ``FECHAS_GRUPO`` fechas (unas ``FILAS_GRUPO`` celdas), con estadísticas
+mín/máx. Al consultar (:meth:`Particionado.matriz`) la corrida elige la
+partición y los filtros de sensores y de fechas se evalúan contra esas
+estadísticas: solo se leen los mosaicos que pueden tener datos pedidos, así
+que acotar las fechas también recorta la lectura (con grupos ordenados solo
+por sensor, cada uno cubriría casi todas las fechas). Adquisiciones y sensores
+son el catálogo (pocas filas) con que las páginas arman sus filtros sin leer
+ningún desplazamiento.
+
+Cada versión va en su propio subdirectorio, que se escribe completo y luego
+se renombra: una sesión que todavía usa la versión anterior la sigue leyendo.
+Una versión nueva no reescribe lo que no cambió: si una corrida tiene los
+mismos sensores y las fechas de la versión anterior son un prefijo de las
+suyas con los mismos valores (comparados por sha1, parte por parte), sus
+partes se enlazan (hard link) y solo las adquisiciones agregadas van a una
+parte nueva; una corrida sin cambios solo se enlaza. Con ``PARTES_MAX``
+partes la corrida se reescribe en una sola.
+
+Comparar contra la matriz completa exige tenerla en memoria. Por eso
+:func:`escribir` también acepta solo las filas agregadas de cada corrida
+(``agregadas``, de :func:`dinsar.lectura.leer_agregadas` a partir de las
+posiciones guardadas en la versión anterior): entonces no se lee ni se
+resume nada de lo ya escrito y el costo de la versión sigue a las filas
+agregadas. Los agregados de la vista completa de cada corrida (promedio
+por fecha y mayor cambio por sensor) se extienden de la misma forma con solo
+las filas nuevas.
+"""
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from dinsar import agregados
+from dinsar.matriz import MatrizCorrida, anexar, bloques, bloques_de_sensores
+
+# Celdas (sensores × fechas) por grupo de filas en los Parquet de desplazamiento
+# (unidad mínima de lectura) y fechas por grupo
+FILAS_GRUPO = 16384
+FECHAS_GRUPO = 32
+
+# Versiones escritas que se conservan en disco (ver VERSIONES_EN_MEMORIA en datos)
+VERSIONES_CONSERVADAS = 2
+
+# Partes por corrida a partir de las cuales se reescribe la partición entera
+PARTES_MAX = 8
+
+ORIGEN = 'origen.json'
+HUELLAS = 'huellas.json'
+POSICIONES = 'posiciones.json'
+AGREGADOS = 'agregados'
+
+_ESQUEMA_DESP = pa.schema([
+    ('sensor', pa.int32()),
+    ('fila', pa.int32()),
+    ('fecha', pa.timestamp('ns')),
+    ('Desplazamiento', pa.float32()),
+])
+# Columnas con codificación de diccionario (los valores casi no se repiten)
+_DICCIONARIO = ['sensor', 'fila', 'fecha']
+_ESQUEMA_LLUVIA = pa.schema([('fecha', pa.timestamp('ns')), ('rainfall', pa.float64())])
+
+
+@dataclass(frozen=True)
+class Ejes:
+    """Fechas, puntos y sensores de una corrida, sin sus valores."""
+    corrida: int
+    fechas: np.ndarray
+    sensores: np.ndarray
+    puntos: np.ndarray
+
+
+def ruta_version(raiz, origen):
+    """Subdirectorio de la versión de los datos identificada por ``origen``."""
+    return Path(raiz) / hashlib.sha1(origen.encode()).hexdigest()[:16]
+
+
+def _largo(sensores, valores, ini=0):
+    # Celdas válidas de un tramo de filas ``ini..`` × ``sensores``, ordenadas por sensor y fila
+    valores = valores.T
+    valido = ~np.isnan(valores)
+    fila = np.broadcast_to(np.arange(ini, ini + valores.shape[1], dtype=np.int32), valores.shape)[valido]
+    return np.repeat(sensores, valido.sum(axis=1)), fila, valores[valido]
+
+
+def _escribir_filas(ruta, m, ini=0, base=0):
+    # Las filas ``ini:`` de ``m``, con un grupo de filas por mosaico de sensores ×
+    # fechas: cada bloque de sensores se pasa a formato largo y se reordena
+    # (estable) por tramo de fechas. ``base`` es la posición de la primera
+    # fila de ``m`` en la corrida (``m`` puede traer solo filas agregadas).
+    n_fechas = len(m.fechas)
+    paso = max(1, min(FECHAS_GRUPO, n_fechas - ini))
+    with pq.ParquetWriter(ruta, _ESQUEMA_DESP, use_dictionary=_DICCIONARIO) as escritor:
+        for b in bloques_de_sensores(m, 4 * n_fechas * max(1, FILAS_GRUPO // paso)):
+            sensor, fila, valor = _largo(b.sensores, np.asarray(b.valores[ini:]), ini)
+            tramo = ((fila - ini) // paso).astype(np.int16)
+            orden = np.argsort(tramo, kind='stable')
+            cortes = np.searchsorted(tramo[orden], np.arange(1, -(-(n_fechas - ini) // paso)))
+            for grupo in np.split(orden, cortes):
+                escritor.write_table(pa.table({
+                    'sensor': sensor[grupo],
+                    'fila': fila[grupo] + base,
+                    'fecha': m.fechas[fila[grupo]],
+                    'Desplazamiento': valor[grupo],
+                }, schema=_ESQUEMA_DESP), row_group_size=FILAS_GRUPO)
+
+
+def _resumir(m, ini, fin):
+    # sha1 de los bytes de las filas ini:fin de la matriz, recorrida por bloques
+    sha1 = hashlib.sha1()
+    for a, b in bloques(fin - ini, 4 * m.valores.shape[1]):
+        sha1.update(np.ascontiguousarray(m.valores[ini + a:ini + b]).data)
+    return sha1.hexdigest()
+
+
+def _huella_previa(anterior, corrida):
+    # Huella de la corrida en la versión anterior, si tiene sha1 por parte
+    if anterior is None or corrida not in anterior.ejes:
+        return None
+    huella = anterior.huellas.get(str(corrida))
+    return huella if huella is not None and 'tramos' in huella else None
+
+
+def _previa(anterior, m):
+    # Filas y huella de la corrida en la versión anterior, si sus ejes son un
+    # prefijo de los de ``m`` con los mismos sensores; si no, (0, None)
+    if _huella_previa(anterior, m.corrida) is None:
+        return 0, None
+    ejes = anterior.ejes[m.corrida]
+    k = len(ejes.fechas)
+    if (k == 0 or k > len(m.fechas) or not np.array_equal(ejes.sensores, m.sensores)
+            or not np.array_equal(ejes.fechas, m.fechas[:k]) or not np.array_equal(ejes.puntos, m.puntos[:k])):
+        return 0, None
+    return k, anterior.huellas[str(m.corrida)]
+
+
+def _enlazar(origen, destino):
+    try:
+        os.link(origen, destino)
+    except OSError:
+        if not origen.exists():
+            raise
+        shutil.copy2(origen, destino)
+
+
+def _enlazar_partes(anterior, corrida, huella, destino):
+    previas = anterior.directorio / 'desplazamiento' / f'corrida={corrida}'
+    for nombre in huella['partes']:
+        _enlazar(previas / nombre, destino / nombre)
+
+
+def _escribir_corrida(destino, m, anterior=None):
+    """Escribe la partición de ``m``; devuelve su huella (filas, partes y sha1 de cada una).
+
+    Si la versión ``anterior`` tiene un prefijo de esta corrida con los mismos
+    valores, sus partes se enlazan y solo se escriben las filas nuevas.
+    Devuelve ``(huella, reutilizadas)``, con las filas de ese prefijo.
+    """
+    destino.mkdir(parents=True)
+    n_fechas = len(m.fechas)
+    k, huella = _previa(anterior, m)
+    ini, partes, tramos = 0, [], []
+    if (huella is not None and len(huella['partes']) < PARTES_MAX
+            and all(_resumir(m, a, b) == sha1 for a, b, sha1 in huella['tramos'])):
+        try:
+            _enlazar_partes(anterior, m.corrida, huella, destino)
+            ini, partes, tramos = k, list(huella['partes']), [list(t) for t in huella['tramos']]
+        except OSError:
+            # La versión anterior se podó mientras tanto: se escribe todo
+            for parte in destino.iterdir():
+                parte.unlink()
+    if ini < n_fechas or not partes:
+        partes.append(f'parte-{len(partes)}.parquet')
+        _escribir_filas(destino / partes[-1], m, ini)
+        tramos.append([ini, n_fechas, _resumir(m, ini, n_fechas)])
+    return {'filas': n_fechas, 'partes': partes, 'tramos': tramos}, ini
+
+
+def _anexar_corrida(destino, anterior, corrida, nueva):
+    """Escribe la partición de una corrida de ``anterior`` con las filas ``nueva`` al final.
+
+    ``nueva`` es una matriz con solo las filas agregadas (``None`` = ninguna).
+    Las partes anteriores se enlazan sin leerlas. Devuelve ``(huella, ejes,
+    nueva)``, con ``nueva`` llevada a todos los sensores de la corrida, o
+    ``None`` si así no se puede: ``nueva`` trae sensores que la corrida no
+    tenía o fechas anteriores a su última, o la corrida ya tiene
+    ``PARTES_MAX`` partes. Un ``OSError`` indica que la versión anterior se
+    podó mientras tanto.
+    """
+    huella = _huella_previa(anterior, corrida)
+    if huella is None:
+        return None
+    ejes = anterior.ejes[corrida]
+    k = len(ejes.fechas)
+    hay_nuevas = nueva is not None and len(nueva.fechas) > 0
+    if hay_nuevas and (len(huella['partes']) >= PARTES_MAX or not np.isin(nueva.sensores, ejes.sensores).all()
+                       or (k and nueva.fechas[0] < ejes.fechas[-1])):
+        return None
+
+    destino.mkdir(parents=True)
+    _enlazar_partes(anterior, corrida, huella, destino)
+    partes, tramos = list(huella['partes']), [list(t) for t in huella['tramos']]
+    if not hay_nuevas:
+        return {'filas': k, 'partes': partes, 'tramos': tramos}, ejes, None
+
+    # Las filas nuevas con las columnas de todos los sensores de la corrida
+    valores = np.full((len(nueva.fechas), len(ejes.sensores)), np.nan, dtype=np.float32)
+    valores[:, np.searchsorted(ejes.sensores, nueva.sensores)] = nueva.valores
+    nueva = MatrizCorrida(corrida, nueva.fechas, ejes.sensores, nueva.puntos, valores)
+    partes.append(f'parte-{len(partes)}.parquet')
+    _escribir_filas(destino / partes[-1], nueva, base=k)
+    tramos.append([k, k + len(nueva.fechas), _resumir(nueva, 0, len(nueva.fechas))])
+    ejes = Ejes(corrida, np.concatenate((ejes.fechas, nueva.fechas)), ejes.sensores,
+                np.concatenate((ejes.puntos, nueva.puntos)))
+    return {'filas': len(ejes.fechas), 'partes': partes, 'tramos': tramos}, ejes, nueva
+
+
+def _agregados_previos(anterior, corrida):
+    # Agregados de la corrida en la versión anterior, si los tiene
+    if anterior is None or corrida not in anterior.ejes:
+        return None
+    try:
+        return agregados.leer(anterior.directorio / AGREGADOS / f'corrida={corrida}')
+    except OSError:
+        return None
+
+
+def _agregados_de_matriz(destino, anterior, m, reutilizadas):
+    # Agregados de la corrida completa ``m``: si sus primeras ``reutilizadas``
+    # filas ya estaban en la versión anterior, se extienden los de esa versión
+    previos = _agregados_previos(anterior, m.corrida) if reutilizadas else None
+    if previos is None:
+        agregados.guardar(agregados.calcular(m), destino)
+        return
+    k = reutilizadas
+    filas = MatrizCorrida(m.corrida, m.fechas[k:], m.sensores, m.puntos[k:], m.valores[k:])
+    agregados.guardar(agregados.extender(previos, filas), destino)
+
+
+def _agregados_anexados(destino, anterior, corrida, nueva):
+    # Agregados de la corrida de la versión anterior con las filas ``nueva``
+    # (ya con todos sus sensores; ``None`` = ninguna)
+    previos = _agregados_previos(anterior, corrida)
+    if previos is None:
+        # La versión anterior no tiene agregados: salen de su matriz completa
+        m = anterior.matriz(corrida)
+        agregados.guardar(agregados.calcular(m if nueva is None else anexar(m, nueva)), destino)
+    elif nueva is None:
+        destino.mkdir(parents=True)
+        origen = anterior.directorio / AGREGADOS / f'corrida={corrida}'
+        for nombre in (agregados.POR_FECHA, agregados.POR_SENSOR):
+            _enlazar(origen / nombre, destino / nombre)
+    else:
+        agregados.guardar(agregados.extender(previos, nueva), destino)
+
+
+def _versiones(raiz):
+    # Versiones terminadas, de la más reciente a la más vieja. Los ``.tmp`` de
+    # una escritura en curso (de este u otro proceso) ya tienen ORIGEN antes
+    # del ``os.replace`` y no cuentan como versión.
+    return sorted((d for d in Path(raiz).iterdir()
+                   if d.suffix != '.tmp' and (d / ORIGEN).exists()),
+                  key=lambda d: d.stat().st_mtime, reverse=True)
+
+
+def ultima(raiz, excluir=None):
+    """La versión escrita más reciente en ``raiz`` (salvo ``excluir``) con huellas, o ``None``."""
+    if not Path(raiz).is_dir():
+        return None
+    for directorio in _versiones(raiz):
+        if directorio == excluir or not (directorio / HUELLAS).exists():
+            continue
+        try:
+            return Particionado(directorio)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def _unir(partes, tipo):
+    return np.concatenate(partes).astype(tipo) if partes else np.empty(0, dtype=tipo)
+
+
+def _podar(raiz, conservar):
+    for vieja in _versiones(raiz)[conservar:]:
+        shutil.rmtree(vieja, ignore_errors=True)
+
+
+def escribir(raiz, matrices, lluvia, origen, rechazos=None, errores=None, conservar=VERSIONES_CONSERVADAS,
+             agregadas=None, anterior=None, posiciones=None):
+    """Escribe el dataset de una versión de los datos y lo abre.
+
+    ``matrices`` es un dict corrida -> :class:`~dinsar.matriz.MatrizCorrida`,
+    ``lluvia`` la tabla (fecha, rainfall, corrida) de precipitaciones y
+    ``rechazos``/``errores`` los reportes de la carga (dict ruta -> DataFrame
+    y dict ruta -> mensaje). Se conservan las ``conservar`` versiones más
+    recientes. Las corridas que no cambiaron respecto de la última versión
+    escrita (o ``anterior``), o que solo recibieron adquisiciones al final, la
+    reutilizan.
+
+    ``agregadas`` es un dict corrida -> matriz con solo las filas agregadas a
+    esa corrida de ``anterior`` (``None`` = sin cambios): esas corridas se
+    escriben sin sus matrices completas. ``posiciones`` (dict ruta ->
+    posición, ver :func:`dinsar.lectura.leer_matrices_con_posiciones`) se
+    guarda para que la próxima versión pueda pedir solo lo agregado.
+    """
+    final = ruta_version(raiz, origen)
+    tmp = final.with_name(f'{final.name}.{os.getpid()}.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    if anterior is None:
+        anterior = ultima(raiz, final)
+    tmp.mkdir(parents=True)
+    try:
+        _escribir_contenido(tmp, matrices, agregadas or {}, anterior, lluvia, rechazos, errores, posiciones)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    (tmp / ORIGEN).write_text(origen, encoding='utf-8')
+    try:
+        os.replace(tmp, final)
+    except OSError:
+        # Otro proceso escribió la misma versión primero
+        shutil.rmtree(tmp, ignore_errors=True)
+    _podar(raiz, conservar)
+    return Particionado(final)
+
+
+def _escribir_contenido(tmp, matrices, agregadas, anterior, lluvia, rechazos, errores, posiciones):
+    # Todo lo de una versión salvo el origen, que se escribe último
+
+    # 1) Desplazamientos (solo lo nuevo respecto de la versión anterior) y catálogo
+    ms, huellas = [], {}
+    for corrida, m in sorted(matrices.items()):
+        huellas[str(corrida)], k = _escribir_corrida(tmp / 'desplazamiento' / f'corrida={corrida}', m, anterior)
+        _agregados_de_matriz(tmp / AGREGADOS / f'corrida={corrida}', anterior, m, k)
+        ms.append(m)
+    for corrida, nueva in sorted(agregadas.items()):
+        destino = tmp / 'desplazamiento' / f'corrida={corrida}'
+        escrita = _anexar_corrida(destino, anterior, corrida, nueva)
+        if escrita is None:
+            # No es una extensión de lo escrito: la matriz completa sale de la
+            # versión anterior más las filas nuevas
+            m = anterior.matriz(corrida) if anterior is not None and corrida in anterior.ejes else None
+            m = nueva if m is None else m if nueva is None else anexar(m, nueva)
+            huellas[str(corrida)], k = _escribir_corrida(destino, m, anterior)
+            _agregados_de_matriz(tmp / AGREGADOS / f'corrida={corrida}', anterior, m, k)
+        else:
+            huellas[str(corrida)], m, nueva = escrita
+            _agregados_anexados(tmp / AGREGADOS / f'corrida={corrida}', anterior, corrida, nueva)
+        ms.append(m)
+    ms.sort(key=lambda m: m.corrida)
+    pq.write_table(pa.table({
+        'corrida': _unir([np.full(len(m.fechas), m.corrida) for m in ms], np.int32),
+        'fecha': _unir([m.fechas for m in ms], 'datetime64[ns]'),
+        'punto': _unir([m.puntos for m in ms], str),
+    }), tmp / 'adquisiciones.parquet')
+    pq.write_table(pa.table({
+        'corrida': _unir([np.full(len(m.sensores), m.corrida) for m in ms], np.int32),
+        'sensor': _unir([m.sensores for m in ms], np.int32),
+    }), tmp / 'sensores.parquet')
+
+    # 2) Precipitación, ordenada por fecha dentro de cada corrida
+    for corrida, g in lluvia.groupby(lluvia['corrida'].astype(str), observed=True, sort=True):
+        destino = tmp / 'precipitacion' / f'corrida={corrida}'
+        destino.mkdir(parents=True)
+        g = g.sort_values('fecha', kind='stable')
+        pq.write_table(pa.table({
+            'fecha': g['fecha'].to_numpy(dtype='datetime64[ns]'),
+            'rainfall': g['rainfall'].to_numpy(dtype=np.float64),
+        }, schema=_ESQUEMA_LLUVIA), destino / 'parte-0.parquet')
+
+    # 3) Informe de la carga, huellas y posiciones
+    (tmp / 'informe.json').write_text(json.dumps({
+        'rechazos': {p: json.loads(r.to_json(orient='records', force_ascii=False))
+                     for p, r in (rechazos or {}).items()},
+        'errores': errores or {},
+    }, ensure_ascii=False), encoding='utf-8')
+    (tmp / HUELLAS).write_text(json.dumps(huellas), encoding='utf-8')
+    (tmp / POSICIONES).write_text(json.dumps(posiciones or {}), encoding='utf-8')
+
+
+def abrir(raiz, origen):
+    """El dataset de la versión ``origen``, o ``None`` si todavía no se escribió."""
+    directorio = ruta_version(raiz, origen)
+    try:
+        guardado = (directorio / ORIGEN).read_text(encoding='utf-8')
+    except OSError:
+        return None
+    return Particionado(directorio) if guardado == origen else None
+
+
+def _dataset(directorio):
+    if not directorio.is_dir():
+        return None
+    return ds.dataset(directorio, format='parquet',
+                      partitioning=ds.partitioning(pa.schema([('corrida', pa.int32())]), flavor='hive'))
+
+
+class Particionado:
+    """Un dataset escrito por :func:`escribir`: catálogo en memoria y lecturas con filtros."""
+
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+        self._desp = _dataset(self.directorio / 'desplazamiento')
+        self._lluvia = _dataset(self.directorio / 'precipitacion')
+
+        adq = pq.read_table(self.directorio / 'adquisiciones.parquet')
+        sens = pq.read_table(self.directorio / 'sensores.parquet')
+        corrida_adq = adq['corrida'].to_numpy()
+        corrida_sens = sens['corrida'].to_numpy()
+        fechas = adq['fecha'].to_numpy().astype('datetime64[ns]')
+        puntos = adq['punto'].to_numpy(zero_copy_only=False).astype(object)
+        sensores = sens['sensor'].to_numpy().astype(np.int32)
+        self.ejes = {}
+        for corrida in np.unique(corrida_adq):
+            filas = corrida_adq == corrida
+            self.ejes[int(corrida)] = Ejes(int(corrida), fechas[filas], sensores[corrida_sens == corrida],
+                                           puntos[filas])
+
+        informe = json.loads((self.directorio / 'informe.json').read_text(encoding='utf-8'))
+        self.rechazos = {p: pd.DataFrame.from_records(r) for p, r in informe['rechazos'].items()}
+        self.errores = informe['errores']
+        ruta_huellas = self.directorio / HUELLAS
+        self.huellas = json.loads(ruta_huellas.read_text(encoding='utf-8')) if ruta_huellas.exists() else {}
+        ruta_posiciones = self.directorio / POSICIONES
+        self.posiciones = (json.loads(ruta_posiciones.read_text(encoding='utf-8'))
+                           if ruta_posiciones.exists() else {})
+
+    @property
+    def corridas(self):
+        return sorted(self.ejes)
+
+    def matriz(self, corrida, sensores=None, desde=None, hasta=None):
+        """Matriz de ``corrida`` con los ``sensores`` y las fechas en [desde, hasta] pedidos.
+
+        Igual a ``seleccionar(recortar_fechas(m, desde, hasta), sensores)``
+        sobre la matriz completa, pero leyendo solo los grupos de filas que
+        pueden contener esos sensores y fechas.
+        """
+        ejes = self.ejes[corrida]
+        ini = 0 if desde is None else np.searchsorted(ejes.fechas, np.datetime64(desde, 'ns'), side='left')
+        fin = (len(ejes.fechas) if hasta is None
+               else np.searchsorted(ejes.fechas, np.datetime64(hasta, 'ns'), side='right'))
+        columnas = ejes.sensores
+        if sensores is not None:
+            pedidos = np.unique(np.asarray(list(sensores), dtype=np.int32))
+            columnas = pedidos[np.isin(pedidos, ejes.sensores)]
+
+        valores = np.full((fin - ini, len(columnas)), np.nan, dtype=np.float32)
+        if len(columnas) and fin > ini:
+            filtro = ds.field('corrida') == corrida
+            if sensores is not None:
+                filtro &= ds.field('sensor').isin(pa.array(columnas))
+            if desde is not None:
+                filtro &= ds.field('fecha') >= pa.scalar(np.datetime64(desde, 'ns'), pa.timestamp('ns'))
+            if hasta is not None:
+                filtro &= ds.field('fecha') <= pa.scalar(np.datetime64(hasta, 'ns'), pa.timestamp('ns'))
+            tabla = self._desp.to_table(columns=['sensor', 'fila', 'Desplazamiento'], filter=filtro)
+            fila = tabla['fila'].to_numpy() - ini
+            valores[fila, np.searchsorted(columnas, tabla['sensor'].to_numpy())] = tabla['Desplazamiento'].to_numpy()
+
+        return MatrizCorrida(corrida, ejes.fechas[ini:fin], columnas, ejes.puntos[ini:fin], valores)
+
+    def agregados(self, corrida):
+        """:class:`~dinsar.agregados.Agregados` de la corrida completa (promedio por fecha y picos)."""
+        return agregados.leer(self.directorio / AGREGADOS / f'corrida={corrida}')
+
+    def lluvia(self, corrida, desde=None, hasta=None):
+        """Registros (fecha, rainfall) de precipitación de ``corrida`` en [desde, hasta]."""
+        if self._lluvia is None:
+            return pd.DataFrame({'fecha': pd.Series(dtype='datetime64[ns]'), 'rainfall': pd.Series(dtype=float)})
+        filtro = ds.field('corrida') == corrida
+        if desde is not None:
+            filtro &= ds.field('fecha') >= pa.scalar(pd.Timestamp(desde).as_unit('ns'), pa.timestamp('ns'))
+        if hasta is not None:
+            filtro &= ds.field('fecha') <= pa.scalar(pd.Timestamp(hasta).as_unit('ns'), pa.timestamp('ns'))
+        return self._lluvia.to_table(columns=['fecha', 'rainfall'], filter=filtro).to_pandas()
@@ -0,0 +1,185 @@
+"""Instrumentación por etapas de cada ejecución de página.
+
+Cada página llama a :func:`iniciar` al comienzo y envuelve sus etapas (carga,
+formato largo, filtros, agregados, figuras) en ``with etapa('nombre') as e``.
+Por etapa se registra el tiempo, las filas y la memoria del resultado
+(``e.anotar(obj)``) y si hubo acierto o fallo de caché. Al final,
+:func:`panel` muestra la tabla en la barra lateral; cada etapa también se
+emite como una línea JSON en el logger ``dinsar.perfil``.
+
+Se activa con la variable de entorno ``DINSAR_PERFIL=1`` o con ``?perfil=1``
+en la URL. Desactivado, ``etapa`` devuelve un objeto nulo compartido y no se
+mide nada: el costo es una búsqueda de atributo por etapa.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger('dinsar.perfil')
+
+_ACTIVO_POR_ENTORNO = os.environ.get('DINSAR_PERFIL', '').lower() in ('1', 'true', 'si', 'sí')
+
+# Streamlit ejecuta cada sesión en su propio hilo: el registro de la
+# ejecución actual es local al hilo.
+_local = threading.local()
+
+
+def _memoria_mb(obj):
+    if isinstance(obj, dict):
+        partes = [_memoria_mb(v) for v in obj.values()]
+        return None if None in partes else sum(partes)
+    if isinstance(obj, pd.DataFrame):
+        return obj.memory_usage(index=True).sum() / 2**20
+    if isinstance(obj, pd.Series):
+        return obj.memory_usage(index=True) / 2**20
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes / 2**20
+    valores = getattr(obj, 'valores', None)  # MatrizCorrida
+    if isinstance(valores, np.ndarray):
+        return valores.nbytes / 2**20
+    return None
+
+
+def _filas(obj):
+    if isinstance(obj, dict):
+        partes = [_filas(v) for v in obj.values()]
+        return None if None in partes else sum(partes)
+    forma = getattr(obj, 'forma', None)
+    if forma is None:
+        forma = getattr(obj, 'shape', None)
+    if forma is not None:
+        return int(np.prod(forma))
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+class Etapa:
+    __slots__ = ('nombre', 'nivel', 'inicio', 'segundos', 'filas', 'memoria_mb', 'cache', '_fallos')
+
+    def __init__(self, nombre, cache):
+        self.nombre = nombre
+        self.nivel = 0
+        self.segundos = None
+        self.cache = 'sí' if cache else None
+        self.filas = None
+        self.memoria_mb = None
+        self._fallos = 0
+
+    def anotar(self, obj, filas=None):
+        """Registra filas (o celdas de una matriz) y memoria de ``obj``; lo devuelve."""
+        self.filas = filas if filas is not None else _filas(obj)
+        mb = _memoria_mb(obj)
+        self.memoria_mb = None if mb is None else round(mb, 3)
+        return obj
+
+    def __enter__(self):
+        registro = _local.registro
+        self._fallos = registro.fallos
+        self.nivel = len(registro.pila)
+        registro.pila.append(self)
+        registro.etapas.append(self)  # en orden de inicio; las anidadas quedan debajo
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.segundos = time.perf_counter() - self.inicio
+        registro = _local.registro
+        registro.pila.pop()
+        if registro.fallos > self._fallos:
+            self.cache = 'fallo'
+        elif self.cache:
+            self.cache = 'acierto'
+        log.info(json.dumps({
+            'pagina': registro.pagina, 'etapa': self.nombre, 'segundos': round(self.segundos, 5),
+            'filas': self.filas, 'memoria_mb': self.memoria_mb, 'cache': self.cache,
+        }, ensure_ascii=False))
+        return False
+
+
+class _EtapaNula:
+    __slots__ = ()
+
+    def anotar(self, obj, filas=None):
+        return obj
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULA = _EtapaNula()
+
+
+class Registro:
+    def __init__(self, pagina):
+        self.pagina = pagina
+        self.inicio = time.perf_counter()
+        self.etapas = []
+        self.pila = []
+        self.fallos = 0
+
+    def tabla(self):
+        return pd.DataFrame([{
+            'etapa': '· ' * e.nivel + e.nombre,
+            'ms': None if e.segundos is None else round(e.segundos * 1000, 2), 'filas': e.filas,
+            'memoria_mb': e.memoria_mb, 'cache': e.cache,
+        } for e in self.etapas], columns=['etapa', 'ms', 'filas', 'memoria_mb', 'cache'])
+
+
+def _activo_por_url():
+    import streamlit as st
+    try:
+        return st.query_params.get('perfil', '').lower() in ('1', 'true', 'si', 'sí')
+    except Exception:
+        return False
+
+
+def iniciar(pagina, activo=None):
+    """Comienza el registro de esta ejecución de ``pagina`` si el perfil está activo."""
+    if activo is None:
+        activo = _ACTIVO_POR_ENTORNO or _activo_por_url()
+    _local.registro = Registro(pagina) if activo else None
+    return _local.registro
+
+
+def activo():
+    return getattr(_local, 'registro', None) is not None
+
+
+def etapa(nombre, cache=False):
+    """Context manager que mide la etapa ``nombre``.
+
+    Con ``cache=True`` la etapa pasa por un caché: se marca ``fallo`` si dentro
+    se llamó a :func:`fallo_cache` y ``acierto`` en caso contrario.
+    """
+    if getattr(_local, 'registro', None) is None:
+        return _NULA
+    return Etapa(nombre, cache)
+
+
+def fallo_cache():
+    """Lo llaman las funciones memorizadas cuando calculan (es decir, en un fallo)."""
+    registro = getattr(_local, 'registro', None)
+    if registro is not None:
+        registro.fallos += 1
+
+
+def panel():
+    """Muestra en la barra lateral la tabla de etapas de esta ejecución."""
+    registro = getattr(_local, 'registro', None)
+    if registro is None:
+        return
+    import streamlit as st
+    total_ms = (time.perf_counter() - registro.inicio) * 1000
+    with st.sidebar.expander("⏱️ Diagnóstico de la ejecución", expanded=False):
+        st.caption(f"{registro.pagina}: {total_ms:.0f} ms en total")
+        st.dataframe(registro.tabla(), hide_index=True)
@@ -0,0 +1,104 @@
+"""Pirámide de agregados de lluvia: diario, semanal, mensual y anual.
+
+Para cada corrida y cada periodo se guarda la lluvia total (``suma``), el
+máximo diario (``maximo``) y los días con lluvia (``dias_lluvia``). El nivel
+diario se arma desde los registros y cada nivel superior desde el diario, una
+sola vez por versión de los datos. Cada nivel es una
+:class:`~dinsar.indice.TablaIndexada` por corrida: las figuras leen un corte
+ya agregado en lugar de agrupar en cada ejecución, y :func:`nivel_para` elige
+la resolución más fina que entra en el rango de fechas visible.
+"""
+import numpy as np
+import pandas as pd
+
+from dinsar.indice import filtrar, indexar
+from dinsar.muestreo import PUNTOS_MAX
+
+# Resoluciones de la más fina a la más gruesa: código -> nombre
+RESOLUCIONES = {
+    'D': 'Diaria',
+    'W': 'Semanal',
+    'M': 'Mensual',
+    'Y': 'Anual',
+}
+
+# Estadísticos de cada nivel: columna -> etiqueta
+ESTADISTICOS = {
+    'suma': 'Precipitación total (mm)',
+    'maximo': 'Máximo diario (mm)',
+    'dias_lluvia': 'Días con lluvia',
+}
+
+
+def inicio_periodo(fechas, resolucion):
+    """Fecha de inicio del periodo (día, semana desde el lunes, mes o año) de cada fecha."""
+    dias = np.asarray(fechas, dtype='datetime64[ns]').astype('datetime64[D]')
+    if resolucion == 'W':
+        # 1970-01-01 fue jueves: (días + 3) % 7 es el día de la semana con lunes = 0
+        dias = dias - (dias.astype(np.int64) + 3) % 7
+    elif resolucion == 'M':
+        dias = dias.astype('datetime64[M]')
+    elif resolucion == 'Y':
+        dias = dias.astype('datetime64[Y]')
+    return dias.astype('datetime64[ns]')
+
+
+def construir_piramide(df):
+    """Dict resolución -> tabla (corrida, fecha, suma, maximo, dias_lluvia) indexada por corrida.
+
+    ``df`` tiene ``corrida``, ``fecha`` y ``rainfall``; ``fecha`` de cada
+    nivel es el inicio del periodo.
+    """
+    diario = (
+        pd.DataFrame({
+            'corrida': df['corrida'],
+            'fecha': inicio_periodo(df['fecha'], 'D'),
+            'rainfall': df['rainfall'].to_numpy(dtype=np.float64),
+        })
+        .groupby(['corrida', 'fecha'], observed=True, sort=True)['rainfall']
+        .sum()
+        .reset_index(name='suma')
+    )
+    diario['maximo'] = diario['suma']
+    diario['dias_lluvia'] = (diario['suma'] > 0).astype(np.int64)
+
+    piramide = {'D': indexar(diario, ['corrida'])}
+    for resolucion in ('W', 'M', 'Y'):
+        nivel = (
+            diario.assign(fecha=inicio_periodo(diario['fecha'], resolucion))
+            .groupby(['corrida', 'fecha'], observed=True, sort=True)
+            .agg(suma=('suma', 'sum'), maximo=('maximo', 'max'), dias_lluvia=('dias_lluvia', 'sum'))
+            .reset_index()
+        )
+        piramide[resolucion] = indexar(nivel, ['corrida'])
+    return piramide
+
+
+def _desde_periodo(desde, resolucion):
+    # El periodo que contiene ``desde`` también es visible
+    return None if desde is None else pd.Timestamp(inicio_periodo([pd.Timestamp(desde)], resolucion)[0])
+
+
+def serie(piramide, resolucion, corrida, desde=None, hasta=None):
+    """Filas del nivel ``resolucion`` de ``corrida`` cuyos periodos tocan el rango de fechas."""
+    return filtrar(piramide[resolucion], corrida, desde=_desde_periodo(desde, resolucion), hasta=hasta)
+
+
+def tabla(piramide, resolucion, corridas, desde=None, hasta=None):
+    """Como :func:`serie` para varias corridas, concatenadas en orden."""
+    partes = [serie(piramide, resolucion, c, desde, hasta) for c in corridas]
+    if not partes:
+        return piramide[resolucion].df.iloc[0:0]
+    return pd.concat(partes, ignore_index=True)
+
+
+def nivel_para(piramide, corridas, desde=None, hasta=None, puntos_max=None):
+    """Resolución más fina cuyo número de periodos visibles no supera ``puntos_max``.
+
+    Solo cuenta filas con los rangos precalculados del índice; no agrega nada.
+    """
+    puntos_max = PUNTOS_MAX if puntos_max is None else puntos_max
+    for resolucion in RESOLUCIONES:
+        if sum(len(serie(piramide, resolucion, c, desde, hasta)) for c in corridas) <= puntos_max:
+            return resolucion
+    return resolucion
@@ -0,0 +1,160 @@
+"""Generador de datos sintéticos con el mismo formato que los CSV de ``data/``.
+
+Escribe corridas (``punto;FECHA;corrida;<ids de sensor>``), precipitaciones
+(``fecha;rainfall;corrida``) y coordenadas de los sensores
+(``sensor;lat;lon``) con delimitador ``;``, coma decimal y fechas
+día/mes/año sin ceros a la izquierda, de cualquier tamaño, para ver cómo
+escalan las páginas y medir el rendimiento.
+
+Uso::
+
+    python -m dinsar.sintetico salida/ --sensores 10000 --fechas 200 --corridas 3
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FECHA_INICIO = np.datetime64('2015-04-28')
+PASO_DIAS = 12
+FRACCION_HUECOS = 0.02
+# Centro (lon, lat) de los puntos sintéticos: Loja, Ecuador
+CENTRO = (-79.20, -3.99)
+
+
+def _fechas_texto(fechas):
+    # Formato d/m/aaaa sin ceros a la izquierda, como en los CSV originales
+    ts = pd.DatetimeIndex(fechas)
+    return [f"{d}/{m}/{a}" for d, m, a in zip(ts.day, ts.month, ts.year)]
+
+
+def fechas_corrida(n_fechas, inicio=FECHA_INICIO, paso=PASO_DIAS, rng=None):
+    """Fechas de adquisición cada ~``paso`` días con algo de irregularidad."""
+    rng = rng or np.random.default_rng()
+    saltos = np.full(n_fechas, paso)
+    saltos[rng.random(n_fechas) < 0.1] *= 2  # adquisiciones perdidas
+    saltos[0] = 0
+    return np.datetime64(inicio, 'D') + np.cumsum(saltos).astype('timedelta64[D]')
+
+
+def desplazamientos(n_fechas, n_sensores, fechas, rng=None):
+    """Matriz fechas × sensores realista: tendencia + estacionalidad + ruido + huecos.
+
+    La primera fecha es la referencia (todo 0), como en los archivos reales.
+    """
+    rng = rng or np.random.default_rng()
+    t = (fechas - fechas[0]).astype(np.float32) / 365.25
+    velocidad = rng.normal(0, 2.0, n_sensores).astype(np.float32)        # mm/año
+    amplitud = rng.gamma(1.5, 0.5, n_sensores).astype(np.float32)        # mm
+    fase = rng.uniform(0, 2 * np.pi, n_sensores).astype(np.float32)
+
+    valores = np.empty((n_fechas, n_sensores), dtype=np.float32)
+    for i in range(n_fechas):
+        valores[i] = (
+            velocidad * t[i]
+            + amplitud * (np.sin(2 * np.pi * t[i] + fase) - np.sin(fase))
+            + rng.normal(0, 0.3, n_sensores).astype(np.float32)
+        )
+    valores[0] = 0.0
+    valores[1:][rng.random((n_fechas - 1, n_sensores)) < FRACCION_HUECOS] = np.nan
+    return valores
+
+
+def escribir_corrida(path, corrida, n_sensores, n_fechas, inicio=FECHA_INICIO, rng=None, filas_bloque=50):
+    """Escribe un CSV de corrida con el formato exacto de ``data/``.
+
+    Devuelve ``(ruta, fechas, ids_de_sensor)``.
+    """
+    rng = rng or np.random.default_rng(corrida)
+    fechas = fechas_corrida(n_fechas, inicio, rng=rng)
+    ids = rng.choice(np.arange(10_000, 10_000 + 10 * n_sensores), n_sensores, replace=False)
+    valores = desplazamientos(n_fechas, n_sensores, fechas, rng)
+
+    path = Path(path)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(';'.join(['punto', 'FECHA', 'corrida'] + [str(i) for i in ids]) + '\n')
+        textos = _fechas_texto(fechas)
+        for ini in range(0, n_fechas, filas_bloque):
+            fin = min(ini + filas_bloque, n_fechas)
+            bloque = pd.DataFrame(valores[ini:fin], columns=ids)
+            bloque.insert(0, 'corrida', corrida)
+            bloque.insert(0, 'FECHA', textos[ini:fin])
+            bloque.insert(0, 'punto', [f'PS{i + 1}' for i in range(ini, fin)])
+            bloque.to_csv(f, sep=';', decimal=',', float_format='%.4f', header=False, index=False)
+    return path, fechas, ids
+
+
+def escribir_precipitacion(path, fechas_por_corrida, rng=None):
+    """Escribe el CSV de precipitación para las fechas de cada corrida."""
+    rng = rng or np.random.default_rng(0)
+    filas = []
+    for corrida, fechas in fechas_por_corrida.items():
+        dia_ano = pd.DatetimeIndex(fechas).dayofyear.to_numpy()
+        # Temporada lluviosa de enero a abril, con eventos intensos ocasionales
+        base = 40 + 35 * np.cos(2 * np.pi * (dia_ano - 60) / 365.25)
+        lluvia = np.maximum(0, base + rng.gamma(1.2, 12, len(fechas)) - 12)
+        texto = pd.Series(lluvia).map(lambda v: f'{v:.2f}'.replace('.', ','))
+        texto.iloc[0] = ''  # la fecha de referencia no tiene lluvia, como en el original
+        filas.append(pd.DataFrame({'fecha': _fechas_texto(fechas), 'rainfall': texto, 'corrida': corrida}))
+    pd.concat(filas).to_csv(path, sep=';', index=False)
+    return Path(path)
+
+
+def escribir_coordenadas(path, sensores, centro=CENTRO, rng=None):
+    """Escribe coordenadas de ``sensores`` agrupadas en focos alrededor de ``centro``.
+
+    Los puntos PS reales se concentran en estructuras y laderas: cada sensor
+    cae cerca de uno de varios focos con dispersión de algunos cientos de metros.
+    """
+    rng = rng or np.random.default_rng(0)
+    sensores = np.asarray(sensores)
+    n_focos = max(1, len(sensores) // 200)
+    focos = np.asarray(centro) + rng.normal(0, 0.03, (n_focos, 2))
+    foco = rng.integers(0, n_focos, len(sensores))
+    lon_lat = focos[foco] + rng.normal(0, 0.004, (len(sensores), 2))
+    df = pd.DataFrame({'sensor': sensores, 'lat': lon_lat[:, 1], 'lon': lon_lat[:, 0]})
+    df.to_csv(path, sep=';', decimal=',', float_format='%.6f', index=False)
+    return Path(path)
+
+
+def generar(directorio, n_sensores=1000, n_fechas=100, n_corridas=3, semilla=0):
+    """Genera un conjunto completo (corridas + precipitación) en ``directorio``.
+
+    Devuelve ``(rutas_corridas, ruta_precipitacion)``; las coordenadas de los
+    sensores quedan en ``coordenadas_sensores.csv``.
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+    rutas = []
+    fechas_por_corrida = {}
+    sensores = set()
+    for corrida in range(1, n_corridas + 1):
+        inicio = FECHA_INICIO + np.timedelta64(int(rng.integers(0, 3 * 365)), 'D')
+        ruta, fechas, ids = escribir_corrida(
+            directorio / f'data_estructurada_corrida{corrida}.csv', corrida, n_sensores, n_fechas, inicio, rng
+        )
+        rutas.append(ruta)
+        fechas_por_corrida[corrida] = fechas
+        sensores.update(ids.tolist())
+    ruta_prec = escribir_precipitacion(directorio / 'data_estructurada_precipitaciones.csv', fechas_por_corrida, rng)
+    escribir_coordenadas(directorio / 'coordenadas_sensores.csv', sorted(sensores), rng=rng)
+    return rutas, ruta_prec
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera CSV sintéticos de corridas y precipitación.")
+    parser.add_argument('directorio', type=Path)
+    parser.add_argument('--sensores', type=int, default=1000)
+    parser.add_argument('--fechas', type=int, default=100)
+    parser.add_argument('--corridas', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args(argv)
+    rutas, ruta_prec = generar(args.directorio, args.sensores, args.fechas, args.corridas, args.semilla)
+    for ruta in rutas + [ruta_prec]:
+        print(ruta)
+
+
+if __name__ == '__main__':
+    main()
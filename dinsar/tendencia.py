@@ -0,0 +1,75 @@
+"""Tendencia por sensor: velocidad lineal, aceleración y residuo del ajuste.
+
+Para cada sensor se ajusta por mínimos cuadrados una recta (velocidad en
+mm/año) y una parábola (aceleración en mm/año², el doble del coeficiente
+cuadrático) al desplazamiento en función del tiempo, y se informa el RMSE de
+los residuos de la recta. Los huecos (NaN) se excluyen con una máscara: las
+sumas de las ecuaciones normales de todos los sensores salen de productos
+matriz-matriz entre las potencias del tiempo y la matriz de valores, y los
+sistemas de 3×3 se resuelven en lote. No hay bucle por sensor; la matriz se
+recorre por bloques de sensores (:func:`~dinsar.matriz.bloques_de_sensores`).
+No depende de Streamlit.
+"""
+import numpy as np
+import pandas as pd
+
+from dinsar.matriz import bloques_de_sensores
+
+COLUMNAS = ['sensor', 'n_obs', 'velocidad_lineal', 'aceleracion', 'rmse']
+
+DIAS_POR_ANO = 365.25
+
+
+def tiempo_en_anos(fechas):
+    """Años desde la fecha media de ``fechas`` (centrar mejora el condicionamiento)."""
+    dia = np.asarray(fechas, dtype='datetime64[ns]').astype('datetime64[D]').astype(np.float64)
+    if len(dia) == 0:
+        return dia
+    return (dia - dia.mean()) / DIAS_POR_ANO
+
+
+def _ajustar_bloque(t, valores):
+    valido = ~np.isnan(valores)
+    w = valido.astype(np.float64)
+    y = np.where(valido, valores, 0).astype(np.float64)
+
+    # Momentos Σt^k (k = 0..4) y Σt^k·y (k = 0..2) de cada sensor, y Σy²
+    potencias = np.vander(t, 5, increasing=True)
+    st = potencias.T @ w
+    sty = potencias[:, :3].T @ y
+    syy = np.einsum('ij,ij->j', y, y)
+    n = st[0]
+
+    # Recta: y = a + b·t; la suma de residuos² es Σy² - a·Σy - b·Σt·y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        det = n * st[2] - st[1] ** 2
+        b = np.where(det > 0, (n * sty[1] - st[1] * sty[0]) / det, np.nan)
+        a = (sty[0] - b * st[1]) / n
+        rmse = np.sqrt(np.maximum(syy - a * sty[0] - b * sty[1], 0) / n)
+
+    # Parábola: y = c0 + c1·t + c2·t², sistemas 3×3 solo donde son regulares
+    normales = np.stack([st[0:3], st[1:4], st[2:5]]).transpose(2, 0, 1)
+    escala = np.abs(normales).max(axis=(1, 2))
+    with np.errstate(invalid='ignore'):
+        regular = (n >= 3) & (np.abs(np.linalg.det(normales)) > 1e-12 * escala ** 3)
+    aceleracion = np.full(len(n), np.nan)
+    if regular.any():
+        coef = np.linalg.solve(normales[regular], sty.T[regular][:, :, None])[:, :, 0]
+        aceleracion[regular] = 2 * coef[:, 2]
+    return n.astype(np.int64), b, aceleracion, rmse
+
+
+def ajustar(m):
+    """Tabla (sensor, n_obs, velocidad_lineal, aceleracion, rmse) de la matriz ``m``.
+
+    ``velocidad_lineal`` está en mm/año, ``aceleracion`` en mm/año² y ``rmse``
+    en mm. Con menos de dos fechas distintas la velocidad es NaN y con menos
+    de tres, la aceleración.
+    """
+    t = tiempo_en_anos(m.fechas)
+    partes = [_ajustar_bloque(t, np.asarray(b.valores)) for b in bloques_de_sensores(m)]
+    n, velocidad, aceleracion, rmse = (np.concatenate(p) for p in zip(*partes))
+    return pd.DataFrame({
+        'sensor': m.sensores, 'n_obs': n, 'velocidad_lineal': velocidad,
+        'aceleracion': aceleracion, 'rmse': rmse,
+    }, columns=COLUMNAS)
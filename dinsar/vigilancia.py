@@ -0,0 +1,87 @@
+"""Vigilancia de ``data/`` con ``watchdog`` para ingerir entregas nuevas al llegar.
+
+Cuando aparece un CSV de corrida o cambia uno existente (p. ej. se le
+agregan las filas de una adquisición nueva), se ingiere en segundo plano: si
+el archivo solo creció, :func:`dinsar.lectura.ingerir` parsea únicamente los
+bytes nuevos. La próxima ejecución de cualquier página encuentra el Parquet
+al día, y la versión nueva del dataset particionado lee y escribe solo las
+filas agregadas (ver :func:`dinsar.lectura.leer_agregadas`). Con ellas se
+extienden también el promedio por fecha y los picos de cada corrida (ver
+:mod:`dinsar.agregados`); la lluvia mensual sale de la pirámide, que solo
+depende del archivo de precipitación. La tendencia (que centra el tiempo en
+la fecha media, distinta con cada fecha nueva) y la tabla de lluvia
+antecedente sí se recalculan enteras, una vez por versión de los datos.
+
+Los eventos se agrupan por archivo durante ``espera_s`` segundos, para no
+ingerir un archivo que todavía se está copiando.
+"""
+import fnmatch
+import logging
+import threading
+from pathlib import Path
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+log = logging.getLogger('dinsar.vigilancia')
+
+ESPERA_S = 2.0
+
+
+class _Manejador(FileSystemEventHandler):
+    def __init__(self, patrones, al_cambiar, espera_s):
+        self.patrones = patrones
+        self.al_cambiar = al_cambiar
+        self.espera_s = espera_s
+        self._pendientes = {}
+        self._candado = threading.Lock()
+
+    def _interesa(self, path):
+        return any(fnmatch.fnmatch(Path(path).name, p) for p in self.patrones)
+
+    def _programar(self, path):
+        # Reinicia la espera del archivo en cada evento: se procesa cuando deja de cambiar
+        with self._candado:
+            anterior = self._pendientes.pop(path, None)
+            if anterior is not None:
+                anterior.cancel()
+            temporizador = threading.Timer(self.espera_s, self._procesar, args=(path,))
+            temporizador.daemon = True
+            self._pendientes[path] = temporizador
+            temporizador.start()
+
+    def _procesar(self, path):
+        with self._candado:
+            self._pendientes.pop(path, None)
+        try:
+            self.al_cambiar(Path(path))
+        except Exception:
+            log.exception("No se pudo procesar %s", path)
+
+    def on_created(self, event):
+        if not event.is_directory and self._interesa(event.src_path):
+            self._programar(event.src_path)
+
+    def on_modified(self, event):
+        self.on_created(event)
+
+    def on_moved(self, event):
+        if not event.is_directory and self._interesa(event.dest_path):
+            self._programar(event.dest_path)
+
+
+def vigilar(directorio, patrones, al_cambiar, espera_s=ESPERA_S):
+    """Observa ``directorio`` y llama ``al_cambiar(path)`` por cada archivo que cambió.
+
+    Devuelve el ``Observer`` ya iniciado (hilo daemon); ``detener`` lo para.
+    """
+    observador = Observer()
+    observador.daemon = True
+    observador.schedule(_Manejador(tuple(patrones), al_cambiar, espera_s), str(directorio), recursive=False)
+    observador.start()
+    return observador
+
+
+def detener(observador):
+    observador.stop()
+    observador.join()
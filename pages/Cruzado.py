@@ -1,9 +1,10 @@
 import streamlit as st
-import plotly.graph_objects as go
 import pandas as pd
 
-from pages.Desplazamiento import cargar_datos_desp
-from pages.Precipitacion import cargar_datos_prec
+from dinsar import perfil
+from dinsar.consultas import consultar_correlacion, consultar_cruzado
+from dinsar.datos import cargar_dataset, cargar_lluvia_antecedente, cargar_resultados, version_datos
+from dinsar.lluvia import COLUMNA_DESDE_PREVIA, VENTANAS_DIAS, columna_ventana
 
 #Configuración de página
 st.set_page_config(
@@ -11,107 +12,86 @@ st.set_page_config(
     layout="wide",
 )
 
-#Cargar datos
-df_desp = cargar_datos_desp()
-df_prec = cargar_datos_prec()
+perfil.iniciar("Cruzado")
 
-# Asegurar tipos consistentes
-df_desp['corrida'] = df_desp['corrida'].astype(int)
-df_prec['corrida'] = df_prec['corrida'].astype(int)
+#Cargar el catálogo del dataset particionado (desplazamientos y precipitación se leen por consulta)
+with perfil.etapa("carga", cache=True):
+    dataset = cargar_dataset()
+    # Lluvia por fecha de cada corrida, si el procesamiento por lotes está al día
+    precalculados = cargar_resultados(("lluvia_por_fecha",))
 
 #Sidebar de filtros
 with st.sidebar:
     st.header("Filtros")
-    corridas = sorted(df_desp['corrida'].unique())
+    corridas = dataset.corridas
     corrida_sel = st.selectbox("Selecciona la corrida", corridas)
 
-    df_corrida = df_desp[df_desp['corrida'] == corrida_sel]
-    sensores = sorted(df_corrida['sensor'].unique())
+    sensores = dataset.ejes[corrida_sel].sensores.tolist()
     sensores_sel = st.multiselect("Selecciona sensores", sensores, default=sensores)
 
-#Filtrar datos según selección
-df_desp_filtrado = df_desp[
-    (df_desp['corrida'] == corrida_sel) &
-    (df_desp['sensor'].isin(sensores_sel)) &
-    (df_desp['Desplazamiento'].notna())
-]
-
-df_prec_filtrado = df_prec[
-    (df_prec['corrida'] == corrida_sel) &
-    (df_prec['rainfall'].notna())
-]
-
-#Crear gráfico combinado
-fig_combined = go.Figure()
-
-#Añadir puntos de desplazamiento
-if not df_desp_filtrado.empty:
-    for sensor in df_desp_filtrado['sensor'].unique():
-        df_sensor = df_desp_filtrado[df_desp_filtrado['sensor'] == sensor]
-        fig_combined.add_trace(
-            go.Scatter(
-                x=df_sensor['fecha'],
-                y=df_sensor['Desplazamiento'],
-                mode='markers',
-                name=f'Desplazamiento ({sensor})',
-                yaxis='y1',
-                marker=dict(size=6)
-            )
+    # Rango visible: al acotarlo la figura vuelve a resolución completa
+    fechas = dataset.ejes[corrida_sel].fechas
+    fecha_ini, fecha_fin = pd.Timestamp(fechas[0]).date(), pd.Timestamp(fechas[-1]).date()
+    if fecha_ini < fecha_fin:
+        fecha_ini, fecha_fin = st.slider(
+            "Rango de fechas", min_value=fecha_ini, max_value=fecha_fin,
+            value=(fecha_ini, fecha_fin), format="YYYY-MM-DD"
         )
-else:
-    st.warning(f"No hay datos de desplazamiento válidos para la Corrida {corrida_sel}.")
 
-#Añadir línea de precipitación
-if not df_prec_filtrado.empty:
-    lluvia_agr = (
-        df_prec_filtrado
-        .groupby('fecha', as_index=False)['rainfall']
-        .sum()
+#Consulta (memorizada por estado de filtros): datos filtrados y figura combinada
+with perfil.etapa("consulta", cache=True):
+    resultado = consultar_cruzado(
+        dataset, None, corrida_sel, sensores_sel, fecha_ini, fecha_fin,
+        precalculados=precalculados, version=version_datos()
     )
-    fig_combined.add_trace(
-        go.Scatter(
-            x=lluvia_agr['fecha'],
-            y=lluvia_agr['rainfall'],
-            mode='lines',
-            name=f'Precipitación ({corrida_sel})',
-            yaxis='y2',
-            line=dict(shape='spline', width=3, color='#3398FF')
-        )
-    )
-else:
+
+if resultado.vacio:
+    st.warning(f"No hay datos de desplazamiento válidos para la Corrida {corrida_sel}.")
+if resultado.lluvia.empty:
     st.warning("No hay datos de precipitación para esa corrida.")
 
-#Layout y ejes
-fig_combined.update_layout(
-    title_text=f"Corrida {corrida_sel}: Desplazamiento y Precipitación",
-    xaxis_title="Fecha",
-    yaxis=dict(title="Desplazamiento (mm)", side="left"),
-    yaxis2=dict(title="Precipitación (mm)", overlaying="y", side="right"),
-    hovermode="x unified",
-    legend=dict(orientation='v', x=1.10, y=1),
-    template="plotly_dark",
-    margin=dict(l=40, r=40, t=80, b=40)
+#Mostrar gráfico
+with perfil.etapa("envío de la figura"):
+    st.plotly_chart(resultado.figura_plotly(), use_container_width=True)
+
+#Correlación lluvia → desplazamiento con retardo, por sensor
+st.subheader("Respuesta de los sensores a la precipitación 🔗")
+with perfil.etapa("lluvia antecedente", cache=True) as e:
+    antecedentes = e.anotar(cargar_lluvia_antecedente())
+variables_lluvia = {None: 'Lluvia registrada', COLUMNA_DESDE_PREVIA: 'Desde la adquisición previa'}
+variables_lluvia.update({columna_ventana(d): f'Acumulada {d} días' for d in VENTANAS_DIAS})
+
+col_ret, col_lluvia, col_resp = st.columns(3)
+max_retardo = col_ret.slider("Retardo máximo (adquisiciones)", min_value=0, max_value=12, value=6)
+variable_lluvia = col_lluvia.selectbox(
+    "Variable de lluvia", options=list(variables_lluvia), format_func=variables_lluvia.get
 )
-
-#Ajustar eje X solo al rango de datos filtrados
-if not df_desp_filtrado.empty or not df_prec_filtrado.empty:
-    fechas_desp = df_desp_filtrado['fecha'] if not df_desp_filtrado.empty else None
-    fechas_prec = df_prec_filtrado['fecha'] if not df_prec_filtrado.empty else None
-
-    fechas_validas = pd.concat([f for f in [fechas_desp, fechas_prec] if f is not None])
-    min_fecha = fechas_validas.min()
-    max_fecha = fechas_validas.max()
-
-    fig_combined.update_xaxes(
-        range=[min_fecha, max_fecha],
-        tickformat="%b %Y",
-        dtick="M1",
-        tickangle=45
+respuesta = col_resp.radio(
+    "Comparar la lluvia con",
+    options=['delta', 'valor'],
+    format_func={'delta': 'Cambio entre adquisiciones', 'valor': 'Desplazamiento'}.get,
+    horizontal=True
+)
+with perfil.etapa("consulta correlación", cache=True):
+    df_retardos = consultar_correlacion(
+        dataset, None, corrida_sel, sensores_sel, fecha_ini, fecha_fin,
+        max_retardo=max_retardo, respuesta=respuesta,
+        antecedentes=antecedentes, variable_lluvia=variable_lluvia, version=version_datos()
     )
+if df_retardos.empty:
+    st.info("No hay suficientes pares lluvia–desplazamiento para calcular correlaciones.")
+else:
+    st.caption(
+        "Para cada sensor, el retardo (en adquisiciones) con la correlación de Pearson más fuerte "
+        "entre la lluvia y la respuesta del sensor. Ordenado por |correlación|."
+    )
+    st.dataframe(df_retardos, hide_index=True)
 
-#Mostrar gráfico
-st.plotly_chart(fig_combined, use_container_width=True)
+with st.expander("🌧️ Lluvia antecedente por adquisición"):
+    st.dataframe(antecedentes[antecedentes['corrida'] == corrida_sel], hide_index=True)
 
 #Pie de página
 st.markdown("---")
 st.caption("📍 Proyecto desarrollado en Streamlit · Datos de desplazamientos y precipitaciones graficados para demostración")
+
+perfil.panel()
@@ -1,7 +1,14 @@
+from pathlib import Path
+
+import numpy as np
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+
+from dinsar import perfil
+from dinsar.consultas import consultar_desplazamiento, consultar_tendencia
+from dinsar.datos import cargar_dataset, cargar_resultados, version_datos
+from dinsar.filtrado import ParametrosFiltro
+from dinsar.matriz import a_largo
 
 st.set_page_config(
     page_title="Desplazamiento",
@@ -9,126 +16,110 @@ st.set_page_config(
 )
 
 st.title("Visualización de Desplazamiento por Sensor 📊")
+perfil.iniciar("Desplazamiento")
 
-# 1) Carga de datos 
-disp_paths = [
-    './data/data_estructurada_corrida1.csv',
-    './data/data_estructurada_corrida2.csv',
-    './data/data_estructurada_corrida3.csv'
-]
-
-# 2) Carga, fusión y transformación de los datos
-parts = []
-for path in disp_paths:
-    df_temp = pd.read_csv(path, delimiter=';')
-    df_temp.columns = df_temp.columns.str.lower()
-
-    # Asegurar que todos los nombres de columna sean strings limpios
-    df_temp.columns = [str(col).lower().strip() for col in df_temp.columns]
-
-    # Eliminar columnas vacías
-    df_temp = df_temp.loc[:, ~df_temp.columns.str.contains('^unnamed')]
-    df_temp = df_temp.dropna(axis=1, how='all')
-
-    # Procesar fecha
-    df_temp['fecha'] = pd.to_datetime(df_temp['fecha'], dayfirst=True, errors='coerce')
-
-    # Mostrar filas con fecha inválida justo después de procesar este archivo
-    invalid_fechas = df_temp[df_temp['fecha'].isna()]
-    if not invalid_fechas.empty:
-        st.warning(f"Hay {len(invalid_fechas)} filas con fechas inválidas o no convertibles en {path}:")
-        st.dataframe(invalid_fechas)
-
-    # Eliminar filas sin fecha válida
-    df_temp = df_temp[df_temp['fecha'].notna()]
-
-    # Detectar columnas de sensores
-    sensor_cols = [c for c in df_temp.columns if c not in ('punto', 'fecha', 'corrida')]
-
-    # Melt para pasar a formato largo
-    df_long = df_temp.melt(
-        id_vars=['fecha', 'corrida', 'punto'],
-        value_vars=sensor_cols,
-        var_name='sensor',
-        value_name='Desplazamiento'
-    )
-
-    # Reemplazar coma decimal por punto antes de convertir a número
-    df_long['Desplazamiento'] = (
-        df_long['Desplazamiento']
-        .astype(str)
-        .str.replace(',', '.', regex=False)
-    )
+# 1) Dataset particionado por corrida: aquí solo se lee su catálogo (fechas y sensores)
+with perfil.etapa("carga", cache=True):
+    dataset = cargar_dataset()
+    # Promedios y picos de las corridas completas, si el procesamiento por lotes está al día
+    precalculados = cargar_resultados(("promedios_por_fecha", "picos"))
 
-    df_long['Desplazamiento'] = pd.to_numeric(df_long['Desplazamiento'], errors='coerce')
+# 2) Archivos que no se pudieron leer y reporte de valores rechazados
+for path, mensaje in dataset.errores.items():
+    st.error(f"No se pudo cargar {Path(path).name}: {mensaje}")
 
-    parts.append(df_long)
+for path, rechazos in dataset.rechazos.items():
+    with st.expander(f"⚠️ {len(rechazos)} valores rechazados en {Path(path).name}"):
+        st.dataframe(rechazos, hide_index=True)
 
-# Concatenar todos los datos
-if not parts:
+if not dataset.corridas:
     st.error("No se cargaron datos válidos.")
     st.stop()
 
-df_disp = pd.concat(parts, ignore_index=True)
-df_disp['punto'] = df_disp['punto'].astype(str).str.strip()
-df_disp['sensor'] = df_disp['sensor'].astype(str)
-
-# Eliminar sensores sin ningún valor válido 
-valid_sensores = df_disp.groupby('sensor')['Desplazamiento'].apply(lambda x: x.notna().any())
-df_disp = df_disp[df_disp['sensor'].isin(valid_sensores[valid_sensores].index)]
-
 #3)Sidebar de filtros
 with st.sidebar:
     st.header("Filtros")
 
-    corridas = sorted(df_disp['corrida'].unique())
+    corridas = dataset.corridas
     corrida_sel = st.selectbox("Selecciona la corrida", corridas)
 
-    df_corrida = df_disp[df_disp['corrida'] == corrida_sel]
-
-    sensores = sorted(df_corrida['sensor'].unique())
+    sensores = dataset.ejes[corrida_sel].sensores.tolist()
     sensores_sel = st.multiselect("Selecciona sensores", sensores, default=sensores)
 
-# Filtro principal 
-df_filtrado = df_disp[
-    (df_disp['corrida'] == corrida_sel) &
-    (df_disp['sensor'].isin(sensores_sel)) &
-    (df_disp['Desplazamiento'].notna())
-]
+    # Rango visible: al acotarlo la figura vuelve a resolución completa
+    fechas = dataset.ejes[corrida_sel].fechas
+    fecha_ini, fecha_fin = pd.Timestamp(fechas[0]).date(), pd.Timestamp(fechas[-1]).date()
+    if fecha_ini < fecha_fin:
+        fecha_ini, fecha_fin = st.slider(
+            "Rango de fechas", min_value=fecha_ini, max_value=fecha_fin,
+            value=(fecha_ini, fecha_fin), format="YYYY-MM-DD"
+        )
+
+    # Acumulado: re-referido a una época y, opcionalmente, a un punto estable
+    modo = st.radio(
+        "Mostrar", ["valor", "acumulado"],
+        format_func={"valor": "Valor por adquisición", "acumulado": "Acumulado desde una época"}.get
+    )
+    referencia = estable = None
+    if modo == "acumulado":
+        epocas = pd.DatetimeIndex(np.unique(fechas))
+        referencia = st.selectbox("Época de referencia", epocas, format_func=lambda f: f.strftime("%Y-%m-%d"))
+        estable = st.selectbox(
+            "Punto estable", [None] + sensores, format_func=lambda s: "Ninguno" if s is None else str(s)
+        )
+
+    # Filtro de atípicos (Hampel) y rechazo de puntos de baja coherencia
+    filtro = None
+    if st.checkbox("Filtrar atípicos y puntos ruidosos"):
+        ventana = st.slider("Ventana del filtro (adquisiciones a cada lado)", 1, 10, 3)
+        n_sigmas = st.number_input("Umbral de atípico (σ robustos)", min_value=0.5, value=3.0, step=0.5)
+        coherencia_min = st.slider("Coherencia mínima", 0.0, 1.0, 0.7, step=0.05)
+        rmse_max = st.number_input("RMSE máximo (mm, 0 = sin límite)", min_value=0.0, value=0.0, step=0.5)
+        filtro = ParametrosFiltro(ventana, float(n_sigmas), float(coherencia_min), float(rmse_max) or None)
+
+    umbral_vel = st.number_input(
+        "Velocidad mínima de eventos (mm/día)", min_value=0.0, value=0.0, step=0.01, format="%.3f"
+    )
+
+# Consulta (memorizada por estado de filtros): lee del dataset solo la corrida,
+# los sensores y las fechas elegidas; devuelve matriz filtrada, promedio, eventos y figura
+with perfil.etapa("consulta", cache=True):
+    resultado = consultar_desplazamiento(
+        dataset, corrida_sel, sensores_sel, fecha_ini, fecha_fin,
+        umbral_velocidad=umbral_vel or None, modo=modo, referencia=referencia, estable=estable,
+        filtro=filtro, precalculados=precalculados, version=version_datos()
+    )
+matriz_filtrada = resultado.matriz
 
 #4) Visualización 
-if df_filtrado.empty:
+if resultado.vacio:
     st.warning("No hay datos válidos para graficar.")
 else:
-    fig = px.scatter(
-        df_filtrado,
-        x='fecha',
-        y='Desplazamiento',
-        color='sensor',
-        labels={
-            'fecha': 'Fecha',
-            'Desplazamiento': 'Desplazamiento (mm)',
-            'sensor': 'Sensor'
-        },
-        title=f"Desplazamiento - Corrida {corrida_sel}"
-    )
-    
-    # Calcular promedio por fecha
-    promedio_por_fecha = df_filtrado.groupby('fecha')['Desplazamiento'].mean().reset_index()
-
-    # Añadir línea de promedio  
-    fig.add_trace(
-        go.Scatter(
-            x=promedio_por_fecha['fecha'],
-            y=promedio_por_fecha['Desplazamiento'],
-            mode='lines',
-            name='Promedio',
-            line=dict(color='#56ff68', width=3)
+    with perfil.etapa("envío de la figura"):
+        st.plotly_chart(resultado.figura_plotly(), use_container_width=True)
+
+    # Informe del filtro: atípicos quitados y sensores descartados
+    if resultado.tabla is not None:
+        informe = resultado.tabla
+        st.caption(
+            f"Filtro: {int(informe['atipicos'].sum())} atípicos quitados y "
+            f"{int(informe['rechazado'].sum())} de {len(informe)} sensores descartados."
         )
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
+        with st.expander("🧹 Informe del filtro por sensor"):
+            st.dataframe(
+                informe.sort_values(["rechazado", "atipicos"], ascending=False),
+                hide_index=True,
+                column_config={
+                    "atipicos": "Atípicos",
+                    "coherencia": st.column_config.NumberColumn("Coherencia", format="%.2f"),
+                    "rmse": st.column_config.NumberColumn("RMSE (mm)", format="%.2f"),
+                    "rechazado": "Descartado",
+                },
+            )
+
+    # Promedio por fecha
+    promedio_por_fecha = resultado.media.reset_index()
+
     # Calcular la fecha con mayor desplazamiento promedio
     max_fecha = promedio_por_fecha.loc[promedio_por_fecha['Desplazamiento'].idxmax()]
     max_fecha_str = max_fecha['fecha'].strftime('%Y-%m-%d')
@@ -157,39 +148,46 @@ else:
 """, unsafe_allow_html=True)
 
     
-    # Detectar eventos con mayor cambio de desplazamiento 
-df_eventos = df_filtrado.sort_values(by=['sensor', 'fecha']).copy()
-
-#4) Calcular deltas
-df_eventos['Desplazamiento_Previo'] = df_eventos.groupby('sensor')['Desplazamiento'].shift(1)
-df_eventos['Fecha_Previo'] = df_eventos.groupby('sensor')['fecha'].shift(1)
-df_eventos['Delta'] = df_eventos['Desplazamiento'] - df_eventos['Desplazamiento_Previo']
-df_eventos['Dias'] = (df_eventos['fecha'] - df_eventos['Fecha_Previo']).dt.days
-df_eventos['Velocidad'] = df_eventos['Delta'] / df_eventos['Dias']
-
-#5) Detectar el mayor cambio por sensor
-df_picos = df_eventos.loc[
-    df_eventos.groupby('sensor')['Delta'].apply(lambda x: x.abs().idxmax())
-]
-
-df_picos = df_picos[['sensor', 'Fecha_Previo', 'fecha', 'Delta', 'Velocidad']]
-df_picos = df_picos.sort_values(by='Velocidad', ascending=False).reset_index(drop=True)
+    # Detectar eventos con mayor cambio de desplazamiento
+#4) Calcular deltas y 5) detectar el mayor cambio por sensor, sobre la matriz
+df_picos = resultado.picos
 
 st.subheader("Eventos con Mayor Cambio de Desplazamiento 📋")
 st.dataframe(df_picos.head(10))
 
+# Tendencia por sensor en la ventana elegida: ajuste lineal y cuadrático en lote
+st.subheader("Tasa de Desplazamiento por Sensor 📈")
+with perfil.etapa("consulta tendencia", cache=True):
+    df_tendencia = consultar_tendencia(
+        dataset, corrida_sel, sensores_sel, fecha_ini, fecha_fin, version=version_datos()
+    )
+st.caption(
+    "Velocidad del ajuste lineal (mm/año), aceleración del ajuste cuadrático (mm/año²) y RMSE "
+    "de los residuos de la recta (mm). Haz clic en una columna para ordenar."
+)
+st.dataframe(
+    df_tendencia.sort_values("velocidad_lineal", key=abs, ascending=False),
+    hide_index=True,
+    column_config={
+        "n_obs": "Observaciones",
+        "velocidad_lineal": st.column_config.NumberColumn("Velocidad (mm/año)", format="%.2f"),
+        "aceleracion": st.column_config.NumberColumn("Aceleración (mm/año²)", format="%.2f"),
+        "rmse": st.column_config.NumberColumn("RMSE (mm)", format="%.2f"),
+    },
+)
+
 st.markdown(f"""
     <hr/>
     """, unsafe_allow_html=True)
 
 # Tabla de datos 
 with st.expander("📄 Ver datos tabulares"):
-    st.dataframe(df_filtrado)
+    with perfil.etapa("formato largo") as e:
+        st.dataframe(e.anotar(a_largo(matriz_filtrada)))
     
 # Pie de página
 st.markdown("---")
 st.caption("📍 Proyecto desarrollado en Streamlit · Datos de desplazamientos graficados para demostración")
 
-#Enviar datos a Cruzado
-def cargar_datos_desp():
-    return df_disp
\ No newline at end of file
+perfil.panel()
+
@@ -0,0 +1,100 @@
+from pathlib import Path
+
+import streamlit as st
+
+from dinsar import perfil
+from dinsar.consultas import consultar_desplazamiento, consultar_mapa
+from dinsar.datos import RUTA_COORDS, cargar_dataset, cargar_indice_espacial, version_datos
+from dinsar.graficos import VARIABLES_MAPA
+
+st.set_page_config(
+    page_title="Mapa de puntos PS",
+    layout="wide"
+)
+
+st.title("Mapa de Puntos PS 🗺️")
+perfil.iniciar("Mapa")
+
+# 1) Dataset particionado (solo se lee la corrida elegida) e índice espacial de coordenadas
+with perfil.etapa("carga", cache=True):
+    dataset = cargar_dataset()
+with perfil.etapa("índice espacial", cache=True) as e:
+    indice = cargar_indice_espacial()
+    if indice is not None:
+        e.anotar(indice.sensores)
+
+if not dataset.corridas:
+    st.error("No se cargaron datos válidos.")
+    st.stop()
+
+if indice is None:
+    st.info(
+        f"No se encontró `{Path(RUTA_COORDS).name}` en `data/`. El mapa necesita las coordenadas de "
+        "cada sensor en un CSV con separador `;` y coma decimal:\n\n"
+        "```\nsensor;lat;lon\n53763;-3,994180;-79,201780\n```"
+    )
+    st.stop()
+
+# 2) Sidebar: corrida, variable y caja visible
+with st.sidebar:
+    st.header("Filtros")
+
+    corrida_sel = st.selectbox("Selecciona la corrida", dataset.corridas)
+    variable = st.radio(
+        "Colorear por", list(VARIABLES_MAPA),
+        format_func=lambda v: f"{VARIABLES_MAPA[v][0]} ({VARIABLES_MAPA[v][1]})"
+    )
+
+    # Caja visible: solo se envían al mapa los puntos dentro de ella
+    oeste, sur, este, norte = indice.extension
+    st.subheader("Área visible")
+    rango_lon = st.slider("Longitud", min_value=oeste, max_value=este, value=(oeste, este),
+                          step=0.0005, format="%.4f")
+    rango_lat = st.slider("Latitud", min_value=sur, max_value=norte, value=(sur, norte),
+                          step=0.0005, format="%.4f")
+
+caja = (rango_lon[0], rango_lat[0], rango_lon[1], rango_lat[1])
+version = version_datos()
+
+with perfil.etapa("consulta del mapa", cache=True):
+    mapa = consultar_mapa(dataset, indice, corrida_sel, variable, caja, version=version)
+tabla = mapa.tabla
+
+# 3) Mapa
+if tabla.empty:
+    st.warning("No hay puntos con coordenadas en el área visible.")
+    st.stop()
+
+if mapa.hexagonal:
+    st.caption(f"{len(tabla)} puntos visibles: se muestran hexágonos con el valor medio. "
+               "Acota el área visible para ver y seleccionar puntos individuales.")
+else:
+    st.caption(f"{len(tabla)} puntos visibles. Haz clic en los puntos (con Shift para varios) "
+               "para ver sus series.")
+
+with perfil.etapa("envío del mapa"):
+    evento = st.pydeck_chart(mapa.figura, use_container_width=True, height=550,
+                             on_select="rerun", selection_mode="multi-object", key="mapa")
+
+seleccion = [] if mapa.hexagonal else [p["sensor"] for p in evento.selection.objects.get("puntos", [])]
+
+# 4) Series de los sensores seleccionados
+if seleccion:
+    st.subheader(f"Series de {len(seleccion)} sensores seleccionados")
+    with perfil.etapa("consulta de series", cache=True):
+        series = consultar_desplazamiento(dataset, corrida_sel, seleccion, version=version)
+    if series.vacio:
+        st.warning("Los sensores seleccionados no tienen datos válidos.")
+    else:
+        st.plotly_chart(series.figura_plotly(), use_container_width=True)
+
+# 5) Tabla de puntos visibles
+etiqueta, unidad = VARIABLES_MAPA[variable]
+with st.expander(f"📄 Puntos en el área visible ({len(tabla)})"):
+    columnas = ["sensor", "lon", "lat", *VARIABLES_MAPA]
+    st.dataframe(tabla[columnas].sort_values(variable), hide_index=True)
+
+st.markdown("---")
+st.caption(f"📍 Color: {etiqueta.lower()} en {unidad}; rojo = negativo, azul = positivo")
+
+perfil.panel()
@@ -1,7 +1,11 @@
-import streamlit as st
 import pandas as pd
+import streamlit as st
 import plotly.express as px
 
+from dinsar import perfil
+from dinsar.datos import cargar_indice_prec, cargar_piramide_lluvia, cargar_resultados, reporte_rechazos_prec
+from dinsar.piramide import ESTADISTICOS, RESOLUCIONES, nivel_para, serie, tabla
+
 # 1) Configuración de la página
 st.set_page_config(
     page_title="Eventos de Precipitación Promedio",
@@ -14,82 +18,106 @@ st.markdown("""
 Este panel visualiza los eventos de **precipitación promedio** registrados en diferentes fechas.  
 Solo se grafican los días en que hubo lluvia registrada, diferenciando por corrida.
 """)
+perfil.iniciar("Precipitacion")
+
+# 3) Cargar datos desde la capa compartida (memorizada por archivo)
+# 4) Las filas sin lluvia registrada o sin fecha válida ya vienen filtradas
+# 5) 'corrida' llega como string para facilitar color y leyenda
+with perfil.etapa("carga", cache=True) as e:
+    indice_lluvia = cargar_indice_prec()
+    df_lluvia = e.anotar(indice_lluvia.df)
+
+rechazos = reporte_rechazos_prec()
+if not rechazos.empty:
+    with st.expander(f"⚠️ {len(rechazos)} valores rechazados en el archivo de precipitaciones"):
+        st.dataframe(rechazos, hide_index=True)
+
+# 6) Sidebar: rango visible, resolución y estadístico
+with st.sidebar:
+    st.header("Filtros")
+
+    fechas = indice_lluvia.fechas
+    fecha_ini, fecha_fin = pd.Timestamp(fechas.min()).date(), pd.Timestamp(fechas.max()).date()
+    if fecha_ini < fecha_fin:
+        fecha_ini, fecha_fin = st.slider(
+            "Rango de fechas", min_value=fecha_ini, max_value=fecha_fin,
+            value=(fecha_ini, fecha_fin), format="YYYY-MM-DD"
+        )
+    opciones = ["auto"] + list(RESOLUCIONES)
+    resolucion_sel = st.selectbox(
+        "Resolución", opciones,
+        format_func=lambda r: "Automática (según el rango)" if r == "auto" else RESOLUCIONES[r]
+    )
+    estadistico = st.radio("Mostrar", list(ESTADISTICOS), format_func=ESTADISTICOS.get)
 
-# 3) Cargar el CSV con delimitador ;
-df = pd.read_csv("./data/data_estructurada_precipitaciones.csv", delimiter=";")
-
-# 4) Limpiar y convertir tipos
-# Pasar todos los encabezados a minúsculas para evitar problemas
-df.columns = df.columns.str.lower()
+desde, hasta = pd.Timestamp(fecha_ini), pd.Timestamp(fecha_fin)
+corridas = indice_lluvia.valores()
 
-# Reparar columna rainfall: se reemplaza comas por puntos para decimales correctos y se convierten a float
-df["rainfall"] = df["rainfall"].astype(str).str.replace(",", ".", regex=False)
-df["rainfall"] = pd.to_numeric(df["rainfall"], errors="coerce")  # NaN si falla la conversión
+# 7) Agregados leídos de la pirámide (precalculada una vez por versión de los datos)
+with perfil.etapa("pirámide", cache=True) as e:
+    piramide = cargar_piramide_lluvia()
+    resolucion = nivel_para(piramide, corridas, desde, hasta) if resolucion_sel == "auto" else resolucion_sel
+    df_general = e.anotar(tabla(piramide, resolucion, corridas, desde, hasta))
 
-# Convierte fechas sin format rígido para no perder datos, que Plotly requiere datetime
-df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")  
+etiqueta = ESTADISTICOS[estadistico]
+st.caption(f"Resolución: {RESOLUCIONES[resolucion].lower()} · {len(df_general)} periodos visibles")
 
-# Convertir 'corrida' a string para facilitar color y leyenda
-df["corrida"] = df["corrida"].astype(str)
+# 8) Crear figura general
+with perfil.etapa("figura general"):
+    fig = px.line(
+        df_general,
+        x="fecha",
+        y=estadistico,
+        color="corrida",
+        markers=True,
+        title="Eventos de Precipitación Promedio (por Corrida)",
+        labels={"fecha": "Fecha", estadistico: etiqueta, "corrida": "Corrida"},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
 
-# 5) Filtrar filas que tienen lluvia registrada y fecha válida
-df_lluvia = df.dropna(subset=["rainfall", "fecha"])
+    fig.update_traces(line_shape='spline')
 
-# 6) Crear figura general
-fig = px.line(
-    df_lluvia,
-    x="fecha",
-    y="rainfall",
-    color="corrida",
-    markers=True,
-    title="Eventos de Precipitación Promedio (por Corrida)",
-    labels={"fecha": "Fecha", "rainfall": "Precipitación (mm)", "corrida": "Corrida"},
-    color_discrete_sequence=px.colors.qualitative.Pastel
-)
-
-fig.update_traces(line_shape='spline')
-
-# Forzar rango completo en eje x
-fig.update_layout(
-    xaxis_title="Fecha",
-    yaxis_title="Precipitación (mm)",
-    hovermode="x unified",
-    legend_title_text="Corrida",
-    template="plotly_dark",
-    margin=dict(l=40, r=40, t=80, b=40),
-    xaxis=dict(
-        range=[df_lluvia['fecha'].min(), df_lluvia['fecha'].max()]
+    # Forzar el rango visible en eje x
+    fig.update_layout(
+        xaxis_title="Fecha",
+        yaxis_title=etiqueta,
+        hovermode="x unified",
+        legend_title_text="Corrida",
+        template="plotly_dark",
+        margin=dict(l=40, r=40, t=80, b=40),
+        xaxis=dict(
+            range=[desde, hasta]
+        )
     )
-)
 
-# Mostrar mes y año espaciados cada 3 meses, rotar etiquetas
-fig.update_xaxes(
-    tickformat="%b %Y",   # Formato mes abreviado y año
-    dtick="M3",           # Tick cada 3 meses
-    tickangle=45
-)
+    # Mostrar mes y año, cada 3 meses en rangos largos, y rotar etiquetas
+    fig.update_xaxes(
+        tickformat="%b %Y",   # Formato mes abreviado y año
+        dtick="M3" if (hasta - desde).days > 2 * 365 else None,
+        tickangle=45
+    )
 
-st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(fig, use_container_width=True)
 
-# 7) Gráficas separadas por corridas
-corridas = df_lluvia["corrida"].unique()
+# 9) Gráficas separadas por corridas
 cols = st.columns(len(corridas))
 
-for i, corrida in enumerate(sorted(corridas)):
-    df_corrida = df_lluvia[df_lluvia["corrida"] == corrida]
+for i, corrida in enumerate(corridas):
+    with perfil.etapa(f"filtro corrida {corrida}") as e:
+        df_corrida = e.anotar(serie(piramide, resolucion, corrida, desde, hasta))
     fig_corrida = px.line(
         df_corrida,
         x="fecha",
-        y="rainfall",
+        y=estadistico,
         markers=True,
         title=f"Corrida {corrida}",
-        labels={"fecha": "Fecha", "rainfall": "Precipitación (mm)"},
+        labels={"fecha": "Fecha", estadistico: etiqueta},
         color_discrete_sequence=[px.colors.qualitative.Pastel[i % len(px.colors.qualitative.Pastel)]]
     )
     fig_corrida.update_traces(line_shape='spline')
     fig_corrida.update_layout(
         xaxis_title="Fecha",
-        yaxis_title="Precipitación (mm)",
+        yaxis_title=etiqueta,
         hovermode="x unified",
         template="plotly_dark",
         margin=dict(l=20, r=20, t=50, b=20),
@@ -98,11 +126,21 @@ for i, corrida in enumerate(sorted(corridas)):
 
     cols[i].plotly_chart(fig_corrida, use_container_width=True)
     
-#8) Histograma
-# Crear columna con mes-año para agrupar precipitaciones mensuales
-df_lluvia['mes_ano'] = df_lluvia['fecha'].dt.to_period('M').dt.to_timestamp()
-# Agrupar precipitación total por mes-año
-df_mensual = df_lluvia.groupby('mes_ano')['rainfall'].sum().reset_index()
+#10) Histograma
+# Totales mensuales sumando las corridas: del procesamiento por lotes si está al
+# día y se ve todo el rango, si no del nivel mensual de la pirámide
+with perfil.etapa("agregado mensual") as e:
+    precalculados = None
+    if (fecha_ini, fecha_fin) == (pd.Timestamp(fechas.min()).date(), pd.Timestamp(fechas.max()).date()):
+        precalculados = cargar_resultados(("lluvia_mensual",))
+    if precalculados is not None:
+        df_mensual = precalculados["lluvia_mensual"].groupby('mes', as_index=False)['rainfall'].sum()
+        df_mensual = df_mensual.rename(columns={'mes': 'mes_ano'})
+    else:
+        df_mensual = tabla(piramide, 'M', corridas, desde, hasta)
+        df_mensual = df_mensual.groupby('fecha', as_index=False)['suma'].sum()
+        df_mensual = df_mensual.rename(columns={'fecha': 'mes_ano', 'suma': 'rainfall'})
+    e.anotar(df_mensual)
 fig_hist = px.bar(
     df_mensual,
     x='mes_ano',
@@ -129,13 +167,12 @@ fig_hist.data[0].hovertemplate = (
 
 st.plotly_chart(fig_hist, use_container_width=True)
 
-#9) Mostrar tabla con vista previa
+#11) Mostrar tabla con vista previa
 with st.expander("📄 Ver datos tabulares"):
     st.dataframe(df_lluvia[["fecha", "rainfall", "corrida"]])
 
-#10)st.dataframe(df_lluvia[["fecha", "rainfall", "corrida"]])st.markdown("---")
+#12)st.dataframe(df_lluvia[["fecha", "rainfall", "corrida"]])st.markdown("---")
 st.caption("📍 Proyecto desarrollado en Streamlit · Datos de precipitaciones graficados para demostración")
 
-#Enviar datos a Cruzado
-def cargar_datos_prec():
-    return df_lluvia
+perfil.panel()
+
@@ -0,0 +1,27 @@
+"""Datos sintéticos compartidos por las pruebas."""
+import numpy as np
+import pytest
+
+from dinsar import sintetico
+from dinsar.matriz import MatrizCorrida
+
+
+def _matriz_sintetica(n_fechas=40, n_sensores=30, corrida=1, semilla=0):
+    """Matriz de :mod:`dinsar.sintetico` (tendencia, estacionalidad, ruido y huecos) sin pasar por CSV."""
+    rng = np.random.default_rng(semilla)
+    fechas = sintetico.fechas_corrida(n_fechas, rng=rng).astype('datetime64[ns]')
+    sensores = np.sort(rng.choice(np.arange(10_000, 10_000 + 10 * n_sensores), n_sensores, replace=False))
+    valores = sintetico.desplazamientos(n_fechas, n_sensores, fechas.astype('datetime64[D]'), rng)
+    puntos = np.asarray([f'PS{i + 1}' for i in range(n_fechas)], dtype=object)
+    return MatrizCorrida(corrida, fechas, sensores.astype(np.int32), puntos, valores)
+
+
+@pytest.fixture
+def matriz_sintetica():
+    """Fábrica de matrices sintéticas: ``matriz_sintetica(n_fechas, n_sensores, corrida, semilla)``."""
+    return _matriz_sintetica
+
+
+@pytest.fixture
+def matriz():
+    return _matriz_sintetica()
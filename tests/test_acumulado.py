@@ -0,0 +1,62 @@
+"""El re-referenciado del acumulado coincide con rellenar y restar sensor por sensor con pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from dinsar.acumulado import acumulado, ultimo_valido
+from dinsar.matriz import MatrizCorrida
+
+
+@pytest.fixture
+def con_huecos(matriz):
+    # Huecos sueltos y sensores que empiezan tarde
+    rng = np.random.default_rng(4)
+    valores = matriz.valores.copy()
+    valores[rng.random(valores.shape) < 0.15] = np.nan
+    valores[:12, 3] = np.nan
+    valores[:25, 8] = np.nan
+    return MatrizCorrida(matriz.corrida, matriz.fechas, matriz.sensores, matriz.puntos, valores)
+
+
+def _acumulado_pandas(m, referencia, estable):
+    df = pd.DataFrame(m.valores.astype(np.float64), index=m.fechas, columns=m.sensores)
+    fila = 0 if referencia is None else min(m.fechas.searchsorted(np.datetime64(referencia, 'ns')),
+                                            len(m.fechas) - 1)
+    base = df.ffill().iloc[fila].fillna(df.bfill().iloc[0])
+    df = df - base
+    if estable is not None:
+        df = df.sub(df[estable].ffill(), axis=0)
+    return df.to_numpy()
+
+
+def test_ultimo_valido_igual_a_recorrer_cada_sensor(con_huecos):
+    esperado = np.full(con_huecos.valores.shape, -1)
+    for j in range(len(con_huecos.sensores)):
+        ultimo = -1
+        for i in range(len(con_huecos.fechas)):
+            if not np.isnan(con_huecos.valores[i, j]):
+                ultimo = i
+            esperado[i, j] = ultimo
+    np.testing.assert_array_equal(ultimo_valido(con_huecos), esperado)
+
+
+@pytest.mark.parametrize('epoca', [None, 10, 'entre', 'despues'])
+@pytest.mark.parametrize('con_estable', [False, True])
+def test_acumulado_igual_a_ffill_y_restar(con_huecos, epoca, con_estable):
+    fechas = con_huecos.fechas
+    referencia = {None: None, 10: fechas[10], 'entre': fechas[20] - np.timedelta64(1, 'D'),
+                  'despues': fechas[-1] + np.timedelta64(30, 'D')}[epoca]
+    # El sensor 8 como estable: sus primeras fechas quedan en NaN
+    estable = int(con_huecos.sensores[8]) if con_estable else None
+
+    obtenido = acumulado(con_huecos, referencia, estable)
+    np.testing.assert_allclose(obtenido.valores, _acumulado_pandas(con_huecos, referencia, estable),
+                               rtol=1e-5, atol=1e-5)
+    # Pasar el índice ya calculado no cambia nada
+    np.testing.assert_array_equal(
+        acumulado(con_huecos, referencia, estable, ultimo=ultimo_valido(con_huecos)).valores, obtenido.valores)
+
+
+def test_sensor_estable_inexistente(con_huecos):
+    with pytest.raises(ValueError, match='no está en la corrida'):
+        acumulado(con_huecos, estable=1)
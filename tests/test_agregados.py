@@ -0,0 +1,43 @@
+"""Extender los agregados con filas nuevas da exactamente lo mismo que recalcular sobre la corrida completa."""
+import numpy as np
+import pytest
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from dinsar import agregados
+from dinsar.eventos import picos_por_sensor
+from dinsar.matriz import MatrizCorrida, media_por_fecha
+
+
+def _filas(m, ini, fin):
+    return MatrizCorrida(m.corrida, m.fechas[ini:fin], m.sensores, m.puntos[ini:fin], m.valores[ini:fin])
+
+
+@pytest.fixture
+def corrida(matriz_sintetica):
+    m = matriz_sintetica(n_fechas=60, n_sensores=50, semilla=4)
+    fechas, valores = m.fechas.copy(), m.valores.copy()
+    # Dos adquisiciones en la misma fecha, justo en un corte, y un sensor
+    # que recién aparece en las filas agregadas
+    fechas[30] = fechas[29]
+    valores[:45, 7] = np.nan
+    return MatrizCorrida(m.corrida, fechas, m.sensores, m.puntos, valores)
+
+
+@pytest.mark.parametrize('cortes', [[], [30], [30, 45, 59], [1, 2, 3]])
+def test_extender_igual_a_recalcular(corrida, cortes, tmp_path):
+    bordes = [0, *cortes, len(corrida.fechas)]
+    ag = agregados.vacios(corrida.sensores)
+    for ini, fin in zip(bordes, bordes[1:]):
+        ag = agregados.extender(ag, _filas(corrida, ini, fin))
+        # Ida y vuelta por disco entre una versión y la siguiente
+        agregados.guardar(ag, tmp_path / str(ini))
+        ag = agregados.leer(tmp_path / str(ini))
+    assert_series_equal(agregados.media(ag), media_por_fecha(corrida), check_exact=True)
+    assert_frame_equal(agregados.picos(ag), picos_por_sensor(corrida), check_exact=True)
+
+
+def test_sensores_distintos(corrida):
+    ag = agregados.calcular(_filas(corrida, 0, 10))
+    with pytest.raises(ValueError):
+        agregados.extender(ag, MatrizCorrida(1, corrida.fechas[10:], corrida.sensores[1:], corrida.puntos[10:],
+                                             corrida.valores[10:, 1:]))
@@ -0,0 +1,24 @@
+"""Cada página se importa dentro de su presupuesto de arranque en frío (ver benchmarks/arranque.py)."""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / 'benchmarks'))
+
+import arranque  # noqa: E402
+
+PRESUPUESTO = json.loads((RAIZ / 'benchmarks' / 'presupuesto_arranque.json').read_text(encoding='utf-8'))
+
+
+def test_todas_las_paginas_tienen_presupuesto():
+    assert set(arranque.PAGINAS) == set(PRESUPUESTO)
+
+
+@pytest.mark.parametrize('pagina', arranque.PAGINAS)
+def test_importacion_dentro_del_presupuesto(pagina):
+    medida = arranque.medir(pagina)
+    assert not arranque.excedidas({pagina: medida}, PRESUPUESTO), (
+        f"{pagina} tarda {medida['segundos']} s en importarse; módulos más caros: {medida['modulos']}")
@@ -0,0 +1,82 @@
+"""Filtros equivalentes dan la misma clave de caché y reutilizan el resultado memorizado."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from dinsar import consultas
+from dinsar.espacial import indexar_puntos
+
+
+@pytest.fixture(autouse=True)
+def cache_vacio():
+    consultas.limpiar_cache()
+    yield
+    consultas.limpiar_cache()
+
+
+def _clave(m, sensores=None, desde=None, hasta=None, version='v1'):
+    return consultas.clave_consulta('desplazamiento', version, m.corrida,
+                                    *consultas.normalizar_filtros(m, sensores, desde, hasta))
+
+
+def test_sensores_permutados_o_repetidos_misma_clave(matriz):
+    s = matriz.sensores
+    assert _clave(matriz, [s[5], s[1], s[3]]) == _clave(matriz, [s[1], s[3], s[5], s[1]])
+    assert _clave(matriz, list(reversed(s))) == _clave(matriz, None)
+    assert _clave(matriz, [s[1], s[3]]) != _clave(matriz, [s[1], s[4]])
+
+
+def test_ventanas_equivalentes_misma_clave(matriz):
+    f = matriz.fechas
+    # Antes de la primera o después de la última fecha es lo mismo que no filtrar
+    assert _clave(matriz, desde=f[0] - np.timedelta64(30, 'D'), hasta=f[-1] + np.timedelta64(1, 'D')) \
+        == _clave(matriz)
+    assert _clave(matriz, desde=f[0], hasta=f[-1]) == _clave(matriz)
+    assert _clave(matriz, desde=str(pd.Timestamp(f[10]).date())) == _clave(matriz, desde=pd.Timestamp(f[10]))
+    assert _clave(matriz, desde=f[10]) != _clave(matriz, desde=f[11])
+
+
+def test_version_nueva_es_otra_clave(matriz):
+    assert _clave(matriz, version='v1') != _clave(matriz, version='v2')
+
+
+def test_consulta_equivalente_reutiliza_el_resultado(matriz, monkeypatch):
+    construidas = []
+    original = consultas.figura_desplazamiento
+    monkeypatch.setattr(consultas, 'figura_desplazamiento', lambda *a, **k: construidas.append(1) or original(*a, **k))
+    s = matriz.sensores
+    fuente = {matriz.corrida: matriz}
+
+    primero = consultas.consultar_desplazamiento(fuente, 1, [s[4], s[2]], desde=matriz.fechas[0], version='v1')
+    segundo = consultas.consultar_desplazamiento(fuente, 1, [s[2], s[4], s[2]], version='v1')
+    assert segundo is primero
+    assert len(construidas) == 1
+
+    tercero = consultas.consultar_desplazamiento(fuente, 1, [s[2], s[4]], version='v2')
+    assert tercero is not primero
+    assert len(construidas) == 2
+    assert tercero.figura_plotly().to_dict() == primero.figura_plotly().to_dict()
+    # Un acierto del caché tampoco vuelve a armar la figura desde el JSON
+    assert segundo.figura_plotly() is primero.figura_plotly()
+
+
+def test_series_completas_acotadas_por_bytes(matriz, monkeypatch):
+    # Una serie más grande que el caché de series se calcula pero no se guarda
+    monkeypatch.setattr(consultas, '_cache_series', consultas.TTLCache(
+        maxsize=matriz.valores.nbytes // 2, ttl=60, getsizeof=consultas._bytes))
+    consultas.consultar_desplazamiento({1: matriz}, 1, modo='acumulado', version='v1')
+    assert len(consultas._cache_series) == 0
+
+    chica = matriz.sensores[:2]
+    consultas.consultar_desplazamiento({1: matriz}, 1, chica, modo='acumulado', version='v1')
+    assert len(consultas._cache_series) == 1
+
+
+@pytest.mark.parametrize('umbral', [5, 1000])
+def test_mapa_informa_si_agrega_en_hexagonos(matriz, umbral):
+    rng = np.random.default_rng(0)
+    indice = indexar_puntos(matriz.sensores, rng.uniform(-79.3, -79.1, len(matriz.sensores)),
+                            rng.uniform(-4.1, -3.9, len(matriz.sensores)))
+    mapa = consultas.consultar_mapa({1: matriz}, indice, 1, version='v1', umbral=umbral)
+    assert mapa.hexagonal == (len(mapa.tabla) > umbral)
+    assert mapa.hexagonal == (umbral == 5)
@@ -0,0 +1,60 @@
+"""La correlación con retardo en lote coincide con np.corrcoef sensor por sensor y retardo por retardo."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from dinsar import correlacion
+from dinsar.correlacion import PARES_MIN, alinear_lluvia, correlacion_con_retardo, tabla_retardos
+from dinsar.eventos import deltas
+
+
+@pytest.fixture
+def lluvia(matriz):
+    # Lluvia en la mayoría de las fechas, con huecos y dos registros en algunas
+    rng = np.random.default_rng(1)
+    fechas = matriz.fechas[rng.random(len(matriz.fechas)) < 0.85]
+    df = pd.DataFrame({'fecha': fechas, 'rainfall': rng.gamma(1.5, 10, len(fechas))})
+    return pd.concat([df, df.iloc[::5].assign(rainfall=lambda d: d['rainfall'] / 2)], ignore_index=True)
+
+
+def _corrcoef(m, lluvia, max_retardo, respuesta):
+    r = alinear_lluvia(m, lluvia)
+    y = deltas(m)[0].astype(np.float64) if respuesta == 'delta' else m.valores.astype(np.float64)
+    corr = np.full((max_retardo + 1, len(m.sensores)), np.nan)
+    for k in range(max_retardo + 1):
+        rk = np.concatenate((np.full(k, np.nan), r[:len(r) - k]))
+        for j in range(len(m.sensores)):
+            pares = ~np.isnan(rk) & ~np.isnan(y[:, j])
+            if pares.sum() >= PARES_MIN:
+                corr[k, j] = np.corrcoef(rk[pares], y[pares, j])[0, 1]
+    return corr
+
+
+def test_alinear_lluvia_suma_por_fecha(matriz, lluvia):
+    esperado = lluvia.groupby('fecha')['rainfall'].sum().reindex(matriz.fechas).to_numpy()
+    np.testing.assert_allclose(alinear_lluvia(matriz, lluvia), esperado)
+
+
+@pytest.mark.parametrize('respuesta', ['delta', 'valor'])
+def test_correlacion_igual_a_corrcoef(matriz, lluvia, respuesta):
+    corr, _ = correlacion_con_retardo(matriz, lluvia, max_retardo=4, respuesta=respuesta)
+    np.testing.assert_allclose(corr, _corrcoef(matriz, lluvia, 4, respuesta), rtol=1e-7, atol=1e-9)
+
+
+def test_bloques_de_sensores_no_cambian_el_resultado(matriz, lluvia, monkeypatch):
+    completa, pares = correlacion_con_retardo(matriz, lluvia, max_retardo=3)
+    monkeypatch.setattr(correlacion, 'BLOQUE_BYTES', 4 * 4 * len(matriz.fechas) * 6)
+    por_bloques, pares_bloques = correlacion_con_retardo(matriz, lluvia, max_retardo=3)
+    np.testing.assert_allclose(por_bloques, completa, rtol=1e-12)
+    np.testing.assert_array_equal(pares_bloques, pares)
+
+
+def test_tabla_retardos_elige_el_mayor_valor_absoluto(matriz, lluvia):
+    corr = _corrcoef(matriz, lluvia, 6, 'delta')
+    tabla = tabla_retardos(matriz, lluvia, max_retardo=6).set_index('sensor')
+
+    j = np.searchsorted(matriz.sensores, tabla.index.to_numpy())
+    mejor = np.nanargmax(np.abs(corr[:, j]), axis=0)
+    np.testing.assert_array_equal(tabla['retardo'], mejor)
+    np.testing.assert_allclose(tabla['correlacion'], corr[mejor, j], rtol=1e-7)
+    assert tabla['correlacion'].abs().is_monotonic_decreasing
@@ -0,0 +1,87 @@
+"""Los cubos en mmap dan las mismas matrices que leerlas enteras en memoria."""
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from dinsar import cubo, lectura, sintetico
+from dinsar.matriz import desde_ancho
+
+
+@pytest.fixture
+def corridas(tmp_path):
+    rutas, _ = sintetico.generar(tmp_path / 'csv', n_sensores=30, n_fechas=40, n_corridas=2)
+    yield rutas
+    lectura.olvidar(rutas)
+
+
+def _en_memoria(ruta, destino, monkeypatch):
+    # Referencia: la misma corrida leída en otro directorio, sin cubos
+    copia = destino / ruta.name
+    destino.mkdir()
+    shutil.copy(ruta, copia)
+    monkeypatch.setattr(lectura, 'UMBRAL_CUBO_BYTES', 2**62)
+    matrices, _ = lectura.leer_matrices_corrida(copia)
+    lectura.olvidar([copia])
+    monkeypatch.setattr(lectura, 'UMBRAL_CUBO_BYTES', 0)
+    return matrices
+
+
+def _iguales(a, b):
+    assert sorted(a) == sorted(b)
+    for c in a:
+        np.testing.assert_array_equal(a[c].fechas, b[c].fechas)
+        np.testing.assert_array_equal(a[c].sensores, b[c].sensores)
+        np.testing.assert_array_equal(a[c].puntos, b[c].puntos)
+        np.testing.assert_array_equal(a[c].valores, b[c].valores)
+
+
+def test_cubos_igual_a_matrices_en_memoria(corridas, tmp_path, monkeypatch):
+    esperado = _en_memoria(corridas[0], tmp_path / 'ref', monkeypatch)
+    matrices, _ = lectura.leer_matrices_corrida(corridas[0])
+
+    assert all(isinstance(m.valores, np.memmap) for m in matrices.values())
+    assert cubo.origen_guardado(cubo.ruta_cubos(corridas[0])) is not None
+    _iguales(matrices, esperado)
+
+
+def test_escribir_por_lotes_igual_a_desde_ancho(tmp_path):
+    # Dos corridas intercaladas, fechas desordenadas y un sensor vacío en la corrida 2
+    rng = np.random.default_rng(3)
+    n = 23
+    df = pd.DataFrame({
+        'punto': [f'PS{i}' for i in range(n)],
+        'fecha': np.datetime64('2018-01-01', 'ns') + rng.permutation(n).astype('timedelta64[D]'),
+        'corrida': np.where(np.arange(n) % 3 == 0, 2, 1),
+    })
+    for sensor in ('300', '17', '2048', '96'):
+        df[sensor] = np.where(rng.random(n) < 0.2, np.nan, rng.normal(0, 5, n))
+    df.loc[df['corrida'] == 2, '2048'] = np.nan
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+    def lotes(columnas, filas):
+        return tabla.select(columnas).to_batches(max_chunksize=filas)
+
+    # Lotes de 3 filas: el resultado no depende de cómo se recorre el archivo
+    matrices = cubo.escribir(tmp_path / 'x.cubo', lotes, ['300', '17', '2048', '96'], 'origen',
+                             bytes_lote=8 * 4 * 3)
+    _iguales(matrices, {c: desde_ancho(g, c) for c, g in df.groupby('corrida')})
+    assert 2048 not in matrices[2].sensores
+    assert cubo.abrir(tmp_path / 'x.cubo', 'otro origen') is None
+
+
+def test_filas_agregadas_reconstruyen_los_cubos(corridas, tmp_path, monkeypatch):
+    ruta = corridas[0]
+    lineas = ruta.read_text(encoding='utf-8').splitlines(keepends=True)
+    ruta.write_text(''.join(lineas[:-4]), encoding='utf-8')
+    monkeypatch.setattr(lectura, 'UMBRAL_CUBO_BYTES', 0)
+    antes, _ = lectura.leer_matrices_corrida(ruta)
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.writelines(lineas[-4:])
+
+    despues, _ = lectura.leer_matrices_corrida(ruta)
+    assert lectura.ruta_anexo(lectura.ruta_parquet(ruta)).exists()
+    assert len(despues[1].fechas) == len(antes[1].fechas) + 4
+    _iguales(despues, _en_memoria(ruta, tmp_path / 'ref', monkeypatch))
@@ -0,0 +1,68 @@
+"""El índice espacial y los hexágonos dan lo mismo que recorrer todos los puntos."""
+import numpy as np
+import pytest
+
+from dinsar.espacial import en_caja, hexagonos, indexar_puntos
+
+
+@pytest.fixture
+def puntos():
+    # Una nube dispersa y un cúmulo denso, como los PS sobre una ladera
+    rng = np.random.default_rng(7)
+    lon = np.concatenate((rng.uniform(-79.3, -79.1, 3000), rng.normal(-79.2, 0.002, 2000)))
+    lat = np.concatenate((rng.uniform(-4.1, -3.9, 3000), rng.normal(-3.99, 0.002, 2000)))
+    sensores = rng.permutation(np.arange(10_000, 10_000 + len(lon)))
+    return sensores, lon, lat
+
+
+@pytest.mark.parametrize('caja', [
+    (-79.25, -4.05, -79.15, -3.95),
+    (-79.205, -3.995, -79.195, -3.985),
+    (-79.4, -4.2, -79.0, -3.8),
+    (-78.0, -3.0, -77.0, -2.0),
+    (-79.15, -3.95, -79.25, -4.05),
+])
+def test_en_caja_igual_a_mascara(puntos, caja):
+    sensores, lon, lat = puntos
+    indice = indexar_puntos(sensores, lon, lat)
+    oeste, sur, este, norte = caja
+    mascara = (lon >= oeste) & (lon <= este) & (lat >= sur) & (lat <= norte)
+    assert sorted(indice.sensores[en_caja(indice, *caja)]) == sorted(sensores[mascara])
+
+
+def test_bordes_de_la_caja_incluidos():
+    # Grilla regular: los bordes de la caja pasan exactamente por puntos
+    eje = np.arange(21) / 20
+    lon, lat = (a.ravel() for a in np.meshgrid(eje, eje))
+    sensores = np.arange(len(lon))
+    indice = indexar_puntos(sensores, lon, lat)
+    oeste, sur, este, norte = eje[3], eje[5], eje[11], eje[12]
+    encontrados = indice.sensores[en_caja(indice, oeste, sur, este, norte)]
+    assert len(encontrados) == 9 * 8
+    mascara = (lon >= oeste) & (lon <= este) & (lat >= sur) & (lat <= norte)
+    assert sorted(encontrados) == sorted(sensores[mascara])
+
+
+def test_indice_vacio():
+    indice = indexar_puntos([], [], [])
+    assert len(en_caja(indice, -1, -1, 1, 1)) == 0
+
+
+def test_hexagonos_igual_al_centro_mas_cercano(puntos):
+    _, lon, lat = puntos
+    valores = np.random.default_rng(1).normal(size=len(lon))
+    valores[::17] = np.nan
+    tam = 0.01
+    hexs = hexagonos(lon, lat, valores, tam)
+    assert hexs['n'].sum() == len(lon)
+
+    # Cada punto cae en el hexágono de centro más cercano (en la proyección local)
+    escala = np.cos(np.radians(lat.mean()))
+    dx = lon[:, None] * escala - hexs['lon'].to_numpy()[None, :] * escala
+    dy = lat[:, None] - hexs['lat'].to_numpy()[None, :]
+    cercano = np.argmin(dx ** 2 + dy ** 2, axis=1)
+    np.testing.assert_array_equal(np.bincount(cercano, minlength=len(hexs)), hexs['n'])
+    for h in np.unique(cercano)[:50]:
+        v = valores[cercano == h]
+        esperado = np.nanmean(v) if (~np.isnan(v)).any() else np.nan
+        np.testing.assert_allclose(hexs['valor'].iloc[h], esperado, rtol=1e-9)
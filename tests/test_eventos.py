@@ -0,0 +1,67 @@
+"""El motor de eventos con argpartition da lo mismo que el groupby/shift de la página original."""
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from dinsar import matriz as modulo_matriz
+from dinsar.eventos import COLUMNAS, deltas, eventos_globales, eventos_por_sensor, picos_por_sensor
+from dinsar.matriz import a_largo
+
+
+def _eventos_pandas(m):
+    # Cambio respecto a la observación válida anterior, como en la página original
+    df = a_largo(m).sort_values(['sensor', 'fecha'], kind='stable').reset_index(drop=True)
+    previo = df.groupby('sensor')[['Desplazamiento', 'fecha']].shift(1)
+    df['Fecha_Previo'] = previo['fecha']
+    df['Delta'] = df['Desplazamiento'] - previo['Desplazamiento']
+    df['Dias'] = (df['fecha'] - df['Fecha_Previo']).dt.days
+    df['Velocidad'] = df['Delta'] / df['Dias']
+    return df.dropna(subset=['Delta'])
+
+
+def _normalizado(df):
+    return df[COLUMNAS].reset_index(drop=True).astype({
+        'sensor': 'int64', 'Fecha_Previo': 'datetime64[ns]', 'fecha': 'datetime64[ns]',
+        'Delta': 'float64', 'Dias': 'int64', 'Velocidad': 'float64'})
+
+
+def _comparar(obtenido, esperado):
+    assert_frame_equal(_normalizado(obtenido), _normalizado(esperado), check_exact=False, rtol=1e-5)
+
+
+def test_deltas_igual_a_shift_por_sensor(matriz):
+    delta, dias, _ = deltas(matriz)
+    esperado = _eventos_pandas(matriz)
+    filas = np.searchsorted(matriz.fechas, esperado['fecha'].to_numpy())
+    cols = np.searchsorted(matriz.sensores, esperado['sensor'].to_numpy())
+    np.testing.assert_allclose(delta[filas, cols], esperado['Delta'], rtol=1e-5)
+    np.testing.assert_array_equal(dias[filas, cols], esperado['Dias'])
+    # Donde no hay observación previa o valor, no hay delta
+    assert np.isnan(delta).sum() == delta.size - len(esperado)
+
+
+def test_picos_igual_a_idxmax_por_sensor(matriz):
+    df = _eventos_pandas(matriz)
+    esperado = df.loc[df.groupby('sensor')['Delta'].apply(lambda x: x.abs().idxmax())]
+    esperado = esperado.sort_values('Velocidad', ascending=False, kind='stable')
+    _comparar(picos_por_sensor(matriz), esperado)
+
+
+def test_eventos_globales_igual_a_ordenar_todo(matriz):
+    df = _eventos_pandas(matriz)
+    esperado = df.assign(puntaje=df['Delta'].abs()).sort_values('puntaje', ascending=False, kind='stable')
+    _comparar(eventos_globales(matriz, k=15), esperado.head(15))
+
+
+@pytest.mark.parametrize('bloque_bytes', [None, 4 * 40 * 7])
+def test_eventos_por_sensor_con_umbral(matriz, monkeypatch, bloque_bytes):
+    if bloque_bytes is not None:
+        # Bloques de 7 sensores: el resultado no depende de cómo se parte la matriz
+        monkeypatch.setattr(modulo_matriz, 'BLOQUE_BYTES', bloque_bytes)
+    df = _eventos_pandas(matriz)
+    df = df[df['Velocidad'].abs() >= 0.01]
+    df = df.assign(puntaje=df['Delta'].abs()).sort_values(['sensor', 'puntaje'], ascending=[True, False],
+                                                          kind='stable')
+    esperado = df.groupby('sensor').head(3)
+    _comparar(eventos_por_sensor(matriz, k=3, umbral_velocidad=0.01), esperado)
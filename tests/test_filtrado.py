@@ -0,0 +1,83 @@
+"""El filtro de Hampel y coherencia en bloque coincide con recorrer cada sensor y cada ventana."""
+import numpy as np
+import pytest
+
+from dinsar import filtrado
+from dinsar.filtrado import ESCALA_MAD, LONGITUD_ONDA_MM, MINIMO_VENTANA, ParametrosFiltro, filtrar_atipicos
+from dinsar.matriz import MatrizCorrida
+from dinsar.tendencia import tiempo_en_anos
+
+
+@pytest.fixture
+def con_atipicos(matriz):
+    # Picos sueltos, huecos y un sensor de puro ruido (coherencia baja)
+    rng = np.random.default_rng(5)
+    valores = matriz.valores.copy()
+    valores[rng.random(valores.shape) < 0.1] = np.nan
+    filas, columnas = rng.integers(0, valores.shape[0], 25), rng.integers(0, valores.shape[1], 25)
+    valores[filas, columnas] += rng.choice([-40, 40], 25)
+    valores[:, 5] = rng.normal(0, 15, valores.shape[0])
+    return MatrizCorrida(matriz.corrida, matriz.fechas, matriz.sensores, matriz.puntos, valores)
+
+
+def _hampel_a_mano(valores, p):
+    limpios = valores.copy()
+    atipicos = np.zeros(valores.shape[1], dtype=np.int64)
+    coherencia = np.zeros(valores.shape[1])
+    for j in range(valores.shape[1]):
+        y = valores[:, j]
+        fases = []
+        for i in range(len(y)):
+            ventana = y[max(0, i - p.ventana):i + p.ventana + 1]
+            ventana = ventana[~np.isnan(ventana)]
+            if np.isnan(y[i]):
+                continue
+            mediana = np.median(ventana)
+            mad = np.median(np.abs(ventana - mediana))
+            fases.append(4 * np.pi / LONGITUD_ONDA_MM * (y[i] - mediana))
+            if len(ventana) >= MINIMO_VENTANA and abs(y[i] - mediana) > p.n_sigmas * ESCALA_MAD * mad:
+                limpios[i, j] = np.nan
+                atipicos[j] += 1
+        coherencia[j] = np.abs(np.mean(np.exp(1j * np.array(fases))))
+    return limpios, atipicos, coherencia
+
+
+def _rmse(valores, fechas):
+    t = tiempo_en_anos(fechas)
+    rmse = np.full(valores.shape[1], np.nan)
+    for j in range(valores.shape[1]):
+        ok = ~np.isnan(valores[:, j])
+        if ok.sum() >= 2:
+            recta = np.polyfit(t[ok], valores[ok, j], 1)
+            rmse[j] = np.sqrt(np.mean((valores[ok, j] - np.polyval(recta, t[ok])) ** 2))
+    return rmse
+
+
+@pytest.mark.parametrize('bloque_bytes', [None, (4 * 7) * (4 * 40 * 7)])
+def test_filtro_igual_a_recorrer_cada_ventana(con_atipicos, monkeypatch, bloque_bytes):
+    if bloque_bytes is not None:
+        # Bloques de 7 sensores: el filtro divide BLOQUE_BYTES por 4·(2·ventana + 1)
+        monkeypatch.setattr(filtrado, 'BLOQUE_BYTES', bloque_bytes)
+    p = ParametrosFiltro(ventana=3, n_sigmas=3.0, coherencia_min=0.7, rmse_max=8.0)
+    filtrada, informe = filtrar_atipicos(con_atipicos, p)
+    limpios, atipicos, coherencia = _hampel_a_mano(con_atipicos.valores, p)
+    rmse = _rmse(limpios, con_atipicos.fechas)
+
+    np.testing.assert_array_equal(informe['sensor'], con_atipicos.sensores)
+    np.testing.assert_array_equal(informe['atipicos'], atipicos)
+    assert atipicos.sum() >= 20
+    np.testing.assert_allclose(informe['coherencia'], coherencia, rtol=1e-5)
+    np.testing.assert_allclose(informe['rmse'], rmse, rtol=1e-4, atol=1e-6)
+
+    rechazado = (coherencia < p.coherencia_min) | (rmse > p.rmse_max)
+    assert rechazado[5]
+    np.testing.assert_array_equal(informe['rechazado'], rechazado)
+    np.testing.assert_array_equal(filtrada.sensores, con_atipicos.sensores[~rechazado])
+    np.testing.assert_array_equal(filtrada.valores, limpios[:, ~rechazado])
+
+
+def test_conservar_no_rechaza_el_punto_estable(con_atipicos):
+    estable = int(con_atipicos.sensores[5])
+    filtrada, informe = filtrar_atipicos(con_atipicos, conservar=[estable])
+    assert not informe.loc[5, 'rechazado']
+    assert estable in filtrada.sensores
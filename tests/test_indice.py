@@ -0,0 +1,78 @@
+"""Filtrar por rangos de filas precalculados da lo mismo que una máscara booleana de pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from dinsar.indice import filtrar, indexar
+
+
+@pytest.fixture
+def largo():
+    # Tabla larga desordenada: 3 corridas con sensores y fechas distintas, sin algunas filas
+    rng = np.random.default_rng(2)
+    partes = []
+    for corrida in (1, 2, 3):
+        fechas = np.datetime64('2016-01-01', 'ns') + (12 * np.arange(20 + corrida)).astype('timedelta64[D]')
+        sensores = np.sort(rng.choice(np.arange(100, 200), 8, replace=False))
+        f, s = (a.ravel() for a in np.meshgrid(fechas, sensores))
+        df = pd.DataFrame({'corrida': corrida, 'sensor': s, 'fecha': f, 'valor': rng.normal(size=len(f))})
+        partes.append(df[rng.random(len(df)) > 0.1])
+    return pd.concat(partes, ignore_index=True).sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def _ordenado(df):
+    df = df.astype({'corrida': 'int64', 'sensor': 'int64'})
+    return df.sort_values(['corrida', 'sensor', 'fecha'], kind='stable').reset_index(drop=True)
+
+
+def _entre(a, b):
+    # Un instante entre dos fechas de adquisición (no coincide con ninguna fila)
+    return pd.Timestamp(a) + (pd.Timestamp(b) - pd.Timestamp(a)) / 2
+
+
+@pytest.mark.parametrize('caso', ['corrida', 'sensores', 'fechas', 'sensores y fechas', 'vacio'])
+def test_filtrar_igual_a_mascara(largo, caso):
+    t = indexar(largo, ['corrida', 'sensor'])
+    sensores_2 = t.valores(1, (2,))
+    fechas_2 = np.sort(largo.loc[largo['corrida'] == 2, 'fecha'].unique())
+    sensores = ultimos = None
+    desde = hasta = None
+    if 'sensores' in caso:
+        # Desordenados y con uno que no está en la corrida
+        sensores = [sensores_2[5], sensores_2[0], sensores_2[3], 999]
+        ultimos = sensores
+    if 'fechas' in caso:
+        desde, hasta = _entre(fechas_2[2], fechas_2[3]), _entre(fechas_2[15], fechas_2[16])
+    if caso == 'vacio':
+        desde, hasta = _entre(fechas_2[2], fechas_2[3]), _entre(fechas_2[2], fechas_2[3])
+
+    mascara = largo['corrida'] == 2
+    if sensores is not None:
+        mascara &= largo['sensor'].isin(sensores)
+    if desde is not None:
+        mascara &= (largo['fecha'] >= desde) & (largo['fecha'] <= hasta)
+
+    obtenido = filtrar(t, 2, ultimos=ultimos, desde=desde, hasta=hasta)
+    if caso == 'vacio':
+        assert obtenido.empty
+    assert_frame_equal(_ordenado(obtenido), _ordenado(largo[mascara]))
+
+
+def test_prefijo_de_dos_claves_y_clave_ausente(largo):
+    t = indexar(largo, ['corrida', 'sensor'])
+    sensor = t.valores(1, (3,))[4]
+    mascara = (largo['corrida'] == 3) & (largo['sensor'] == sensor)
+    assert_frame_equal(_ordenado(filtrar(t, (3, sensor))), _ordenado(largo[mascara]))
+    assert filtrar(t, 7).empty
+    assert filtrar(t, 1, ultimos=[999]).empty
+
+
+def test_clave_texto_y_entera_son_la_misma(largo):
+    # La precipitación guarda la corrida como texto
+    lluvia = largo.assign(corrida=largo['corrida'].astype(str))
+    t = indexar(lluvia, ['corrida'])
+    assert t.valores() == [1, 2, 3]
+    esperado = lluvia[lluvia['corrida'] == '2'].sort_values('fecha', kind='stable')
+    assert_frame_equal(filtrar(t, 2).astype({'corrida': str}).reset_index(drop=True),
+                       esperado.reset_index(drop=True).astype({'corrida': str}))
@@ -0,0 +1,143 @@
+"""La ingesta incremental (anexo Arrow junto al Parquet) da lo mismo que volver a leer todo el CSV."""
+import numpy as np
+import pytest
+
+from dinsar import lectura, sintetico
+
+
+@pytest.fixture
+def corridas(tmp_path):
+    rutas, _ = sintetico.generar(tmp_path, n_sensores=30, n_fechas=40, n_corridas=2)
+    yield rutas
+    lectura.olvidar(rutas)
+
+
+def _lineas(ruta):
+    return ruta.read_text(encoding='utf-8').splitlines(keepends=True)
+
+
+def _releer_todo(ruta):
+    # Referencia: sin Parquet, anexo ni matrices previas
+    lectura.olvidar([ruta])
+    lectura.ruta_parquet(ruta).unlink(missing_ok=True)
+    lectura.ruta_anexo(lectura.ruta_parquet(ruta)).unlink(missing_ok=True)
+    return lectura.leer_matrices_corrida(ruta)
+
+
+def _iguales(a, b):
+    assert sorted(a) == sorted(b)
+    for c in a:
+        np.testing.assert_array_equal(a[c].fechas, b[c].fechas)
+        np.testing.assert_array_equal(a[c].sensores, b[c].sensores)
+        np.testing.assert_array_equal(a[c].puntos, b[c].puntos)
+        np.testing.assert_array_equal(a[c].valores, b[c].valores)
+
+
+def _recortar(ruta, n):
+    lineas = _lineas(ruta)
+    ruta.write_text(''.join(lineas[:-n]), encoding='utf-8')
+    return lineas[-n:]
+
+
+def test_filas_agregadas_van_al_anexo(corridas):
+    ruta = corridas[0]
+    nuevas = _recortar(ruta, 5)
+    antes, _ = lectura.leer_matrices_corrida(ruta)
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.writelines(nuevas)
+
+    despues, _ = lectura.leer_matrices_corrida(ruta)
+    assert lectura.ruta_anexo(lectura.ruta_parquet(ruta)).exists()
+    assert len(despues[1].fechas) == len(antes[1].fechas) + 5
+    _iguales(despues, _releer_todo(ruta)[0])
+
+
+def test_anexo_grande_se_compacta(corridas):
+    ruta = corridas[0]
+    nuevas = _recortar(ruta, 25)
+    lectura.leer_matrices_corrida(ruta)
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.writelines(nuevas)
+
+    despues, _ = lectura.leer_matrices_corrida(ruta)
+    assert not lectura.ruta_anexo(lectura.ruta_parquet(ruta)).exists()
+    _iguales(despues, _releer_todo(ruta)[0])
+
+
+def test_rechazos_de_filas_agregadas_con_su_linea(corridas):
+    ruta = corridas[0]
+    lectura.leer_matrices_corrida(ruta)
+    n_lineas = len(_lineas(ruta))
+    ultima = _lineas(ruta)[-1].rstrip('\n').split(';')
+    ultima[0], ultima[1], ultima[4] = 'PS99', '1/1/2030', 'n/d'
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.write(';'.join(ultima) + '\n')
+
+    matrices, rechazos = lectura.leer_matrices_corrida(ruta)
+    assert rechazos[['fila', 'valor', 'motivo']].to_dict('records') == [
+        {'fila': n_lineas + 1, 'valor': 'n/d', 'motivo': 'valor no numérico'}]
+    _iguales(matrices, _releer_todo(ruta)[0])
+
+
+def test_fecha_vacia_se_descarta_en_el_camino_rapido(corridas, monkeypatch):
+    # Una celda de fecha vacía no hace fallar a pyarrow: no pasa por el camino tolerante
+    monkeypatch.setattr(lectura, '_convertir_tolerante', None)
+    ruta = corridas[0]
+    lineas = _lineas(ruta)
+    sin_fecha = lineas[3].split(';')
+    sin_fecha[1] = ''
+    ruta.write_text(''.join(lineas[:3] + [';'.join(sin_fecha)] + lineas[4:]), encoding='utf-8')
+
+    matrices, rechazos = lectura.leer_matrices_corrida(ruta)
+    assert rechazos[['fila', 'columna', 'motivo']].to_dict('records') == [
+        {'fila': 4, 'columna': 'fecha', 'motivo': 'fecha inválida'}]
+    assert not np.isnat(matrices[1].fechas).any()
+    assert len(matrices[1].fechas) == len(lineas) - 2
+
+    # También en las filas agregadas, con su número de línea
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.write(';'.join(sin_fecha))
+    matrices, rechazos = lectura.leer_matrices_corrida(ruta)
+    assert rechazos['fila'].tolist() == [4, len(lineas) + 1]
+    assert not np.isnat(matrices[1].fechas).any()
+
+
+def test_cambio_anterior_al_final_reingiere_todo(corridas):
+    ruta = corridas[0]
+    lectura.leer_matrices_corrida(ruta)
+    lineas = _lineas(ruta)
+    campos = lineas[2].split(';')
+    campos[3] = '9,5'
+    lineas[2] = ';'.join(campos)
+    ruta.write_text(''.join(lineas), encoding='utf-8')
+
+    matrices, _ = lectura.leer_matrices_corrida(ruta)
+    assert not lectura.ruta_anexo(lectura.ruta_parquet(ruta)).exists()
+    sensor = int(lineas[0].split(';')[3])
+    assert matrices[1].valores[1, matrices[1].sensores.tolist().index(sensor)] == 9.5
+    _iguales(matrices, _releer_todo(ruta)[0])
+
+
+def test_refrescar_no_carga_matrices_que_nadie_pidio(corridas):
+    ruta = corridas[0]
+    lectura.refrescar_corridas(ruta)
+    assert lectura.ruta_parquet(ruta).exists()
+    assert str(ruta) not in lectura._ultimas
+
+    nuevas = _recortar(ruta, 3)
+    lectura.leer_matrices_corrida(ruta)
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.writelines(nuevas)
+    lectura.refrescar_corridas(ruta)
+    firma, matrices, _, _ = lectura._ultimas[str(ruta)]
+    assert firma[2] == ruta.stat().st_size
+    _iguales(matrices, _releer_todo(ruta)[0])
+
+
+def test_pool_de_procesos_igual_a_lectura_en_serie(corridas):
+    en_pool, _, errores = lectura.leer_matrices(corridas, procesos=2)
+    assert not errores
+    for ruta in corridas:
+        lectura.olvidar([ruta])
+    en_serie, _, _ = lectura.leer_matrices(corridas, procesos=1)
+    _iguales(en_pool, en_serie)
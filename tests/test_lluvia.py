@@ -0,0 +1,55 @@
+"""La lluvia antecedente con sumas acumuladas as-of coincide con sumar cada ventana a mano."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from dinsar.indice import indexar
+from dinsar.lluvia import (
+    COLUMNA_DESDE_PREVIA, VENTANAS_DIAS, antecedente, columna_ventana, serie_para, tabla_antecedente,
+)
+from dinsar.matriz import MatrizCorrida
+
+
+@pytest.fixture
+def registros():
+    # Lluvia diaria con huecos, algunos NaN y fechas desordenadas
+    rng = np.random.default_rng(2)
+    fechas = np.datetime64('2016-01-01', 'ns') + rng.choice(400, 250, replace=False).astype('timedelta64[D]')
+    lluvia = rng.gamma(1.2, 8, len(fechas))
+    lluvia[rng.random(len(fechas)) < 0.05] = np.nan
+    return fechas, lluvia
+
+
+def _suma(fechas, lluvia, desde, hasta):
+    # Lluvia en (desde, hasta], NaN como 0
+    return np.nansum(lluvia[(fechas > desde) & (fechas <= hasta)])
+
+
+def test_antecedente_igual_a_sumar_cada_ventana(registros):
+    fechas, lluvia = registros
+    epocas = np.arange(np.datetime64('2016-01-10'), np.datetime64('2017-03-01'), 12).astype('datetime64[ns]')
+    columnas = antecedente(fechas, lluvia, epocas)
+
+    for dias in VENTANAS_DIAS:
+        esperado = [_suma(fechas, lluvia, t - np.timedelta64(dias, 'D'), t) for t in epocas]
+        np.testing.assert_allclose(columnas[columna_ventana(dias)], esperado, atol=1e-9)
+    esperado = [np.nan] + [_suma(fechas, lluvia, a, b) for a, b in zip(epocas[:-1], epocas[1:])]
+    np.testing.assert_allclose(columnas[COLUMNA_DESDE_PREVIA], esperado, atol=1e-9)
+
+
+def test_tabla_antecedente_por_corrida(matriz_sintetica, registros):
+    fechas, lluvia = registros
+    matrices = {c: matriz_sintetica(n_fechas=20, n_sensores=5, corrida=c, semilla=c) for c in (1, 2)}
+    # Las corridas sintéticas empiezan en 2015: se corren al rango de la lluvia
+    matrices = {c: MatrizCorrida(c, m.fechas + np.timedelta64(300 + 30 * c, 'D'), m.sensores, m.puntos, m.valores)
+                for c, m in matrices.items()}
+    prec = pd.concat([pd.DataFrame({'fecha': fechas, 'rainfall': lluvia, 'corrida': str(c)}) for c in (1, 3)],
+                     ignore_index=True)
+    tabla = tabla_antecedente(matrices, indexar(prec, ['corrida']))
+
+    # La corrida 2 no tiene lluvia registrada: no aparece
+    assert tabla['corrida'].unique().tolist() == [1]
+    m = matrices[1]
+    np.testing.assert_array_equal(tabla['fecha'], np.unique(m.fechas))
+    esperado = [_suma(fechas, lluvia, t - np.timedelta64(30, 'D'), t) for t in np.unique(m.fechas)]
+    np.testing.assert_allclose(serie_para(m, tabla, 'lluvia_30d'), esperado, atol=1e-9)
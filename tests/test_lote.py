@@ -0,0 +1,67 @@
+"""Las consultas de las páginas usan las tablas de dinsar.lote mientras siguen vigentes."""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from dinsar import consultas, datos, lectura, lote, sintetico
+
+
+@pytest.fixture
+def conjunto(tmp_path):
+    rutas, ruta_prec = sintetico.generar(tmp_path / 'data', n_sensores=20, n_fechas=30, n_corridas=2)
+    salida = tmp_path / 'resultados'
+    lote.ejecutar(tmp_path / 'data', salida, procesos=1)
+    datos.limpiar_cache()
+    consultas.limpiar_cache()
+    yield rutas, ruta_prec, salida
+    datos.limpiar_cache()
+    consultas.limpiar_cache()
+
+
+def _sin_calculo(*args, **kwargs):
+    raise AssertionError("la consulta debía usar las tablas precalculadas")
+
+
+def test_consultas_usan_resultados_precalculados(conjunto, monkeypatch):
+    rutas, ruta_prec, salida = conjunto
+    matrices, _, _ = lectura.leer_matrices(rutas, procesos=1)
+    esperado = consultas.consultar_desplazamiento(matrices, 1, version='calculado')
+    esperado_cruzado = consultas.consultar_cruzado(matrices, datos.cargar_indice_prec(ruta_prec), 1,
+                                                   version='calculado')
+
+    precalculados = datos.cargar_resultados(lote.TABLAS, rutas, ruta_prec, directorio=salida)
+    assert precalculados is not None
+
+    # Con las tablas vigentes, ni el promedio ni los picos ni la lluvia se calculan
+    monkeypatch.setattr(consultas, 'media_por_fecha', _sin_calculo)
+    monkeypatch.setattr(consultas, 'picos_por_sensor', _sin_calculo)
+    monkeypatch.setattr(consultas, '_lluvia', _sin_calculo)
+    resultado = consultas.consultar_desplazamiento(matrices, 1, precalculados=precalculados, version='lote')
+    cruzado = consultas.consultar_cruzado(matrices, None, 1, precalculados=precalculados, version='lote')
+
+    assert_series_equal(resultado.media, esperado.media)
+    assert_frame_equal(resultado.picos, esperado.picos)
+    assert_frame_equal(cruzado.lluvia, esperado_cruzado.lluvia, check_dtype=False)
+
+
+def test_resultados_vencidos_no_se_usan(conjunto):
+    rutas, ruta_prec, salida = conjunto
+    assert datos.cargar_resultados(('picos',), rutas, ruta_prec, directorio=salida) is not None
+
+    with open(rutas[0], 'a', encoding='utf-8') as f:
+        f.write(open(rutas[0], encoding='utf-8').read().splitlines()[-1] + '\n')
+    assert datos.cargar_resultados(('picos',), rutas, ruta_prec, directorio=salida) is None
+
+    # Sin resultados la consulta calcula como siempre
+    matrices, _, _ = lectura.leer_matrices(rutas, procesos=1)
+    resultado = consultas.consultar_desplazamiento(matrices, 1, precalculados=None, version='nueva')
+    assert not resultado.picos.empty
+
+
+def test_lote_no_importa_streamlit():
+    codigo = "import sys, dinsar.lote; sys.exit('streamlit' in sys.modules)"
+    raiz = Path(__file__).resolve().parent.parent
+    assert subprocess.run([sys.executable, '-c', codigo], cwd=raiz).returncode == 0
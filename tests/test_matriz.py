@@ -0,0 +1,81 @@
+"""La matriz densa por corrida da lo mismo que el pipeline largo de pandas de las páginas originales."""
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from dinsar import lectura, sintetico
+from dinsar.matriz import media_por_fecha
+
+
+@pytest.fixture
+def corridas(tmp_path):
+    rutas, _ = sintetico.generar(tmp_path, n_sensores=40, n_fechas=25, n_corridas=2)
+    yield rutas
+    lectura.olvidar(rutas)
+
+
+def _largo_pandas(path):
+    # El pipeline de la página original: read_csv, melt y coma decimal como texto
+    df = pd.read_csv(path, delimiter=';')
+    df.columns = [str(c).lower().strip() for c in df.columns]
+    df = df.loc[:, ~df.columns.str.contains('^unnamed')].dropna(axis=1, how='all')
+    df['fecha'] = pd.to_datetime(df['fecha'], dayfirst=True, errors='coerce')
+    df = df[df['fecha'].notna()]
+    sensores = [c for c in df.columns if c not in ('punto', 'fecha', 'corrida')]
+    largo = df.melt(id_vars=['fecha', 'corrida', 'punto'], value_vars=sensores,
+                    var_name='sensor', value_name='Desplazamiento')
+    largo['Desplazamiento'] = pd.to_numeric(
+        largo['Desplazamiento'].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    largo['punto'] = largo['punto'].astype(str).str.strip()
+    largo['sensor'] = largo['sensor'].astype(int)
+    return largo.dropna(subset=['Desplazamiento'])
+
+
+def _ordenado(df):
+    df = df[['fecha', 'corrida', 'punto', 'sensor', 'Desplazamiento']]
+    return df.sort_values(['corrida', 'fecha', 'sensor']).reset_index(drop=True).astype({
+        'fecha': 'datetime64[ns]', 'corrida': 'int64', 'punto': object, 'sensor': 'int64',
+        'Desplazamiento': 'float64'})
+
+
+def test_vista_larga_igual_al_pipeline_pandas(corridas):
+    matrices, rechazos, errores = lectura.leer_matrices(corridas, procesos=1)
+    assert not rechazos and not errores
+
+    esperado = _ordenado(pd.concat([_largo_pandas(p) for p in corridas], ignore_index=True))
+    obtenido = _ordenado(lectura.a_largo_todas(matrices))
+    assert_frame_equal(obtenido, esperado, check_exact=False, rtol=1e-6)
+
+
+def test_media_por_fecha_igual_a_groupby(corridas):
+    matrices, _, _ = lectura.leer_matrices(corridas, procesos=1)
+    largo = _largo_pandas(corridas[0])
+    esperado = largo.groupby('fecha')['Desplazamiento'].mean()
+    esperado.index = esperado.index.astype('datetime64[ns]')
+    assert_series_equal(media_por_fecha(matrices[1]), esperado, check_exact=False, rtol=1e-6)
+
+
+def test_columna_sin_id_numerico_va_a_rechazos(tmp_path):
+    ruta = tmp_path / 'data_estructurada_corrida1.csv'
+    ruta.write_text(
+        "punto;FECHA;corrida;53763;PS-norte;53764\n"
+        "PS1;28/4/2015;1;0;0;0\n"
+        "PS2;10/5/2015;1;0,5;1,2;-0,25\n",
+        encoding='utf-8')
+    matrices, rechazos = lectura.leer_matrices_corrida(ruta)
+    lectura.olvidar([ruta])
+
+    assert matrices[1].sensores.tolist() == [53763, 53764]
+    np.testing.assert_allclose(matrices[1].valores, [[0, 0], [0.5, -0.25]])
+    assert rechazos[['fila', 'columna', 'motivo']].to_dict('records') == [
+        {'fila': 1, 'columna': 'ps-norte', 'motivo': 'columna de sensor sin ID numérico'}]
+
+
+def test_filas_mas_largas_que_el_bloque_csv(corridas, monkeypatch):
+    # Con cientos de miles de sensores una fila pasa del bloque por defecto de pyarrow
+    monkeypatch.setattr(lectura, 'BLOQUE_CSV', 64)
+    matrices, rechazos = lectura.leer_matrices_corrida(corridas[0])
+    assert rechazos.empty
+    esperado = _ordenado(_largo_pandas(corridas[0]))
+    assert_frame_equal(_ordenado(lectura.a_largo_todas(matrices)), esperado, check_exact=False, rtol=1e-6)
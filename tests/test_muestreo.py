@@ -0,0 +1,91 @@
+"""LTTB y mín/máx respetan el presupuesto de puntos y conservan lo que la figura necesita."""
+import numpy as np
+import pytest
+
+from dinsar.muestreo import lttb, minmax
+
+
+@pytest.fixture
+def serie():
+    rng = np.random.default_rng(3)
+    x = np.datetime64('2015-04-28', 'ns') + np.cumsum(rng.integers(1, 30, 5000)).astype('timedelta64[D]')
+    y = np.cumsum(rng.normal(size=5000))
+    return x, y
+
+
+@pytest.fixture
+def nube():
+    # Varios sensores por fecha, como la dispersión de la página de desplazamiento
+    rng = np.random.default_rng(5)
+    fechas = np.datetime64('2015-04-28', 'ns') + (12 * np.arange(300)).astype('timedelta64[D]')
+    x = rng.permutation(np.repeat(fechas, 40))
+    return x, rng.normal(size=len(x))
+
+
+def _celdas_con_bucle(x, y, n):
+    # Referencia: la grilla de minmax armada cubeta por cubeta
+    xf = x.astype(np.int64).astype(np.float64)
+    presupuesto = n - 2
+    distintos = np.unique(xf)
+    n_cubetas = max(1, presupuesto // 2)
+    if len(distintos) > n_cubetas:
+        bordes = np.linspace(distintos[0], distintos[-1], n_cubetas + 1)
+        cubetas = [(xf >= bordes[k]) & ((xf < bordes[k + 1]) if k < n_cubetas - 1 else (xf <= bordes[-1]))
+                   for k in range(n_cubetas)]
+    else:
+        cubetas = [xf == v for v in distintos]
+    n_bandas = max(1, presupuesto // (2 * len(cubetas)))
+    cortes = np.linspace(y.min(), y.max(), n_bandas + 1)
+    esperados = set()
+    for en_cubeta in cubetas:
+        for b in range(n_bandas):
+            celda = en_cubeta & (y >= cortes[b]) & ((y < cortes[b + 1]) if b < n_bandas - 1 else (y <= cortes[-1]))
+            if celda.any():
+                pos = np.flatnonzero(celda)
+                esperados |= {int(pos[y[pos].argmin()]), int(pos[y[pos].argmax()])}
+    return esperados
+
+
+@pytest.mark.parametrize('n', [3, 10, 400])
+def test_lttb_extremos_y_tamano(serie, n):
+    x, y = serie
+    idx = lttb(x, y, n)
+    assert len(idx) == n
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_conserva_un_pico(serie):
+    x, y = serie
+    y = y.copy()
+    y[2345] = y.max() + 100
+    assert 2345 in lttb(x, y, 200)
+
+
+@pytest.mark.parametrize('funcion', [lttb, minmax])
+def test_pocos_puntos_sin_cambios(serie, funcion):
+    x, y = serie
+    np.testing.assert_array_equal(funcion(x[:50], y[:50], 50), np.arange(50))
+    np.testing.assert_array_equal(funcion(x[:50], y[:50], 400), np.arange(50))
+
+
+@pytest.mark.parametrize('n', [4, 100, 402, 1000])
+def test_minmax_extremos_y_tamano(nube, serie, n):
+    for x, y in (nube, serie):
+        idx = minmax(x, y, n)
+        assert len(idx) <= n
+        assert len(np.unique(idx)) == len(idx)
+        # El primer y el último punto en x
+        assert x[idx].min() == x.min() and x[idx].max() == x.max()
+    x, y = serie
+    assert {0, len(y) - 1} <= set(minmax(x, y, n).tolist())
+
+
+@pytest.mark.parametrize('n', [100, 602, 2000])
+def test_minmax_extremos_de_cada_celda(nube, n):
+    x, y = nube
+    idx = set(minmax(x, y, n).tolist())
+    esperados = _celdas_con_bucle(x, y, n)
+    assert esperados <= idx
+    # Fuera de los extremos de las celdas solo se agregan el primer y el último punto en x
+    assert len(idx - esperados) <= 2
@@ -0,0 +1,127 @@
+"""Las lecturas del dataset particionado con filtros dan lo mismo que recortar la matriz completa."""
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from dinsar import agregados, datos, lectura, particionado, sintetico
+from dinsar.eventos import picos_por_sensor
+from dinsar.matriz import MatrizCorrida, media_por_fecha, recortar_fechas, seleccionar
+
+
+@pytest.fixture
+def matrices(matriz_sintetica, monkeypatch):
+    # Mosaicos chicos: muchos grupos de filas por corrida
+    monkeypatch.setattr(particionado, 'FILAS_GRUPO', 64)
+    monkeypatch.setattr(particionado, 'FECHAS_GRUPO', 8)
+    return {c: matriz_sintetica(n_fechas=40, n_sensores=30, corrida=c, semilla=c) for c in (1, 2)}
+
+
+def _lluvia(matrices):
+    return pd.concat([pd.DataFrame({'fecha': m.fechas, 'rainfall': np.arange(len(m.fechas), dtype=float),
+                                    'corrida': str(c)}) for c, m in matrices.items()], ignore_index=True)
+
+
+def _iguales(a, b):
+    np.testing.assert_array_equal(a.fechas, b.fechas)
+    np.testing.assert_array_equal(a.sensores, b.sensores)
+    np.testing.assert_array_equal(a.puntos, b.puntos)
+    np.testing.assert_array_equal(a.valores, b.valores)
+
+
+def _recortada(m, n):
+    return MatrizCorrida(m.corrida, m.fechas[:n], m.sensores, m.puntos[:n], m.valores[:n].copy())
+
+
+@pytest.mark.parametrize('pedido', [
+    {},
+    {'sensores': 'algunos'},
+    {'desde': 10, 'hasta': 25},
+    {'sensores': 'algunos', 'desde': 3},
+    {'hasta': 0},
+])
+def test_matriz_igual_a_recortar_la_completa(tmp_path, matrices, pedido):
+    dataset = particionado.escribir(tmp_path, matrices, _lluvia(matrices), 'v1')
+    for corrida, m in matrices.items():
+        # Sensores pedidos desordenados y uno que no está en la corrida
+        sensores = [m.sensores[7], m.sensores[2], m.sensores[20], 1] if 'sensores' in pedido else None
+        desde = m.fechas[pedido['desde']] if 'desde' in pedido else None
+        hasta = m.fechas[pedido['hasta']] if 'hasta' in pedido else None
+        _iguales(dataset.matriz(corrida, sensores, desde, hasta),
+                 seleccionar(recortar_fechas(m, desde, hasta), sensores))
+
+
+def test_filtro_de_fechas_poda_grupos_de_filas(tmp_path, matrices):
+    dataset = particionado.escribir(tmp_path, matrices, _lluvia(matrices), 'v1')
+    m = matrices[1]
+
+    def grupos(filtro):
+        fragmentos = dataset._desp.get_fragments(filtro & (ds.field('corrida') == 1))
+        return sum(len(f.split_by_row_group(filtro)) for f in fragmentos)
+
+    todos = grupos(ds.field('fecha') >= m.fechas[0])
+    assert grupos(ds.field('fecha') >= m.fechas[-5]) < todos / 3
+
+
+def test_version_con_filas_agregadas_enlaza_lo_anterior(tmp_path, matrices):
+    previas = {c: _recortada(m, 30) for c, m in matrices.items()}
+    # La corrida 2 cambia un valor ya escrito: se reescribe entera
+    previas[2].valores[5, 3] += 1
+    anterior = particionado.escribir(tmp_path / 'dataset', previas, _lluvia(previas), 'v1')
+    nueva = particionado.escribir(tmp_path / 'dataset', matrices, _lluvia(matrices), 'v2')
+    completa = particionado.escribir(tmp_path / 'desde_cero', matrices, _lluvia(matrices), 'v2')
+
+    assert nueva.huellas['1']['partes'] == ['parte-0.parquet', 'parte-1.parquet']
+    assert nueva.huellas['2']['partes'] == ['parte-0.parquet']
+    assert nueva.huellas == completa.huellas | {'1': nueva.huellas['1']}
+    parte = 'desplazamiento/corrida=1/parte-0.parquet'
+    assert (nueva.directorio / parte).stat().st_ino == (anterior.directorio / parte).stat().st_ino
+    for corrida in matrices:
+        _iguales(nueva.matriz(corrida), completa.matriz(corrida))
+        assert_frame_equal(nueva.agregados(corrida).por_fecha, completa.agregados(corrida).por_fecha)
+        assert_frame_equal(nueva.agregados(corrida).por_sensor, completa.agregados(corrida).por_sensor)
+        _iguales(nueva.matriz(corrida, desde=matrices[corrida].fechas[28]),
+                 completa.matriz(corrida, desde=matrices[corrida].fechas[28]))
+
+
+def test_escritura_en_curso_no_es_version(tmp_path, matrices):
+    v1 = particionado.escribir(tmp_path, matrices, _lluvia(matrices), 'v1', conservar=1)
+    # El .tmp de otro proceso, más nuevo y con ORIGEN, antes de su os.replace
+    en_curso = tmp_path / f'{particionado.ruta_version(tmp_path, "v2").name}.999.tmp'
+    shutil.copytree(v1.directorio, en_curso)
+    assert particionado.ultima(tmp_path).directorio == v1.directorio
+    v3 = particionado.escribir(tmp_path, matrices, _lluvia(matrices), 'v3', conservar=1)
+    assert en_curso.is_dir() and not v1.directorio.exists() and v3.directorio.is_dir()
+
+
+def test_version_nueva_lee_solo_las_filas_agregadas(tmp_path, monkeypatch):
+    monkeypatch.setattr(datos, 'VIGILAR', False)
+    rutas, ruta_prec = sintetico.generar(tmp_path / 'data', n_sensores=20, n_fechas=30, n_corridas=2)
+    lineas = rutas[0].read_text(encoding='utf-8').splitlines(keepends=True)
+    rutas[0].write_text(''.join(lineas[:-3]), encoding='utf-8')
+    datos.limpiar_cache()
+    anterior = datos.cargar_dataset(rutas, ruta_prec)
+    with open(rutas[0], 'a', encoding='utf-8') as f:
+        f.writelines(lineas[-3:])
+
+    # Ninguna corrida se lee completa: solo las filas del anexo
+    leidos = []
+    completa = datos.leer_matrices_con_posiciones
+    monkeypatch.setattr(datos, 'leer_matrices_con_posiciones', lambda paths: completa(leidos.extend(paths) or paths))
+    nueva = datos.cargar_dataset(rutas, ruta_prec)
+    assert leidos == []
+    assert nueva.huellas['1']['partes'] == ['parte-0.parquet', 'parte-1.parquet']
+    for parte in ('desplazamiento/corrida=2/parte-0.parquet', 'agregados/corrida=2/por_sensor.parquet'):
+        assert (nueva.directorio / parte).stat().st_ino == (anterior.directorio / parte).stat().st_ino
+
+    matrices, _, _ = lectura.leer_matrices(rutas, procesos=1)
+    for corrida, m in matrices.items():
+        _iguales(nueva.matriz(corrida), m)
+        # Los agregados de la versión también se extendieron con solo esas filas
+        assert_series_equal(agregados.media(nueva.agregados(corrida)), media_por_fecha(m), check_exact=True)
+        assert_frame_equal(agregados.picos(nueva.agregados(corrida)), picos_por_sensor(m), check_exact=True)
+    assert nueva.posiciones[str(rutas[0])]['filas'] == 3
+    datos.limpiar_cache()
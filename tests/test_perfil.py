@@ -0,0 +1,72 @@
+"""El registro de etapas mide etapas anidadas por hilo y emite una línea JSON por etapa."""
+import json
+import logging
+import threading
+
+import numpy as np
+import pytest
+
+from dinsar import perfil
+
+
+@pytest.fixture(autouse=True)
+def sin_registro():
+    yield
+    perfil.iniciar('prueba', activo=False)
+
+
+def test_etapas_anidadas_y_cache():
+    registro = perfil.iniciar('Desplazamiento', activo=True)
+    with perfil.etapa('consulta', cache=True) as consulta:
+        with perfil.etapa('filtro') as filtro:
+            filtro.anotar(np.zeros((10, 4), dtype=np.float32))
+        perfil.fallo_cache()
+    with perfil.etapa('carga', cache=True):
+        pass
+
+    assert [(e.nombre, e.nivel) for e in registro.etapas] == [('consulta', 0), ('filtro', 1), ('carga', 0)]
+    assert consulta.cache == 'fallo' and registro.etapas[2].cache == 'acierto' and filtro.cache is None
+    assert filtro.filas == 40 and filtro.memoria_mb == round(160 / 2**20, 3)
+    assert consulta.segundos >= filtro.segundos >= 0
+    assert list(registro.tabla()['etapa']) == ['consulta', '· filtro', 'carga']
+    assert not registro.pila
+
+
+def test_registro_por_hilo():
+    principal = perfil.iniciar('Principal', activo=True)
+    otros = {}
+
+    def sesion():
+        otros['registro'] = perfil.iniciar('Otra', activo=True)
+        with perfil.etapa('en otro hilo'):
+            pass
+
+    with perfil.etapa('en el principal'):
+        hilo = threading.Thread(target=sesion)
+        hilo.start()
+        hilo.join()
+
+    assert [e.nombre for e in principal.etapas] == ['en el principal']
+    assert [e.nombre for e in otros['registro'].etapas] == ['en otro hilo']
+    assert otros['registro'].etapas[0].nivel == 0
+
+
+def test_inactivo_no_mide():
+    perfil.iniciar('Mapa', activo=False)
+    assert not perfil.activo()
+    with perfil.etapa('carga') as e:
+        assert e.anotar('x') == 'x'
+    assert e is perfil.etapa('otra')
+
+
+def test_linea_json_por_etapa(caplog):
+    caplog.set_level(logging.INFO, logger='dinsar.perfil')
+    perfil.iniciar('Cruzado', activo=True)
+    with perfil.etapa('lluvia por fecha', cache=True) as e:
+        e.anotar([1, 2, 3])
+
+    lineas = [json.loads(r.getMessage()) for r in caplog.records if r.name == 'dinsar.perfil']
+    assert len(lineas) == 1
+    assert set(lineas[0]) == {'pagina', 'etapa', 'segundos', 'filas', 'memoria_mb', 'cache'}
+    assert lineas[0]['pagina'] == 'Cruzado' and lineas[0]['etapa'] == 'lluvia por fecha'
+    assert lineas[0]['filas'] == 3 and lineas[0]['cache'] == 'acierto'
@@ -0,0 +1,62 @@
+"""Cada nivel de la pirámide de lluvia coincide con ``resample`` de pandas por corrida."""
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from dinsar.piramide import construir_piramide, serie
+
+# Regla de resample equivalente a cada nivel (periodos rotulados por su inicio)
+REGLAS = {'D': 'D', 'W': 'W-MON', 'M': 'MS', 'Y': 'YS'}
+
+
+@pytest.fixture
+def lluvia():
+    # Registros con varias mediciones por día, días secos, meses sin datos y
+    # extremos a mitad de semana, de mes y de año
+    rng = np.random.default_rng(9)
+    partes = []
+    for corrida, (inicio, fin) in {'1': ('2015-04-29', '2017-08-17'), '2': ('2016-02-10', '2016-11-03')}.items():
+        dias = pd.date_range(inicio, fin, freq='D')
+        dias = dias[(dias.month != 7) | (dias.year != 2016)]
+        dias = dias[rng.random(len(dias)) < 0.6]
+        fechas = dias.repeat(rng.integers(1, 4, len(dias)))
+        fechas = fechas + pd.to_timedelta(rng.integers(0, 86_400, len(fechas)), unit='s')
+        lluvia = np.where(rng.random(len(fechas)) < 0.4, 0.0, rng.gamma(1.2, 6.0, len(fechas)))
+        partes.append(pd.DataFrame({'fecha': fechas, 'rainfall': lluvia, 'corrida': corrida}))
+    return pd.concat(partes, ignore_index=True).sample(frac=1, random_state=1).reset_index(drop=True)
+
+
+def _con_resample(df, resolucion):
+    filas = []
+    for corrida, g in df.groupby('corrida'):
+        diaria = g.set_index('fecha')['rainfall'].resample('D')
+        con_datos = diaria.count() > 0
+        diaria = diaria.sum()[con_datos]
+        regla = REGLAS[resolucion]
+        opciones = {'label': 'left', 'closed': 'left'} if resolucion == 'W' else {}
+        por_periodo = pd.DataFrame({
+            'suma': g.set_index('fecha')['rainfall'].resample(regla, **opciones).sum(),
+            'maximo': diaria.resample(regla, **opciones).max(),
+            'dias_lluvia': (diaria > 0).astype('int64').resample(regla, **opciones).sum(),
+            'n': g.set_index('fecha')['rainfall'].resample(regla, **opciones).count(),
+        })
+        # resample rellena los huecos con periodos vacíos; la pirámide no los guarda
+        por_periodo = por_periodo[por_periodo['n'] > 0].drop(columns='n')
+        filas.append(por_periodo.rename_axis('fecha').reset_index().assign(corrida=int(corrida)))
+    return pd.concat(filas, ignore_index=True)[['corrida', 'fecha', 'suma', 'maximo', 'dias_lluvia']]
+
+
+@pytest.mark.parametrize('resolucion', list(REGLAS))
+def test_nivel_igual_a_resample(lluvia, resolucion):
+    nivel = construir_piramide(lluvia)[resolucion].df
+    obtenido = nivel.astype({'corrida': 'int64', 'fecha': 'datetime64[ns]', 'dias_lluvia': 'int64'})
+    esperado = _con_resample(lluvia, resolucion).astype({'fecha': 'datetime64[ns]'})
+    assert_frame_equal(obtenido.reset_index(drop=True), esperado, check_freq=False)
+
+
+def test_periodo_parcial_visible(lluvia):
+    piramide = construir_piramide(lluvia)
+    # Desde la mitad de un mes: el mes entero cuenta como visible
+    mensual = serie(piramide, 'M', 1, desde='2016-03-17', hasta='2016-05-02')
+    assert list(mensual['fecha']) == list(pd.to_datetime(['2016-03-01', '2016-04-01', '2016-05-01']))
@@ -0,0 +1,51 @@
+"""El ajuste de tendencia en lote coincide con np.polyfit sensor por sensor."""
+import numpy as np
+import pytest
+
+from dinsar import matriz as modulo_matriz
+from dinsar.matriz import MatrizCorrida
+from dinsar.tendencia import ajustar, tiempo_en_anos
+
+
+@pytest.fixture
+def con_pocas_fechas(matriz):
+    # Un sensor con dos observaciones y otro con una sola
+    valores = matriz.valores.copy()
+    valores[:, 0] = np.nan
+    valores[[3, 17], 0] = [1.5, -2.0]
+    valores[:, 1] = np.nan
+    valores[9, 1] = 4.0
+    return MatrizCorrida(matriz.corrida, matriz.fechas, matriz.sensores, matriz.puntos, valores)
+
+
+def _polyfit(m):
+    t = tiempo_en_anos(m.fechas)
+    filas = []
+    for j in range(len(m.sensores)):
+        y = m.valores[:, j].astype(np.float64)
+        ok = ~np.isnan(y)
+        velocidad = aceleracion = rmse = np.nan
+        if ok.sum() >= 2:
+            recta = np.polyfit(t[ok], y[ok], 1)
+            velocidad = recta[0]
+            rmse = np.sqrt(np.mean((y[ok] - np.polyval(recta, t[ok])) ** 2))
+        if ok.sum() >= 3:
+            aceleracion = 2 * np.polyfit(t[ok], y[ok], 2)[0]
+        filas.append((ok.sum(), velocidad, aceleracion, rmse))
+    return np.array(filas)
+
+
+@pytest.mark.parametrize('bloque_bytes', [None, 4 * 40 * 7])
+def test_ajuste_igual_a_polyfit(con_pocas_fechas, monkeypatch, bloque_bytes):
+    if bloque_bytes is not None:
+        monkeypatch.setattr(modulo_matriz, 'BLOQUE_BYTES', bloque_bytes)
+    tabla = ajustar(con_pocas_fechas)
+    esperado = _polyfit(con_pocas_fechas)
+
+    np.testing.assert_array_equal(tabla['sensor'], con_pocas_fechas.sensores)
+    np.testing.assert_array_equal(tabla['n_obs'], esperado[:, 0])
+    np.testing.assert_allclose(tabla[['velocidad_lineal', 'aceleracion']], esperado[:, 1:3],
+                               rtol=1e-6, atol=1e-9)
+    np.testing.assert_allclose(tabla['rmse'], esperado[:, 3], rtol=1e-5, atol=1e-7)
+    assert np.isnan(tabla.loc[1, ['velocidad_lineal', 'aceleracion']].astype(float)).all()
+    assert np.isnan(tabla.loc[0, 'aceleracion'])